@@ -0,0 +1,5 @@
+"""benchmarks
+
+End-to-end benchmarks of the counters pipeline, run against a fake web
+driver and local stub API servers instead of real accounts.
+"""
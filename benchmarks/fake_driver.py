@@ -0,0 +1,129 @@
+"""fake_driver.py
+
+A stand-in for `webdriver.Edge` that never launches a browser.
+
+The driver is a real Selenium `WebDriver` whose command executor is
+replaced by `FakeCommandExecutor`, so every call the updaters make still
+goes through Selenium's client code and is turned into the same W3C
+commands. The executor answers each command with a canned response
+after sleeping for its configured latency, and counts what it was sent.
+
+Navigations started from a script (as with `--tabs`) don't block:
+instead, the tab finds no elements until the latency of `get` has
+passed, like a page that is still loading.
+"""
+
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+
+from selenium.webdriver.edge.options import Options
+from selenium.webdriver.remote.webdriver import WebDriver
+
+_ELEMENT_KEY = "element-6066-11e4-a52e-4f735466cecf"
+"""Key identifying a web element reference in W3C responses."""
+
+_PAGE_METRICS_RESULT = {"bytes": 0, "resources": 0, "ready": None,
+                        "heap": None}
+
+
+@dataclass
+class FakeDriverConfig:
+    """How the fake driver behaves, shared by every driver it creates."""
+    default_latency: float = 0.01
+    """Seconds every command takes unless overridden."""
+    latencies: dict[str, float] = field(default_factory=dict)
+    """Seconds taken by specific commands, keyed by W3C command name."""
+    startup_latency: float = 1.0
+    """Seconds it takes to "launch" the browser."""
+    counts: Counter = field(default_factory=Counter)
+    """Number of times each command was executed, across drivers."""
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class FakeCommandExecutor:
+    """Command executor answering WebDriver commands without a browser."""
+
+    def __init__(self, config: FakeDriverConfig) -> None:
+        self._config = config
+        self._current = uuid.uuid4().hex
+        self._loaded_at = {self._current: 0.0}
+        """When the page of each open tab is done loading."""
+        self._timeouts = {"implicit": 0, "pageLoad": 300000,
+                          "script": 30000}
+
+    def execute(self, command: str, params: dict) -> dict:
+        config = self._config
+        with config.lock:
+            config.counts[command] += 1
+        time.sleep(config.latencies.get(command, config.default_latency))
+        return {"value": self._respond(command, params)}
+
+    def close(self) -> None:
+        pass
+
+    def _respond(self, command: str, params: dict) -> object:
+        if command == "newSession":
+            return {"sessionId": uuid.uuid4().hex,
+                    "capabilities": {"browserName": "MicrosoftEdge"}}
+        if command == "setTimeouts":
+            self._timeouts.update((key, value)
+                                  for key, value in params.items()
+                                  if key in self._timeouts)
+            return None
+        if command == "getTimeouts":
+            return dict(self._timeouts)
+        if command in ("findElement", "findChildElement"):
+            return _element_reference()
+        if command in ("findElements", "findChildElements"):
+            if time.monotonic() < self._loaded_at[self._current]:
+                return []
+            return [_element_reference()]
+        if command == "w3cExecuteScript":
+            script = params.get("script", "")
+            if "performance.getEntriesByType" in script:
+                return dict(_PAGE_METRICS_RESULT)
+            if "window.location.href" in script:
+                latency = self._config.latencies.get(
+                    "get", self._config.default_latency)
+                self._loaded_at[self._current] = time.monotonic() + latency
+            return None
+        return self._respond_window(command, params)
+
+    def _respond_window(self, command: str, params: dict) -> object:
+        if command == "newWindow":
+            handle = uuid.uuid4().hex
+            self._loaded_at[handle] = 0.0
+            return {"handle": handle, "type": "tab"}
+        if command == "switchToWindow":
+            self._current = params["handle"]
+            return None
+        if command == "w3cGetCurrentWindowHandle":
+            return self._current
+        if command == "w3cGetWindowHandles":
+            return list(self._loaded_at)
+        if command == "close":
+            del self._loaded_at[self._current]
+            return list(self._loaded_at)
+        return None
+
+
+class FakeEdge(WebDriver):
+    """Driver with the interface of `webdriver.Edge` but no browser."""
+
+    def __init__(self, config: FakeDriverConfig) -> None:
+        time.sleep(config.startup_latency)
+        super().__init__(
+            command_executor=FakeCommandExecutor(config),  # type: ignore
+            options=Options(),
+        )
+
+    def execute_cdp_cmd(self, cmd: str, cmd_args: dict) -> dict:
+        return self.execute("executeCdpCommand",
+                            {"cmd": cmd, "params": cmd_args})["value"] or {}
+
+
+def _element_reference() -> dict[str, str]:
+    return {_ELEMENT_KEY: uuid.uuid4().hex}
@@ -0,0 +1,152 @@
+"""grid_smoke.py
+
+Smoke-test `--grid` against a Selenium standalone server on this machine.
+
+Runs the Discord and Instagram updates against the local stand-in web
+apps (see `stub_web_apps.py`) twice in one process, with the browser on
+the standalone server. The second run gets the session pooled by the
+first, still logged in, the way the next batch of a queue worker does.
+The check passes if both runs succeed and each stand-in saw exactly one
+login, i.e. the second run reused the session and its logged-in state.
+
+The browser has to reach the stand-ins on 127.0.0.1, so the server must
+run on the host itself: the Selenium server jar with a local
+msedgedriver, or a container sharing the host's network.
+
+Usage (from the repository root):
+
+    python -m benchmarks.grid_smoke --grid http://localhost:4444
+    python -m benchmarks.grid_smoke --server selenium-server-<version>.jar
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from counters.config import ProgramOptions
+from counters.core import CountersProgram
+from counters.remote import get_status
+
+from .run import DUMMY_CREDENTIALS, REPO_ROOT, Scenario, write_config
+from .stub_web_apps import StubWebApps, WebAppConfig
+
+RUNS = 2
+"""Runs made in the same process, all but the first on a pooled session."""
+
+LOGIN_REQUESTS = ("discord POST /login", "instagram POST /accounts/login/")
+"""Requests of the stand-ins that submit a login form."""
+
+
+def main() -> None:
+    args = parse_args()
+    if args.child:
+        run_child(args.grid, args.output)
+        return
+
+    server = None
+    if args.server is not None:
+        server = start_server(args.server, args.port, args.verbose)
+        args.grid = f"http://localhost:{args.port}"
+    try:
+        wait_for_endpoint(args.grid, args.startup_timeout)
+        with StubWebApps(WebAppConfig(seed=0)) as web_apps:
+            exit_codes = run_program(args.grid, web_apps, args.verbose)
+            requests = web_apps.snapshot()
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    logins = {request: requests[request] for request in LOGIN_REQUESTS}
+    print(f"Exit codes: {exit_codes}", file=sys.stderr)
+    print(f"Logins: {logins}", file=sys.stderr)
+    if exit_codes != [0] * RUNS or any(count != 1
+                                       for count in logins.values()):
+        print("FAILED: expected every run to succeed, logging in once.",
+              file=sys.stderr)
+        sys.exit(1)
+    print("OK", file=sys.stderr)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.grid_smoke",
+        description="Run the browser updates on a local Selenium "
+        "standalone server against the stand-in web apps.",
+    )
+    parser.add_argument("--grid", default="http://localhost:4444",
+                        metavar="URL",
+                        help="already running server to use "
+                        "(default: %(default)s)")
+    parser.add_argument("--server", type=Path, metavar="JAR",
+                        help="start this Selenium server jar in standalone "
+                        "mode and use it instead")
+    parser.add_argument("--port", type=int, default=4444,
+                        help="port to start the server on")
+    parser.add_argument("--startup-timeout", type=float, default=60.0,
+                        help="seconds to wait for an Edge slot to show up")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="show the output of the server and program")
+    # Internal: the program runs in a child with the stand-ins' environment.
+    parser.add_argument("--child", action="store_true",
+                        help=argparse.SUPPRESS)
+    parser.add_argument("--output", type=Path, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+def start_server(jar: Path, port: int, verbose: bool) -> subprocess.Popen:
+    """Start a Selenium server in standalone mode on the port."""
+    output = None if verbose else subprocess.DEVNULL
+    return subprocess.Popen(
+        ["java", "-jar", str(jar), "standalone", "--port", str(port)],
+        stdout=output, stderr=output,
+    )
+
+
+def wait_for_endpoint(url: str, timeout: float) -> None:
+    """Wait until the endpoint reports an Edge slot, or exit."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = get_status(url)
+        if status is not None and status.total_slots:
+            return
+        time.sleep(1.0)
+    sys.exit(f"No Edge slot available at {url} after {timeout:g}s.")
+
+
+def run_program(url: str, web_apps: StubWebApps, verbose: bool) -> list[int]:
+    """Make the runs in a child process with a scratch config dir."""
+    with tempfile.TemporaryDirectory(prefix="counters-grid-") as temp:
+        config_dir = Path(temp)
+        write_config(config_dir / "bios.json", Scenario("grid", 0, True))
+        result_path = config_dir / "result.json"
+
+        env = {**os.environ, **DUMMY_CREDENTIALS, **web_apps.environment,
+               "COUNTERS_CONFIG_DIR": str(config_dir)}
+        command = [sys.executable, "-m", "benchmarks.grid_smoke", "--child",
+                   "--grid", url, "--output", str(result_path)]
+        output = None if verbose else subprocess.DEVNULL
+        subprocess.run(command, cwd=REPO_ROOT, env=env, check=True,
+                       stdout=output, stderr=output)
+        return json.loads(result_path.read_text(encoding="utf-8"))
+
+
+def run_child(url: str, output: Path) -> None:
+    """Make the runs in this process and write their exit codes."""
+    options = ProgramOptions.defaults(
+        console_only=True,
+        run_spotify=False,
+        run_github=False,
+        grid_urls=[url],
+    )
+    exit_codes = [CountersProgram(options).run() for _ in range(RUNS)]
+    output.write_text(json.dumps(exit_codes), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
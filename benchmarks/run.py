@@ -0,0 +1,353 @@
+"""run.py
+
+Benchmark the whole pipeline across scenarios and emit JSON results.
+
+Each scenario runs `CountersProgram.run` end to end in a fresh
+interpreter (see `scenario.py`) with a generated configuration of N
+Spotify playlists, against stub Spotify and GitHub APIs served from this
+process and, for browser scenarios, a fake web driver with configurable
+per-command latency. No real account is touched.
+
+With `--real-browser`, browser scenarios drive a real headless Edge
+against the local stand-in web apps (see `stub_web_apps.py`) instead,
+to measure actual browser latency without network access.
+
+The `http` and `http-stale` modes run the browser updaters with the
+`http` backend, replaying saved sessions against the stand-in web apps'
+API endpoints: sessions the stand-ins accept, or ones they reject, so
+the updaters fall back to the browser.
+
+Usage (from the repository root):
+
+    python -m benchmarks.run --output results.json
+    python -m benchmarks.run --baseline results.json
+
+Pass `--baseline` with the output of an earlier run to print how each
+scenario changed, e.g. before and after a scheduling or caching change.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+from .stub_servers import StubApiServer
+from .stub_web_apps import StubWebApps, WebAppConfig
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+"""Directory to run the scenarios from, so `counters` is importable."""
+
+DUMMY_CREDENTIALS = {
+    "DISCORD_EMAIL": "bench@example.com",
+    "DISCORD_PASSWORD": "bench",
+    "INSTAGRAM_USERNAME": "bench",
+    "INSTAGRAM_PASSWORD": "bench",
+    "SPOTIFY_CLIENT_ID": "bench",
+    "SPOTIFY_CLIENT_SECRET": "bench",
+    "SPOTIFY_REDIRECT_URI": "http://localhost/callback",
+    "SPOTIFY_USER_REFRESH": "bench",
+    "GITHUB_PAT": "bench",
+    "ERROR_EMAIL": "bench@example.com",
+    "ERROR_EMAIL_PASSWORD": "bench",
+}
+"""Placeholders for the required environment variables."""
+
+
+@dataclass
+class Scenario:
+    name: str
+    playlists: int
+    browser: bool
+    http_backend: bool = False
+    """Whether the browser updaters try the `http` backend first."""
+    stale_sessions: bool = False
+    """Whether the saved sessions are ones the stand-ins reject."""
+
+
+def main() -> None:
+    args = parse_args()
+    scenarios = [
+        Scenario(f"{mode}-{count}", count, mode != "api",
+                 http_backend=mode.startswith("http"),
+                 stale_sessions=mode == "http-stale")
+        for count in args.playlists
+        for mode in args.modes
+    ]
+
+    web_apps = StubWebApps(WebAppConfig(seed=0))
+    with StubApiServer(latency=args.api_latency) as server, web_apps:
+        environment = {**server.environment, **web_apps.environment}
+        results = []
+        for scenario in scenarios:
+            print(f"Running {scenario.name} ({args.repeat}x)...",
+                  file=sys.stderr)
+            results.append(run_scenario(scenario, server, web_apps,
+                                        environment, args))
+
+    output = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "settings": {
+                "repeat": args.repeat,
+                "api_latency": args.api_latency,
+                "command_latency": args.command_latency,
+                "latency": args.latency,
+                "startup_latency": args.startup_latency,
+                "real_browser": args.real_browser,
+                "tabs": args.tabs,
+            },
+        },
+        "scenarios": results,
+    }
+
+    text = json.dumps(output, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        args.output.write_text(text + "\n", encoding="utf-8")
+
+    baseline = None
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+    print(format_summary(results, baseline), file=sys.stderr)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run",
+        description="Benchmark the counters pipeline against fakes.",
+    )
+    parser.add_argument("--playlists", type=int, nargs="+",
+                        default=[1, 50, 500],
+                        help="numbers of Spotify playlists to configure")
+    parser.add_argument("--modes", nargs="+",
+                        choices=["api", "browser", "http", "http-stale"],
+                        default=["api", "browser"],
+                        help="run only the API updaters, also the "
+                        "browser updaters, or also the browser updaters "
+                        "over HTTP with sessions that are accepted or "
+                        "rejected (falling back to the browser)")
+    parser.add_argument("-n", "--repeat", type=int, default=3,
+                        help="runs per scenario")
+    parser.add_argument("--api-latency", type=float, default=0.02,
+                        help="seconds each stub API request takes")
+    parser.add_argument("--command-latency", type=float, default=0.01,
+                        help="seconds each WebDriver command takes")
+    parser.add_argument("--latency", nargs="*", default=["get=0.5"],
+                        metavar="COMMAND=SECONDS",
+                        help="latency of specific WebDriver commands")
+    parser.add_argument("--startup-latency", type=float, default=1.0,
+                        help="seconds the fake browser takes to start")
+    parser.add_argument("--real-browser", action="store_true",
+                        help="drive a real headless Edge against local "
+                        "stand-in web apps instead of the fake driver")
+    parser.add_argument("--tabs", action="store_true",
+                        help="run the browser updaters in tabs")
+    parser.add_argument("-o", "--output", type=Path,
+                        help="file to write the JSON results to "
+                        "(default: stdout)")
+    parser.add_argument("--baseline", type=Path,
+                        help="earlier results to compare against")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="show the output of the program")
+    return parser.parse_args()
+
+
+def run_scenario(
+    scenario: Scenario,
+    server: StubApiServer,
+    web_apps: StubWebApps,
+    environment: dict[str, str],
+    args: argparse.Namespace,
+) -> dict:
+    """Run a scenario `args.repeat` times and aggregate the results."""
+    runs = list[dict]()
+    api_requests = Counter[str]()
+    web_requests = Counter[str]()
+    for _ in range(args.repeat):
+        before = server.snapshot()
+        web_before = web_apps.snapshot()
+        runs.append(run_once(scenario, web_apps, environment, args))
+        # Every run makes the same requests, so keep the last run's.
+        api_requests = server.snapshot() - before
+        web_requests = web_apps.snapshot() - web_before
+
+    walls = [run["wall_s"] for run in runs]
+    phases = {key: round(statistics.median(run["phases_s"].get(key, 0.0)
+                                           for run in runs), 4)
+              for key in runs[0]["phases_s"]}
+    webdriver_commands = runs[-1]["webdriver_commands"]
+    rss = [run["peak_rss_kb"] for run in runs
+           if run["peak_rss_kb"] is not None]
+    return {
+        "name": scenario.name,
+        "playlists": scenario.playlists,
+        "browser": scenario.browser,
+        "runs": len(runs),
+        "exit_codes": [run["exit_code"] for run in runs],
+        "wall_s": {
+            "min": min(walls),
+            "median": round(statistics.median(walls), 4),
+            "max": max(walls),
+        },
+        "phases_s": phases,
+        "peak_rss_kb": max(rss) if rss else None,
+        "baseline_rss_kb": runs[-1]["baseline_rss_kb"],
+        "api_requests": dict(sorted(api_requests.items())),
+        "api_requests_total": sum(api_requests.values()),
+        "web_requests": dict(sorted(web_requests.items())),
+        "web_requests_total": sum(web_requests.values()),
+        "webdriver_commands": dict(sorted(webdriver_commands.items())),
+        "webdriver_commands_total": sum(webdriver_commands.values()),
+    }
+
+
+def run_once(
+    scenario: Scenario,
+    web_apps: StubWebApps,
+    environment: dict[str, str],
+    args: argparse.Namespace,
+) -> dict:
+    """Run the scenario in a child process with a scratch config dir."""
+    with tempfile.TemporaryDirectory(prefix="counters-bench-") as temp:
+        config_dir = Path(temp)
+        write_config(config_dir / "bios.json", scenario)
+        if scenario.http_backend:
+            write_sessions(config_dir / "sessions", web_apps,
+                           scenario.stale_sessions)
+        result_path = config_dir / "result.json"
+
+        env = {**os.environ, **DUMMY_CREDENTIALS, **environment,
+               "COUNTERS_CONFIG_DIR": str(config_dir)}
+        command = [
+            sys.executable, "-m", "benchmarks.scenario",
+            "--command-latency", str(args.command_latency),
+            "--startup-latency", str(args.startup_latency),
+            "--output", str(result_path),
+        ]
+        if args.latency:
+            command += ["--latency", *args.latency]
+        if scenario.browser:
+            command.append("--browser")
+        if scenario.http_backend:
+            command += ["--backend", "http"]
+        if args.real_browser:
+            command.append("--real-browser")
+        if args.tabs:
+            command.append("--tabs")
+
+        output = None if args.verbose else subprocess.DEVNULL
+        subprocess.run(command, cwd=REPO_ROOT, env=env, check=True,
+                       stdout=output, stderr=output)
+        return json.loads(result_path.read_text(encoding="utf-8"))
+
+
+def write_config(path: Path, scenario: Scenario) -> None:
+    """Write a central JSON file with the scenario's playlists."""
+    data = {
+        "discord": {"status": "Day {} of benchmarking",
+                    "start": "2023-01-01"},
+        "instagram": {"bio": "Day {} of benchmarking",
+                      "start": "2023-01-01"},
+        "github": {"bio": "Day {} of benchmarking", "start": "2023-01-01"},
+        "spotify": [
+            {
+                "playlist_id": f"benchplaylist{index:010d}",
+                "name": f"Day {{}} of playlist {index}",
+                "description": "Benchmark playlist",
+                "start": "2023-01-01",
+            }
+            for index in range(scenario.playlists)
+        ],
+    }
+    path.write_text(json.dumps(data), encoding="utf-8")
+
+
+def write_sessions(directory: Path, web_apps: StubWebApps,
+                   stale: bool) -> None:
+    """Save the sessions the `http` backend replays, logged in to the
+    stand-ins or (if `stale`) rejected by them."""
+    if stale:
+        token, session = "stale-token", "stale-session"
+    else:
+        token = web_apps.discord.token
+        session = web_apps.instagram.new_session()
+    sessions = {
+        "discord": {"cookies": [], "headers": {"Authorization": token}},
+        "instagram": {
+            "cookies": [
+                {"name": "sessionid", "value": session},
+                {"name": "csrftoken", "value": web_apps.instagram.csrf_token},
+            ],
+            "headers": {},
+        },
+    }
+    directory.mkdir(parents=True, exist_ok=True)
+    for name, data in sessions.items():
+        data["saved"] = time.time()
+        (directory / f"{name}.json").write_text(json.dumps(data),
+                                                 encoding="utf-8")
+
+
+def format_summary(results: list[dict], baseline: dict | None) -> str:
+    """Format a table of the results, with changes against a baseline."""
+    previous = {}
+    if baseline is not None:
+        previous = {entry["name"]: entry for entry in baseline["scenarios"]}
+
+    lines = [f"{'scenario':<14} {'wall (median)':>16} {'peak RSS':>16} "
+             f"{'API reqs':>10} {'web reqs':>10} {'WD cmds':>10}"]
+    for entry in results:
+        old = previous.get(entry["name"])
+        wall = entry["wall_s"]["median"]
+        rss = entry["peak_rss_kb"]
+        line = (f"{entry['name']:<14} "
+                f"{f'{wall:.3f}s' + _change(wall, old, 'wall_s'):>16} "
+                f"{_format_rss(rss) + _change(rss, old, 'peak_rss_kb'):>16} "
+                f"{entry['api_requests_total']:>10} "
+                f"{entry.get('web_requests_total', 0):>10} "
+                f"{entry['webdriver_commands_total']:>10}")
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def git_commit() -> str | None:
+    """Return the commit being benchmarked, if in a git checkout."""
+    try:
+        completed = subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                                   cwd=REPO_ROOT, capture_output=True,
+                                   text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip()
+
+
+def _change(value: float | None, old: dict | None, key: str) -> str:
+    if value is None or old is None:
+        return ""
+    old_value = old[key]
+    if isinstance(old_value, dict):
+        old_value = old_value["median"]
+    if not old_value:
+        return ""
+    return f" ({(value - old_value) / old_value:+.0%})"
+
+
+def _format_rss(rss_kb: int | None) -> str:
+    return "?" if rss_kb is None else f"{rss_kb / 1024:.1f}MB"
+
+
+if __name__ == "__main__":
+    main()
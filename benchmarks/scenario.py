@@ -0,0 +1,166 @@
+"""scenario.py
+
+Run the counters pipeline once in this process and report its cost.
+
+Meant to be launched by `run.py` in a fresh interpreter per run, with
+the environment already pointing at the stub API servers and a scratch
+configuration directory, so that the peak RSS measured is that of a
+single run and no state leaks between runs.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+from selenium import webdriver
+
+from counters import webdriver_stats
+from counters.config import BACKEND_HTTP, BACKEND_SELENIUM, ProgramOptions
+from counters.core import CountersProgram
+
+from .fake_driver import FakeDriverConfig, FakeEdge
+
+
+class BenchmarkProgram(CountersProgram):
+    """The main program, with the browser swapped for a fake driver."""
+
+    def __init__(
+        self,
+        options: ProgramOptions,
+        driver_config: FakeDriverConfig,
+    ) -> None:
+        super().__init__(options)
+        self.driver_config = driver_config
+
+    def _init_web_driver(self) -> webdriver.Edge | None:
+        start = time.perf_counter()
+        try:
+            return FakeEdge(self.driver_config)  # type: ignore
+        finally:
+            self.timings["driver_startup"] = time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run the pipeline once against fakes (see run.py).",
+    )
+    parser.add_argument("--browser", action="store_true",
+                        help="also run the browser updaters")
+    parser.add_argument("--command-latency", type=float, default=0.01,
+                        help="seconds each WebDriver command takes")
+    parser.add_argument("--latency", nargs="*", default=[],
+                        metavar="COMMAND=SECONDS",
+                        help="latency of specific WebDriver commands")
+    parser.add_argument("--startup-latency", type=float, default=1.0,
+                        help="seconds the fake browser takes to start")
+    parser.add_argument("--backend", choices=(BACKEND_SELENIUM, BACKEND_HTTP),
+                        default=BACKEND_SELENIUM,
+                        help="how to update Discord and Instagram")
+    parser.add_argument("--tabs", action="store_true",
+                        help="run the browser updaters in tabs")
+    parser.add_argument("--real-browser", action="store_true",
+                        help="drive a real headless Edge instead of the "
+                        "fake driver (against the stand-in web apps)")
+    parser.add_argument("--output", type=Path, required=True,
+                        help="file to write the JSON result to")
+    args = parser.parse_args()
+
+    driver_config = FakeDriverConfig(
+        default_latency=args.command_latency,
+        latencies=parse_latencies(args.latency),
+        startup_latency=args.startup_latency,
+    )
+    options = ProgramOptions.defaults(
+        console_only=True,
+        run_discord=args.browser,
+        run_instagram=args.browser,
+        backend=args.backend,
+        tabs=args.tabs,
+        grid_urls=[],
+    )
+    if args.real_browser:
+        webdriver_stats.enable()
+        program = CountersProgram(options)
+    else:
+        program = BenchmarkProgram(options, driver_config)
+
+    baseline_rss = peak_rss_kb()
+    start = time.perf_counter()
+    exit_code = program.run()
+    wall = time.perf_counter() - start
+
+    if args.real_browser:
+        commands = {command: entry["count"] for command, entry
+                    in webdriver_stats.stats.summary().items()}
+    else:
+        commands = dict(driver_config.counts)
+
+    result = {
+        "exit_code": exit_code,
+        "wall_s": round(wall, 4),
+        "phases_s": {key: round(value, 4)
+                     for key, value in program.timings.items()},
+        "baseline_rss_kb": baseline_rss,
+        "peak_rss_kb": peak_rss_kb(),
+        "webdriver_commands": commands,
+    }
+    args.output.write_text(json.dumps(result), encoding="utf-8")
+
+
+def parse_latencies(pairs: list[str]) -> dict[str, float]:
+    """Parse `COMMAND=SECONDS` pairs into a mapping."""
+    latencies = dict[str, float]()
+    for pair in pairs:
+        command, _, seconds = pair.partition("=")
+        latencies[command] = float(seconds)
+    return latencies
+
+
+def peak_rss_kb() -> int | None:
+    """Return the peak resident set size of this process so far."""
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return _peak_working_set_kb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def _peak_working_set_kb() -> int | None:
+    """Windows equivalent of the peak RSS, or None if unavailable."""
+    # pylint: disable=import-outside-toplevel
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ("cb", wintypes.DWORD),
+            ("PageFaultCount", wintypes.DWORD),
+            ("PeakWorkingSetSize", ctypes.c_size_t),
+            ("WorkingSetSize", ctypes.c_size_t),
+            ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+            ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+            ("PagefileUsage", ctypes.c_size_t),
+            ("PeakPagefileUsage", ctypes.c_size_t),
+        ]
+
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    try:
+        windll = ctypes.windll  # type: ignore[attr-defined]
+        process = windll.kernel32.GetCurrentProcess()
+        if not windll.psapi.GetProcessMemoryInfo(
+                process, ctypes.byref(counters), counters.cb):
+            return None
+    except (AttributeError, OSError):
+        return None
+    return counters.PeakWorkingSetSize // 1024
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""stub_servers.py
+
+Local stand-ins for the Spotify and GitHub APIs.
+
+One threaded HTTP server answers the handful of endpoints the updaters
+call (token refresh, playlist details, authenticated user) with minimal
+valid responses, after an optional per-request latency. Every request is
+counted by method and route, so a benchmark can report how many API
+calls a run made.
+"""
+
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_PLAYLIST_PATH = re.compile(r"^/v1/playlists/[^/]+$")
+
+_TOKEN_RESPONSE = {
+    "access_token": "stub-access-token",
+    "token_type": "Bearer",
+    "expires_in": 3600,
+    "scope": "playlist-modify-public playlist-modify-private",
+}
+
+
+class StubApiServer:
+    """Stub Spotify and GitHub APIs served from a background thread."""
+
+    def __init__(self, latency: float = 0.0) -> None:
+        self.latency = latency
+        """Seconds to wait before answering each request."""
+        self.counts = Counter[str]()
+        """Number of requests received, keyed by "<method> <route>"."""
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0),
+                                           _make_handler(self))
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name="stub-api", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def environment(self) -> dict[str, str]:
+        """Environment variables pointing the program at this server."""
+        return {
+            "SPOTIFY_API_URL": f"{self.base_url}/v1/",
+            "SPOTIFY_TOKEN_URL": f"{self.base_url}/api/token",
+            "GITHUB_API_URL": self.base_url,
+        }
+
+    def start(self) -> "StubApiServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def snapshot(self) -> Counter[str]:
+        """Return a copy of the request counts so far."""
+        with self._lock:
+            return self.counts.copy()
+
+    def count(self, route: str) -> None:
+        with self._lock:
+            self.counts[route] += 1
+
+    def __enter__(self) -> "StubApiServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+
+def _make_handler(stub: StubApiServer) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:  # pylint: disable=invalid-name
+            self._handle()
+
+        def do_POST(self) -> None:  # pylint: disable=invalid-name
+            self._handle()
+
+        def do_PUT(self) -> None:  # pylint: disable=invalid-name
+            self._handle()
+
+        def do_PATCH(self) -> None:  # pylint: disable=invalid-name
+            self._handle()
+
+        def log_message(self, format, *args) -> None:  # pylint: disable=W0622
+            pass
+
+        def _handle(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            self.rfile.read(length)
+            path = self.path.split("?", 1)[0]
+            route = _PLAYLIST_PATH.sub("/v1/playlists/{id}", path)
+            stub.count(f"{self.command} {route}")
+            if stub.latency:
+                time.sleep(stub.latency)
+
+            if self.command == "POST" and path == "/api/token":
+                self._reply(200, _TOKEN_RESPONSE)
+            elif self.command == "PUT" and route == "/v1/playlists/{id}":
+                self._reply(200, None)
+            elif self.command in ("GET", "PATCH") and path == "/user":
+                # Like GitHub, which sends its rate limit with every reply.
+                self._reply(200, {"login": "stub", "id": 1, "bio": "",
+                                  "url": f"{stub.base_url}/user"},
+                            {"X-RateLimit-Limit": "5000",
+                             "X-RateLimit-Remaining": "4999",
+                             "X-RateLimit-Reset": str(int(time.time()) + 3600)})
+            else:
+                self._reply(404, {"message": "Not Found"})
+
+        def _reply(
+            self,
+            status: int,
+            body: dict | None,
+            headers: dict[str, str] | None = None,
+        ) -> None:
+            payload = b"" if body is None else json.dumps(body).encode()
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            if body is not None:
+                self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return Handler
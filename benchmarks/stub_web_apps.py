@@ -0,0 +1,777 @@
+"""stub_web_apps.py
+
+Local stand-ins for the Discord and Instagram web apps.
+
+Each app is served by its own threaded HTTP server, and its pages are
+generated from the selectors in `counters.selectors`: every CSS selector
+or absolute XPath is turned into the chain of nested elements it
+describes, so the real Selenium flows find exactly what they look for.
+Editing a selector (e.g. after the real app changed) changes the stand-in
+DOM with it.
+
+The pages behave like the flows expect: logging in sets a session
+cookie, the Discord avatar opens a menu and then the custom status
+dialog, Instagram shows the "Save your login info?" prompt before the
+edit profile form, and saving updates the server-side state (which the
+HTTP API endpoints used by the `http` backend also read and write).
+
+Delays, the Instagram prompt and failure injection are configurable
+with `WebAppConfig`. To run the stand-ins by hand:
+
+    python -m benchmarks.stub_web_apps --render-delay 0.5
+
+and export the printed environment variables before running counters.
+"""
+
+import argparse
+import html
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass, field
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from counters.selectors import discord as discord_selectors
+from counters.selectors import instagram as instagram_selectors
+from counters.selectors.selector import CSSSelector, Selector
+
+FAILURE_POINTS = {
+    "discord.login": "logging in responds with a server error",
+    "discord.app": "the app page responds with a server error",
+    "discord.menu": "the avatar menu lacks the custom status item",
+    "discord.save": "saving the custom status responds with an error",
+    "instagram.login": "logging in responds with a server error",
+    "instagram.edit": "the edit profile page responds with a server error",
+    "instagram.save": "saving the bio responds with an error",
+}
+"""Points where failures can be injected, and what happens there."""
+
+_VOID_TAGS = {"input", "img", "br", "meta"}
+
+_CSS_TOKEN = re.compile(
+    r"(?P<tag>^[a-zA-Z][\w-]*)|#(?P<id>[\w-]+)|\.(?P<cls>[\w-]+)"
+    r"|:nth-child\((?P<nth>\d+)\)"
+)
+_XPATH_STEP = re.compile(r"^(?P<tag>[a-zA-Z][\w-]*)(?:\[(?P<index>\d+)\])?$")
+
+
+@dataclass
+class WebAppConfig:
+    """How the stand-in web apps behave."""
+    response_delay: float = 0.05
+    """Seconds the server waits before answering any request."""
+    render_delay: float = 0.3
+    """Seconds a page takes to render its content after loading."""
+    popup_delay: float = 0.1
+    """Seconds menus and dialogs take to appear after a click."""
+    save_login_prompt: float = 1.0
+    """Probability that Instagram asks to save the login info."""
+    failures: dict[str, float] = field(default_factory=dict)
+    """Probability of each of `FAILURE_POINTS` failing."""
+    seed: int | None = None
+    """Seed for the random choices, for reproducible runs."""
+
+
+# ==================== DOM GENERATION ==================== #
+
+
+@dataclass
+class _Step:
+    """One step of a selector: a compound CSS selector or XPath step."""
+    tag: str | None = None
+    id: str | None = None
+    classes: list[str] = field(default_factory=list)
+    nth_child: int | None = None
+    nth_of_type: int | None = None
+
+
+class _Node:
+    """An element of a generated page."""
+
+    def __init__(
+        self,
+        tag: str = "div",
+        attrs: dict[str, str] | None = None,
+        text: str = "",
+    ) -> None:
+        self.tag = tag
+        self.attrs = attrs or {}
+        self.text = text
+        self.children = list[_Node]()
+
+    def child(self, step: _Step) -> "_Node":
+        """Return the child matching the step, creating it if needed.
+
+        Raises:
+            ValueError: The position the step requires is taken by an
+            element that doesn't match it.
+        """
+        for index, child in enumerate(self.children):
+            if self._matches(step, child, index):
+                return child
+
+        tag = step.tag or "div"
+        if step.nth_child is not None:
+            if len(self.children) >= step.nth_child:
+                raise ValueError(f"position {step.nth_child} already taken")
+            while len(self.children) < step.nth_child - 1:
+                self.children.append(_Node())
+        if step.nth_of_type is not None:
+            if self._count(tag) >= step.nth_of_type:
+                raise ValueError(f"{tag}[{step.nth_of_type}] already taken")
+            while self._count(tag) < step.nth_of_type - 1:
+                self.children.append(_Node(tag))
+
+        node = _Node(tag)
+        if step.id is not None:
+            node.attrs["id"] = step.id
+        if step.classes:
+            node.attrs["class"] = " ".join(step.classes)
+        self.children.append(node)
+        return node
+
+    def render(self) -> str:
+        attrs = "".join(f' {name}="{html.escape(value)}"'
+                        for name, value in self.attrs.items())
+        if self.tag in _VOID_TAGS:
+            return f"<{self.tag}{attrs}>"
+        return (f"<{self.tag}{attrs}>{html.escape(self.text)}"
+                f"{self.render_children()}</{self.tag}>")
+
+    def render_children(self) -> str:
+        return "".join(child.render() for child in self.children)
+
+    def _count(self, tag: str) -> int:
+        return sum(child.tag == tag for child in self.children)
+
+    def _matches(self, step: _Step, child: "_Node", index: int) -> bool:
+        if step.tag is not None and child.tag != step.tag:
+            return False
+        if step.id is not None and child.attrs.get("id") != step.id:
+            return False
+        classes = child.attrs.get("class", "").split()
+        if any(name not in classes for name in step.classes):
+            return False
+        if step.nth_child is not None and index + 1 != step.nth_child:
+            return False
+        if step.nth_of_type is not None:
+            position = sum(sibling.tag == child.tag
+                           for sibling in self.children[:index + 1])
+            if position != step.nth_of_type:
+                return False
+        return True
+
+
+def _parse_css(value: str) -> list[_Step]:
+    """Parse a chain of compound selectors joined by child combinators."""
+    steps = list[_Step]()
+    for compound in value.split(">"):
+        step = _Step()
+        for match in _CSS_TOKEN.finditer(compound.strip()):
+            if match["tag"]:
+                step.tag = match["tag"]
+            elif match["id"]:
+                step.id = match["id"]
+            elif match["cls"]:
+                step.classes.append(match["cls"])
+            else:
+                step.nth_child = int(match["nth"])
+        steps.append(step)
+    return steps
+
+
+def _parse_xpath(value: str) -> list[_Step]:
+    """Parse an absolute XPath, returning the steps below <body>."""
+    parts = value.strip("/").split("/")
+    if parts[:2] != ["html", "body"]:
+        raise ValueError(f"only absolute XPaths are supported: {value}")
+    steps = list[_Step]()
+    for part in parts[2:]:
+        match = _XPATH_STEP.match(part)
+        if match is None:
+            raise ValueError(f"unsupported XPath step: {part}")
+        index = match["index"]
+        steps.append(_Step(tag=match["tag"],
+                           nth_of_type=int(index) if index else None))
+    return steps
+
+
+def _add(
+    root: _Node,
+    selector: Selector,
+    tag: str | None = None,
+    attrs: dict[str, str] | None = None,
+    text: str = "",
+) -> _Node:
+    """Add the elements described by the selector under `root`.
+
+    Steps shared with selectors added before reuse the same elements.
+    `tag`, `attrs` and `text` apply to the element the selector targets.
+    """
+    if isinstance(selector, CSSSelector):
+        steps = _parse_css(selector.value)
+    else:
+        steps = _parse_xpath(selector.value)
+
+    node = root
+    for step in steps:
+        node = node.child(step)
+    if tag is not None:
+        node.tag = tag
+    node.attrs.update(attrs or {})
+    node.text = text
+    return node
+
+
+# ==================== PAGES ==================== #
+
+_PAGE_SCRIPT = """
+const CONFIG = %s;
+
+function show(name) {
+    const template = document.getElementById("tpl-" + name);
+    if (template) {
+        document.body.appendChild(template.content.cloneNode(true));
+    }
+}
+
+if (CONFIG.token) {
+    localStorage.setItem("token", JSON.stringify(CONFIG.token));
+}
+
+window.addEventListener("DOMContentLoaded", () => {
+    setTimeout(() => show("content"), CONFIG.renderDelay);
+});
+
+document.addEventListener("click", (event) => {
+    const target = event.target.closest("[data-action]");
+    if (!target) {
+        return;
+    }
+    const action = target.dataset.action;
+    if (action === "open-menu") {
+        setTimeout(() => show("menu"), CONFIG.popupDelay);
+    } else if (action === "open-status-dialog") {
+        target.remove();
+        setTimeout(() => show("dialog"), CONFIG.popupDelay);
+    } else if (action === "navigate") {
+        location.href = target.dataset.href;
+    } else if (action === "save-bio") {
+        saveBio();
+    }
+});
+
+document.addEventListener("keydown", (event) => {
+    if (event.key === "Enter"
+            && event.target.dataset.action === "save-status") {
+        saveStatus(event.target.value);
+    }
+});
+
+async function saveStatus(text) {
+    const response = await fetch(CONFIG.saveUrl, {
+        method: "PATCH",
+        headers: {
+            "Authorization": CONFIG.token,
+            "Content-Type": "application/json",
+        },
+        body: JSON.stringify({
+            custom_status: {text: text, emoji_name: CONFIG.emoji},
+        }),
+    });
+    if (response.ok) {
+        location.reload();
+    }
+}
+
+async function saveBio() {
+    const bio = document.querySelector("[data-field=biography]").value;
+    await fetch(CONFIG.saveUrl, {
+        method: "POST",
+        headers: {
+            "X-CSRFToken": CONFIG.csrfToken,
+            "Content-Type": "application/x-www-form-urlencoded",
+        },
+        body: new URLSearchParams({biography: bio}),
+    });
+}
+"""
+
+
+def _render_page(
+    title: str,
+    templates: dict[str, _Node],
+    config: dict,
+) -> str:
+    """Render a page whose `content` template appears after a delay.
+
+    Everything lives in <head> until shown, so the generated elements
+    are the only children of <body> that absolute XPaths count.
+    """
+    rendered = "".join(
+        f'<template id="tpl-{name}">{root.render_children()}</template>'
+        for name, root in templates.items()
+    )
+    script = _PAGE_SCRIPT % json.dumps(config)
+    return (f"<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+            f"<title>{html.escape(title)}</title>{rendered}"
+            f"<script>{script}</script></head><body></body></html>")
+
+
+def _page_config(config: WebAppConfig, **extra: object) -> dict:
+    return {"renderDelay": config.render_delay * 1000,
+            "popupDelay": config.popup_delay * 1000, **extra}
+
+
+# ==================== SERVERS ==================== #
+
+
+class _WebApp(ABC):
+    """Routes and state of one stand-in web app."""
+
+    session_cookie = "session"
+
+    def __init__(self, config: WebAppConfig, rng: random.Random) -> None:
+        self.config = config
+        self.rng = rng
+        self.lock = threading.Lock()
+        self.sessions = set[str]()
+        self.counts = dict[str, int]()
+        """Number of requests received, keyed by "<method> <path>"."""
+
+    def fails(self, point: str) -> bool:
+        with self.lock:
+            return self.rng.random() < self.config.failures.get(point, 0.0)
+
+    def new_session(self) -> str:
+        session = uuid.uuid4().hex
+        with self.lock:
+            self.sessions.add(session)
+        return session
+
+    def logged_in(self, handler: "_Handler") -> bool:
+        return handler.cookies.get(self.session_cookie) in self.sessions
+
+    def count(self, method: str, path: str) -> None:
+        with self.lock:
+            key = f"{method} {path}"
+            self.counts[key] = self.counts.get(key, 0) + 1
+
+    @abstractmethod
+    def handle(self, handler: "_Handler") -> None:
+        """Answer the request."""
+
+
+class DiscordApp(_WebApp):
+    """Stand-in for the Discord login page, app sidebar and settings API."""
+
+    session_cookie = "discord_session"
+
+    def __init__(self, config: WebAppConfig, rng: random.Random) -> None:
+        super().__init__(config, rng)
+        self.status_text = ""
+        self.status_emoji: str | None = None
+        self.token = uuid.uuid4().hex
+
+    def handle(self, handler: "_Handler") -> None:
+        method, path = handler.command, handler.path_only
+        if method == "GET" and path == "/login":
+            # Like the real app, a live session skips the login form.
+            if self.logged_in(handler):
+                handler.redirect("/channels/@me")
+            else:
+                handler.send_html(200, self._login_page())
+        elif method == "POST" and path == "/login":
+            handler.read_body()
+            if self.fails("discord.login"):
+                handler.send_html(500, "Something went wrong.")
+                return
+            cookie = f"{self.session_cookie}={self.new_session()}; Path=/"
+            handler.redirect("/channels/@me", cookie)
+        elif method == "GET" and path == "/channels/@me":
+            if not self.logged_in(handler):
+                handler.redirect("/login")
+            elif self.fails("discord.app"):
+                handler.send_html(500, "Something went wrong.")
+            else:
+                handler.send_html(200, self._app_page())
+        elif path == "/api/v9/users/@me/settings":
+            self._handle_settings(handler)
+        else:
+            handler.send_html(404, "Not Found")
+
+    def _handle_settings(self, handler: "_Handler") -> None:
+        body = handler.read_body()
+        if handler.headers.get("Authorization") != self.token:
+            handler.send_json(401, {"message": "401: Unauthorized"})
+        elif handler.command == "GET":
+            handler.send_json(200, self._settings())
+        elif handler.command == "PATCH":
+            if self.fails("discord.save"):
+                handler.send_json(500, {"message": "Internal Server Error"})
+                return
+            custom_status = json.loads(body or b"{}").get("custom_status")
+            with self.lock:
+                custom_status = custom_status or {}
+                self.status_text = custom_status.get("text") or ""
+                self.status_emoji = custom_status.get("emoji_name")
+            handler.send_json(200, self._settings())
+        else:
+            handler.send_json(405, {"message": "405: Method Not Allowed"})
+
+    def _settings(self) -> dict:
+        custom_status = None
+        if self.status_text or self.status_emoji:
+            custom_status = {"text": self.status_text or None,
+                             "emoji_name": self.status_emoji}
+        return {"custom_status": custom_status}
+
+    def _login_page(self) -> str:
+        content = _Node("body")
+        form = _Node("form", {"method": "post", "action": "/login"})
+        content.children.append(form)
+        _add(form, discord_selectors.EMAIL_INPUT, tag="input",
+             attrs={"name": "email", "type": "text"})
+        _add(form, discord_selectors.PASSWORD_INPUT, tag="input",
+             attrs={"name": "password", "type": "password"})
+        form.children.append(_Node("button", {"type": "submit"}, "Log In"))
+        return _render_page("Discord", {"content": content},
+                            _page_config(self.config))
+
+    def _app_page(self) -> str:
+        with self.lock:
+            text, emoji = self.status_text, self.status_emoji
+
+        content = _Node("body")
+        _add(content, discord_selectors.AVATAR_ICON,
+             attrs={"data-action": "open-menu"})
+        if emoji:
+            _add(content, discord_selectors.EMOJI_IMG, tag="img",
+                 attrs={"alt": emoji, "src": ""})
+        if text:
+            _add(content, discord_selectors.TEXT_SPAN, tag="span", text=text)
+
+        menu = _Node("body")
+        if self.fails("discord.menu"):
+            _add(menu, CSSSelector("#account-online"), text="Online")
+        else:
+            item = (discord_selectors.EDIT_STATUS_ITEM if text or emoji
+                    else discord_selectors.SET_STATUS_ITEM)
+            _add(menu, item, attrs={"data-action": "open-status-dialog"},
+                 text="Custom Status")
+
+        dialog = _Node("body")
+        _add(dialog, discord_selectors.STATUS_INPUT, tag="input",
+             attrs={"data-action": "save-status", "type": "text",
+                    "value": text})
+
+        config = _page_config(
+            self.config,
+            token=self.token,
+            emoji=emoji,
+            saveUrl="/api/v9/users/@me/settings",
+        )
+        return _render_page("Discord",
+                            {"content": content, "menu": menu,
+                             "dialog": dialog},
+                            config)
+
+
+class InstagramApp(_WebApp):
+    """Stand-in for the Instagram login, prompt and edit profile pages."""
+
+    session_cookie = "sessionid"
+
+    def __init__(self, config: WebAppConfig, rng: random.Random) -> None:
+        super().__init__(config, rng)
+        self.bio = ""
+        self.csrf_token = uuid.uuid4().hex
+
+    def handle(self, handler: "_Handler") -> None:
+        method, path = handler.command, handler.path_only.rstrip("/") + "/"
+        if method == "GET" and path == "/accounts/login/":
+            handler.send_html(200, self._login_page())
+        elif method == "POST" and path == "/accounts/login/":
+            handler.read_body()
+            if self.fails("instagram.login"):
+                handler.send_html(500, "Sorry, something went wrong.")
+                return
+            cookie = f"{self.session_cookie}={self.new_session()}; Path=/"
+            csrf = f"csrftoken={self.csrf_token}; Path=/"
+            with self.lock:
+                prompt = self.rng.random() < self.config.save_login_prompt
+            handler.redirect("/accounts/onetap/" if prompt else "/",
+                             cookie, csrf)
+        elif path == "/api/v1/accounts/edit/web_form_data/":
+            # The API answers a logged-out session instead of redirecting.
+            if self.logged_in(handler):
+                handler.send_json(200, {"form_data": self._form_data()})
+            else:
+                handler.send_json(200, {"require_login": True})
+        elif method == "GET" and not self.logged_in(handler):
+            handler.redirect("/accounts/login/")
+        elif method == "GET" and path == "/accounts/onetap/":
+            handler.send_html(200, self._prompt_page())
+        elif method == "GET" and path == "/accounts/edit/":
+            if self.fails("instagram.edit"):
+                handler.send_html(500, "Sorry, something went wrong.")
+            else:
+                handler.send_html(200, self._edit_page())
+        elif method == "GET" and path == "/":
+            handler.send_html(200, _render_page(
+                "Instagram", {"content": _Node("body")},
+                _page_config(self.config)))
+        elif method == "POST" and path == "/api/v1/web/accounts/edit/":
+            self._handle_edit(handler)
+        else:
+            handler.send_html(404, "Not Found")
+
+    def _handle_edit(self, handler: "_Handler") -> None:
+        fields = parse_qs(handler.read_body().decode())
+        if not self.logged_in(handler):
+            handler.send_json(200, {"require_login": True})
+        elif handler.headers.get("X-CSRFToken") != self.csrf_token:
+            handler.send_json(403, {"message": "CSRF token missing"})
+        elif self.fails("instagram.save"):
+            handler.send_json(500, {"status": "fail"})
+        else:
+            with self.lock:
+                self.bio = fields.get("biography", [""])[0]
+            handler.send_json(200, {"status": "ok"})
+
+    def _form_data(self) -> dict:
+        with self.lock:
+            bio = self.bio
+        return {"first_name": "Counters", "email": "counters@example.com",
+                "username": "counters", "phone_number": "",
+                "external_url": "", "biography": bio,
+                "chaining_enabled": True}
+
+    def _login_page(self) -> str:
+        content = _Node("body")
+        _add(content, CSSSelector("#loginForm"), tag="form",
+             attrs={"method": "post", "action": "/accounts/login/"})
+        _add(content, instagram_selectors.USERNAME_INPUT,
+             attrs={"name": "username", "type": "text"})
+        _add(content, instagram_selectors.PASSWORD_INPUT,
+             attrs={"name": "password", "type": "password"})
+        _add(content, instagram_selectors.LOGIN_BUTTON,
+             attrs={"type": "submit"}, text="Log in")
+        return _render_page("Instagram", {"content": content},
+                            _page_config(self.config))
+
+    def _prompt_page(self) -> str:
+        content = _Node("body")
+        _add(content, instagram_selectors.NOT_NOW_BUTTON,
+             attrs={"data-action": "navigate",
+                    "data-href": "/accounts/edit/"},
+             text="Not now")
+        return _render_page("Instagram", {"content": content},
+                            _page_config(self.config))
+
+    def _edit_page(self) -> str:
+        with self.lock:
+            bio = self.bio
+        content = _Node("body")
+        _add(content, instagram_selectors.SUBMIT_BUTTON,
+             attrs={"data-action": "save-bio"}, text="Submit")
+        _add(content, instagram_selectors.BIO_BOX, tag="textarea",
+             attrs={"data-field": "biography"}, text=bio)
+        config = _page_config(self.config, csrfToken=self.csrf_token,
+                              saveUrl="/api/v1/web/accounts/edit/")
+        return _render_page("Instagram", {"content": content}, config)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    app: _WebApp
+
+    def do_GET(self) -> None:  # pylint: disable=invalid-name
+        self._handle()
+
+    def do_POST(self) -> None:  # pylint: disable=invalid-name
+        self._handle()
+
+    def do_PATCH(self) -> None:  # pylint: disable=invalid-name
+        self._handle()
+
+    def log_message(self, format, *args) -> None:  # pylint: disable=W0622
+        pass
+
+    @property
+    def path_only(self) -> str:
+        return urlsplit(self.path).path
+
+    @property
+    def cookies(self) -> dict[str, str]:
+        cookie = SimpleCookie(self.headers.get("Cookie") or "")
+        return {name: morsel.value for name, morsel in cookie.items()}
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length)
+
+    def send_html(self, status: int, body: str) -> None:
+        self._send(status, "text/html; charset=utf-8", body.encode())
+
+    def send_json(self, status: int, body: dict) -> None:
+        self._send(status, "application/json", json.dumps(body).encode())
+
+    def redirect(self, location: str, *cookies: str) -> None:
+        self.send_response(303)
+        self.send_header("Location", location)
+        for cookie in cookies:
+            self.send_header("Set-Cookie", cookie)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def _send(self, status: int, content_type: str, payload: bytes) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _handle(self) -> None:
+        self.app.count(self.command, self.path_only)
+        if self.app.config.response_delay:
+            time.sleep(self.app.config.response_delay)
+        self.app.handle(self)
+
+
+class StubWebApps:
+    """The Discord and Instagram stand-ins, served from background threads."""
+
+    def __init__(self, config: WebAppConfig | None = None) -> None:
+        self.config = config or WebAppConfig()
+        rng = random.Random(self.config.seed)
+        self.discord = DiscordApp(self.config, rng)
+        self.instagram = InstagramApp(self.config, rng)
+        self._servers = [self._serve(self.discord),
+                         self._serve(self.instagram)]
+        self._threads = [
+            threading.Thread(target=server.serve_forever, daemon=True,
+                             name=f"stub-{type(app).__name__}")
+            for server, app in zip(self._servers,
+                                   (self.discord, self.instagram))
+        ]
+
+    @property
+    def discord_url(self) -> str:
+        return _server_url(self._servers[0])
+
+    @property
+    def instagram_url(self) -> str:
+        return _server_url(self._servers[1])
+
+    @property
+    def environment(self) -> dict[str, str]:
+        """Environment variables pointing the program at the stand-ins."""
+        return {
+            "DISCORD_URL": self.discord_url,
+            "DISCORD_API_URL": f"{self.discord_url}/api/v9",
+            "INSTAGRAM_URL": self.instagram_url,
+        }
+
+    def snapshot(self) -> Counter[str]:
+        """Copy of the request counts of both apps, keyed by
+        "<app> <method> <path>"."""
+        counts = Counter[str]()
+        for name, app in (("discord", self.discord),
+                          ("instagram", self.instagram)):
+            with app.lock:
+                counts.update({f"{name} {key}": count
+                               for key, count in app.counts.items()})
+        return counts
+
+    def start(self) -> "StubWebApps":
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self) -> None:
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self) -> "StubWebApps":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    @staticmethod
+    def _serve(app: _WebApp) -> ThreadingHTTPServer:
+        handler = type("Handler", (_Handler,), {"app": app})
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.daemon_threads = True
+        return server
+
+
+def _server_url(server: ThreadingHTTPServer) -> str:
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}"
+
+
+def parse_failures(pairs: list[str]) -> dict[str, float]:
+    """Parse `POINT=PROBABILITY` pairs, checking the point names."""
+    failures = dict[str, float]()
+    for pair in pairs:
+        point, _, probability = pair.partition("=")
+        if point not in FAILURE_POINTS:
+            raise ValueError(f"unknown failure point {point!r}, expected "
+                             f"one of: {', '.join(FAILURE_POINTS)}")
+        failures[point] = float(probability or 1.0)
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.stub_web_apps",
+        description="Serve local stand-ins for the Discord and Instagram "
+        "web apps.",
+        epilog="Failure points: " + "; ".join(
+            f"{point}: {effect}" for point, effect in FAILURE_POINTS.items()),
+    )
+    parser.add_argument("--response-delay", type=float, default=0.05)
+    parser.add_argument("--render-delay", type=float, default=0.3)
+    parser.add_argument("--popup-delay", type=float, default=0.1)
+    parser.add_argument("--save-login-prompt", type=float, default=1.0,
+                        metavar="PROBABILITY")
+    parser.add_argument("--fail", nargs="*", default=[],
+                        metavar="POINT=PROBABILITY",
+                        help="inject failures at the given points")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    try:
+        failures = parse_failures(args.fail)
+    except ValueError as error:
+        parser.error(str(error))
+    config = WebAppConfig(
+        response_delay=args.response_delay,
+        render_delay=args.render_delay,
+        popup_delay=args.popup_delay,
+        save_login_prompt=args.save_login_prompt,
+        failures=failures,
+        seed=args.seed,
+    )
+    with StubWebApps(config) as apps:
+        for name, value in apps.environment.items():
+            print(f"{name}={value}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
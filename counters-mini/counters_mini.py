@@ -7,24 +7,62 @@ official web API to make requests to. At the moment, those are:
 
     - Spotify
     - GitHub
+
+Any number of config files can be updated at once, e.g. one per person:
+targets sharing credentials share one client (a single token refresh and
+connection pool), and requests are made on a small pool of threads.
+
+By default it only needs the standard library (and python-dotenv): the
+few API calls are made over keep-alive `http.client` connections and the
+config is checked by a small built-in validator. Pass --libraries to use
+PyGithub, tekore and jsonschema instead.
 """
 
 # pylint: disable=missing-class-docstring,missing-function-docstring
+# pylint: disable=import-outside-toplevel
 
 import argparse
+import base64
 import functools
+import glob
+import http.client
 import json
 import os
+import re
 import sys
+import threading
 import traceback
+import urllib.parse
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Iterable, NoReturn, TypedDict
+from typing import Any, Iterable, NamedTuple, NoReturn, Protocol, TypedDict
 
 import dotenv
-import github
-import jsonschema
-import tekore
+
+# Overridable, e.g. to point at local stub servers.
+SPOTIFY_API_URL = os.environ.get("SPOTIFY_API_URL",
+                                 "https://api.spotify.com/v1/")
+SPOTIFY_TOKEN_URL = os.environ.get("SPOTIFY_TOKEN_URL",
+                                   "https://accounts.spotify.com/api/token")
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com")
+
+REQUEST_TIMEOUT = 10.0
+"""Time in seconds to wait for a response before giving up."""
+
+USER_AGENT = "counters-mini"
+"""User-Agent to send (GitHub rejects requests without one)."""
+
+DEFAULT_JOBS = 4
+"""Default number of requests to make at once."""
+
+GITHUB = "GitHub"
+SPOTIFY = "Spotify"
+
+GITHUB_CREDENTIALS = ("GITHUB_PAT",)
+SPOTIFY_CREDENTIALS = ("SPOTIFY_CLIENT_ID", "SPOTIFY_CLIENT_SECRET",
+                       "SPOTIFY_USER_REFRESH")
+"""Environment variables (or .env entries) holding the credentials."""
 
 
 class SpotifyPlaylistConfig(TypedDict):
@@ -45,25 +83,108 @@ class BiosConfig(TypedDict):
     github: GitHubConfig
 
 
+Failure = tuple[str, Exception]
+"""What failed (a target, or a config file), and why."""
+
+Target = tuple[str, Any]
+"""Label of a target, and its part of the config."""
+
 print_error = functools.partial(print, file=sys.stderr)
 
 
-def load_bios_config(config_path: Path, schema_path: Path) -> BiosConfig:
+class ValidationError(ValueError):
+    """The JSON to load doesn't match the schema."""
+
+
+_JSON_TYPES: dict[str, Any] = {
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "string": lambda value: isinstance(value, str),
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None,
+    "integer": lambda value: isinstance(value, int)
+    and not isinstance(value, bool),
+    "number": lambda value: isinstance(value, (int, float))
+    and not isinstance(value, bool),
+}
+
+
+def validate(instance: Any, schema: dict, path: str = "$") -> None:
+    """Validate `instance` against the subset of JSON Schema we use.
+
+    Supports `type`, `enum`, `pattern`, `properties`, `required`,
+    `items` and `uniqueItems`. Other keywords are ignored.
+
+    Raises:
+        ValidationError: If the instance is invalid, naming where.
+    """
+    types = schema.get("type")
+    if types is not None:
+        if isinstance(types, str):
+            types = [types]
+        if not any(_JSON_TYPES[name](instance) for name in types):
+            raise ValidationError(
+                f"{path}: {instance!r} is not of type {' or '.join(types)}")
+
+    if "enum" in schema and instance not in schema["enum"]:
+        raise ValidationError(
+            f"{path}: {instance!r} is not one of {schema['enum']!r}")
+
+    if isinstance(instance, str) and "pattern" in schema:
+        if re.search(schema["pattern"], instance) is None:
+            raise ValidationError(
+                f"{path}: {instance!r} does not match {schema['pattern']!r}")
+
+    if isinstance(instance, dict):
+        for key in schema.get("required", ()):
+            if key not in instance:
+                raise ValidationError(
+                    f"{path}: {key!r} is a required property")
+        for key, subschema in schema.get("properties", {}).items():
+            if key in instance:
+                validate(instance[key], subschema, f"{path}.{key}")
+
+    if isinstance(instance, list):
+        if schema.get("uniqueItems"):
+            encoded = [json.dumps(item, sort_keys=True) for item in instance]
+            if len(set(encoded)) != len(encoded):
+                raise ValidationError(f"{path}: has non-unique elements")
+        if "items" in schema:
+            for index, item in enumerate(instance):
+                validate(item, schema["items"], f"{path}[{index}]")
+
+
+@functools.cache
+def load_schema(schema_path: Path) -> dict:
+    with schema_path.open("rt", encoding="utf-8") as schema_file:
+        return json.load(schema_file)
+
+
+def load_bios_config(
+    config_path: Path,
+    schema_path: Path,
+    use_jsonschema: bool = False,
+) -> BiosConfig:
     """Validate the JSON to load, returning it if successful.
 
     Raises:
-        jsonschema.ValidationError: If the JSON to load is invalid.
-        jsonschema.SchemaError: If the schema itself is invalid.
+        ValidationError: If the JSON to load is invalid.
+        jsonschema.ValidationError: Instead, with `use_jsonschema`.
+        jsonschema.SchemaError: If the schema itself is invalid (only
+        checked with `use_jsonschema`).
 
     Returns:
         BiosConfig: The JSON data if validated successfully.
     """
     with config_path.open("rt", encoding="utf-8") as config_file:
         data = json.load(config_file)
-    with schema_path.open("rt", encoding="utf-8") as schema_file:
-        schema = json.load(schema_file)
+    schema = load_schema(schema_path)
 
-    jsonschema.validate(instance=data, schema=schema)
+    if use_jsonschema:
+        import jsonschema
+        jsonschema.validate(instance=data, schema=schema)
+    else:
+        validate(data, schema)
     return data
 
 
@@ -98,17 +219,218 @@ def format_error(error: Exception) -> str:
     return "".join(traceback.format_exception(error)) + "\n"
 
 
-def dump_and_exit(errors: Iterable[Exception]) -> NoReturn:
-    any_error = False
-    for error in errors:
+def dump_and_exit(failures: Iterable[Failure]) -> NoReturn:
+    failures = list(failures)
+    for label, error in failures:
         formatted_error = format_error(error)
-        print_error(formatted_error, file=sys.stderr)
-        any_error = True
-    sys.exit(1 if any_error else 0)
+        print_error(f"{label}:\n{formatted_error}", file=sys.stderr)
+    if failures:
+        print_error(f"{len(failures)} target(s) FAILED.")
+    sys.exit(1 if failures else 0)
+
+
+class HttpError(Exception):
+    def __init__(self, method: str, url: str, status: int, body: bytes):
+        super().__init__(f"{method} {url} failed with {status}: "
+                         f"{body[:200].decode(errors='replace')}")
+        self.status = status
+
+
+class HttpTransport:
+    """Pool of keep-alive HTTP(S) connections per host, safe to share
+    between threads (each request takes a connection of its own)."""
+
+    def __init__(self, timeout: float = REQUEST_TIMEOUT) -> None:
+        self.timeout = timeout
+        self._idle = dict[tuple[str, str],
+                          list[http.client.HTTPConnection]]()
+        self._lock = threading.Lock()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        headers: dict[str, str] | None = None,
+        body: bytes | None = None,
+    ) -> Any:
+        """Make a request, returning the decoded JSON response body.
+
+        Raises:
+            HttpError: The server answered with an error status.
+        """
+        parts = urllib.parse.urlsplit(url)
+        target = parts.path or "/"
+        if parts.query:
+            target += f"?{parts.query}"
+        all_headers = {"User-Agent": USER_AGENT, **(headers or {})}
+
+        key = (parts.scheme, parts.netloc)
+        for attempt in range(2):
+            connection = self._checkout(key)
+            try:
+                connection.request(method, target, body=body,
+                                   headers=all_headers)
+                response = connection.getresponse()
+                payload = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError,
+                    BrokenPipeError):
+                # The server dropped the idle connection: reconnect once.
+                connection.close()
+                if attempt > 0:
+                    raise
+                continue
+            except BaseException:
+                connection.close()
+                raise
+            break
+
+        if response.will_close:
+            connection.close()
+        else:
+            self._checkin(key, connection)
+        if response.status >= 400:
+            raise HttpError(method, url, response.status, payload)
+        return json.loads(payload) if payload else None
+
+    def close(self) -> None:
+        with self._lock:
+            for connections in self._idle.values():
+                for connection in connections:
+                    connection.close()
+            self._idle.clear()
+
+    def _checkout(self, key: tuple[str, str]) -> http.client.HTTPConnection:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop()
+        scheme, netloc = key
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def _checkin(
+        self,
+        key: tuple[str, str],
+        connection: http.client.HTTPConnection,
+    ) -> None:
+        with self._lock:
+            self._idle.setdefault(key, []).append(connection)
+
+
+class GitHubClient(Protocol):
+    def edit_bio(self, bio: str) -> None: ...
+
+
+class SpotifyClient(Protocol):
+    def playlist_change_details(
+        self,
+        playlist_id: str,
+        name: str | None = None,
+        description: str | None = None,
+    ) -> None: ...
+
+
+class HttpGitHubClient:
+    """The one GitHub REST API call we need, over `HttpTransport`."""
+
+    def __init__(self, transport: HttpTransport, token: str) -> None:
+        self.transport = transport
+        self.headers = {
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github+json",
+            "Content-Type": "application/json",
+        }
+
+    def edit_bio(self, bio: str) -> None:
+        self.transport.request(
+            "PATCH", f"{GITHUB_API_URL}/user", headers=self.headers,
+            body=json.dumps({"bio": bio}).encode("utf-8"),
+        )
+
+
+class PyGithubClient:
+    """`GitHubClient` backed by PyGithub, for --libraries."""
+
+    def __init__(self, token: str) -> None:
+        import github
+        auth = github.Auth.Token(token)
+        self.client = github.Github(auth=auth, base_url=GITHUB_API_URL)
+
+    def edit_bio(self, bio: str) -> None:
+        user = self.client.get_user()
+        user.edit(bio=bio)
+
+
+class HttpSpotifyClient:
+    """The Spotify Web API calls we need, over `HttpTransport`."""
+
+    def __init__(self, transport: HttpTransport, access_token: str) -> None:
+        self.transport = transport
+        self.headers = {
+            "Authorization": f"Bearer {access_token}",
+            "Content-Type": "application/json",
+        }
+
+    @classmethod
+    def from_refresh_token(
+        cls,
+        transport: HttpTransport,
+        client_id: str,
+        client_secret: str,
+        refresh_token: str,
+    ) -> "HttpSpotifyClient":
+        """Refresh a user access token and return a client using it."""
+        basic = base64.b64encode(f"{client_id}:{client_secret}".encode())
+        form = urllib.parse.urlencode({
+            "grant_type": "refresh_token",
+            "refresh_token": refresh_token,
+        })
+        token = transport.request(
+            "POST", SPOTIFY_TOKEN_URL,
+            headers={
+                "Authorization": f"Basic {basic.decode()}",
+                "Content-Type": "application/x-www-form-urlencoded",
+            },
+            body=form.encode("utf-8"),
+        )
+        return cls(transport, token["access_token"])
+
+    def playlist_change_details(
+        self,
+        playlist_id: str,
+        name: str | None = None,
+        description: str | None = None,
+    ) -> None:
+        payload = {"name": name, "description": description}
+        payload = {key: value for key, value in payload.items()
+                   if value is not None}
+        if not payload:
+            return
+        self.transport.request(
+            "PUT", f"{SPOTIFY_API_URL}playlists/{playlist_id}",
+            headers=self.headers, body=json.dumps(payload).encode("utf-8"),
+        )
+
+
+def tekore_client(
+    client_id: str,
+    client_secret: str,
+    refresh_token: str,
+) -> SpotifyClient:
+    """Return a tekore client (already a `SpotifyClient`), for --libraries."""
+    import tekore
+    token = tekore.refresh_user_token(
+        client_id=client_id,
+        client_secret=client_secret,
+        refresh_token=refresh_token,
+    )
+    return tekore.Spotify(token.access_token)
 
 
 class GitHubUpdater:
-    def __init__(self, config: GitHubConfig, client: github.Github) -> None:
+    def __init__(self, config: GitHubConfig, client: GitHubClient) -> None:
         self.config = config
         self.client = client
 
@@ -116,8 +438,7 @@ class GitHubUpdater:
         bio = self.resolve_bio(today)
         if bio is None:
             return
-        user = self.client.get_user()
-        user.edit(bio=bio)
+        self.client.edit_bio(bio)
 
     def resolve_bio(self, today: date) -> str | None:
         start = self.config["start"]
@@ -132,7 +453,7 @@ class SpotifyPlaylistUpdater:
     def __init__(
         self,
         config: SpotifyPlaylistConfig,
-        client: tekore.Spotify,
+        client: SpotifyClient,
     ) -> None:
         self.config = config
         self.client = client
@@ -144,8 +465,8 @@ class SpotifyPlaylistUpdater:
 
         self.client.playlist_change_details(
             playlist_id=playlist_id,
-            name=resolved_name,  # type: ignore
-            description=resolved_description,  # type: ignore
+            name=resolved_name,
+            description=resolved_description,
         )
 
     def resolve_description(self, today: date) -> str | None:
@@ -210,72 +531,202 @@ parser.add_argument(
 )
 parser.add_argument(
     "-c", "--config",
-    dest="config_path",
+    dest="config_paths",
     metavar="PATH",
-    type=Path,
+    nargs="+",
     required=True,
-    help="path to configuration file",
+    help="path to configuration file, directory of them, or glob pattern "
+    "(each file may have a .env file of credentials next to it)",
+)
+parser.add_argument(
+    "-j", "--jobs",
+    metavar="N",
+    type=int,
+    default=DEFAULT_JOBS,
+    help=f"number of requests to make at once (defaults to {DEFAULT_JOBS})",
+)
+parser.add_argument(
+    "--libraries",
+    action="store_true",
+    help="use PyGithub, tekore and jsonschema instead of the built-in "
+    "HTTP client and validator (slower to start)",
 )
 
 
-class CountersProgram:
-    def __init__(self, config: BiosConfig, today: date) -> None:
-        self.config = config
-        self.today = today
+class ConfigFile(NamedTuple):
+    path: Path
+    config: BiosConfig
+    env: dict[str, str | None]
+    """Credentials to use for this file's targets."""
+
 
-    def run_all(self) -> list[Exception]:
-        return self.run_github() + self.run_spotify()
+def resolve_config_paths(patterns: Iterable[str]) -> list[Path]:
+    """Expand files, directories (their *.json) and glob patterns.
 
-    def run_github(self) -> list[Exception]:
+    Raises:
+        FileNotFoundError: If a pattern doesn't match any file.
+    """
+    paths = dict[Path, None]()
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            matches = sorted(path.glob("*.json"))
+        elif glob.has_magic(pattern):
+            matches = sorted(Path(match) for match in glob.glob(pattern))
+        else:
+            matches = [path]
+        if not matches or not matches[0].exists():
+            raise FileNotFoundError(f"No configuration file at {pattern!r}")
+        paths.update(dict.fromkeys(matches))
+    return list(paths)
+
+
+def load_config_files(
+    paths: Iterable[Path],
+    schema_path: Path,
+    use_jsonschema: bool = False,
+) -> tuple[list[ConfigFile], list[Failure]]:
+    """Load and validate every file, along with its credentials.
+
+    Returns:
+        tuple[list[ConfigFile], list[Failure]]: The valid files, and the
+        errors of the invalid ones.
+    """
+    config_files = list[ConfigFile]()
+    failures = list[Failure]()
+    for path in paths:
         try:
-            auth = github.Auth.Token(os.environ["GITHUB_PAT"])
-            client = github.Github(auth=auth)
-            updater = GitHubUpdater(
-                config=self.config["github"],
-                client=client,
-            )
+            config = load_bios_config(path, schema_path, use_jsonschema)
         except Exception as error:
-            print_error("FAILED to initialize GitHub.")
-            return [error]
+            print_error(f"FAILED to load {path}.")
+            failures.append((str(path), error))
+            continue
+        env: dict[str, str | None] = dict(os.environ)
+        env_path = path.with_suffix(".env")
+        if env_path.is_file():
+            env.update(dotenv.dotenv_values(env_path))
+        config_files.append(ConfigFile(path, config, env))
+    return config_files, failures
 
+
+class CountersProgram:
+    """
+    Update the targets of any number of config files, making one client
+    (token refresh, connection pool) per credential and updating all
+    targets on a bounded pool of threads.
+    """
+
+    def __init__(
+        self,
+        config_files: list[ConfigFile],
+        today: date,
+        use_libraries: bool = False,
+        jobs: int = DEFAULT_JOBS,
+    ) -> None:
+        self.config_files = config_files
+        self.today = today
+        self.use_libraries = use_libraries
+        self.jobs = jobs
+        self.transports = list[HttpTransport]()
+        self._output_lock = threading.Lock()
+
+    def run_all(self) -> list[Failure]:
+        groups = self.group_targets()
+        failures = list[Failure]()
         try:
-            updater.update(self.today)
+            with ThreadPoolExecutor(self.jobs) as executor:
+                clients = list(executor.map(self.init_client, groups))
+                futures = list[Future[Failure | None]]()
+                for group, client in zip(groups, clients):
+                    platform = group[0]
+                    if isinstance(client, Exception):
+                        print_error(f"FAILED to initialize {platform}.")
+                        failures.extend((label, client)
+                                        for label, _ in groups[group])
+                        continue
+                    for label, target_config in groups[group]:
+                        futures.append(executor.submit(
+                            self.run_target, platform, label,
+                            target_config, client,
+                        ))
+                for future in futures:
+                    failure = future.result()
+                    if failure is not None:
+                        failures.append(failure)
+        finally:
+            for transport in self.transports:
+                transport.close()
+        return failures
+
+    def group_targets(self) -> dict[tuple[str, tuple], list[Target]]:
+        """Group the targets of all files by platform and credential."""
+        groups = dict[tuple[str, tuple], list[Target]]()
+        for config_file in self.config_files:
+            path, config, env = config_file
+            github_key = (GITHUB, _credential(env, GITHUB_CREDENTIALS))
+            groups.setdefault(github_key, []).append(
+                (f"GitHub [{path.name}]", config["github"]))
+
+            spotify_key = (SPOTIFY, _credential(env, SPOTIFY_CREDENTIALS))
+            for playlist_config in config["spotify"]:
+                playlist_id = playlist_config["playlist_id"]
+                comment = playlist_config.get("comment") or "?"
+                label = (f"Spotify playlist {playlist_id} ({comment}) "
+                         f"[{path.name}]")
+                groups.setdefault(spotify_key, []).append(
+                    (label, playlist_config))
+        return groups
+
+    def init_client(
+        self,
+        group: tuple[str, tuple],
+    ) -> GitHubClient | SpotifyClient | Exception:
+        """Make the client of a group, or return why it failed."""
+        platform, credential = group
+        names = GITHUB_CREDENTIALS if platform == GITHUB \
+            else SPOTIFY_CREDENTIALS
+        try:
+            for name, value in zip(names, credential):
+                if value is None:
+                    raise KeyError(name)
+            if self.use_libraries:
+                if platform == GITHUB:
+                    return PyGithubClient(*credential)
+                return tekore_client(*credential)
+            transport = HttpTransport()
+            self.transports.append(transport)
+            if platform == GITHUB:
+                return HttpGitHubClient(transport, *credential)
+            return HttpSpotifyClient.from_refresh_token(transport,
+                                                        *credential)
         except Exception as error:
-            print_error("FAILED to update GitHub.")
-            return [error]
-
-        print("Updated GitHub.")
-        return []
+            return error
 
-    def run_spotify(self) -> list[Exception]:
+    def run_target(
+        self,
+        platform: str,
+        label: str,
+        target_config: Any,
+        client: Any,
+    ) -> Failure | None:
+        updater: GitHubUpdater | SpotifyPlaylistUpdater
+        if platform == GITHUB:
+            updater = GitHubUpdater(target_config, client)
+        else:
+            updater = SpotifyPlaylistUpdater(target_config, client)
         try:
-            token = tekore.refresh_user_token(
-                client_id=os.environ["SPOTIFY_CLIENT_ID"],
-                client_secret=os.environ["SPOTIFY_CLIENT_SECRET"],
-                refresh_token=os.environ["SPOTIFY_USER_REFRESH"],
-            )
-            client = tekore.Spotify(token.access_token)
+            updater.update(self.today)
         except Exception as error:
-            print_error("FAILED to initialize Spotify.")
-            return [error]
-
-        errors = list[Exception]()
-        for playlist_config in self.config["spotify"]:
-            updater = SpotifyPlaylistUpdater(playlist_config, client)
-            playlist_id = playlist_config["playlist_id"]
-            comment = playlist_config["comment"] or "?"
-            try:
-                updater.update(self.today)
-            except Exception as error:
-                print_error(
-                    f"FAILED to update Spotify playlist {playlist_id} "
-                    f"({comment})."
-                )
-                errors.append(error)
-            else:
-                print(f"Updated Spotify playlist {playlist_id} ({comment}).")
+            with self._output_lock:
+                print_error(f"FAILED to update {label}.")
+            return (label, error)
+        with self._output_lock:
+            print(f"Updated {label}.")
+        return None
 
-        return errors
+
+def _credential(env: dict[str, str | None], names: tuple[str, ...]) -> tuple:
+    return tuple(env.get(name) for name in names)
 
 
 def main() -> None:
@@ -283,13 +734,20 @@ def main() -> None:
 
     args = parser.parse_args()
     date_to_update_to: date = args.date_to_update_to
-    config_path: Path = args.config_path
+    use_libraries: bool = args.libraries
     schema_path = Path(__file__).parent / "bios.schema.json"
 
-    bios_config = load_bios_config(config_path, schema_path)
-    program = CountersProgram(bios_config, date_to_update_to)
-    errors = program.run_all()
-    dump_and_exit(errors)
+    try:
+        config_paths = resolve_config_paths(args.config_paths)
+    except FileNotFoundError as error:
+        parser.error(str(error))
+
+    config_files, failures = load_config_files(config_paths, schema_path,
+                                               use_libraries)
+    program = CountersProgram(config_files, date_to_update_to,
+                              use_libraries, max(args.jobs, 1))
+    failures += program.run_all()
+    dump_and_exit(failures)
 
 
 if __name__ == "__main__":
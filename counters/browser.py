@@ -0,0 +1,276 @@
+"""browser.py
+
+Shared construction of the Edge web driver used by both the counters
+program and the status-logger subprogram, including the optional "lean"
+profile that keeps pages from downloading anything the Selenium flows
+don't actually need.
+"""
+
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.edge.options import Options
+from selenium.webdriver.edge.service import Service
+
+from .config import WAIT_TIMEOUT
+from .driver_cache import resolve_driver_path
+from .logger import log
+from .tracing import span
+from .webdriver_stats import instrument
+
+LEAN_ARGUMENTS = [
+    "--blink-settings=imagesEnabled=false",
+    "--autoplay-policy=user-gesture-required",
+    "--mute-audio",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--no-first-run",
+]
+"""Extra browser switches used in lean mode."""
+
+BACKGROUND_TAB_ARGUMENTS = [
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+]
+"""Browser switches keeping pages in background tabs at full speed."""
+
+LEAN_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.managed_default_content_settings.media_stream": 2,
+}
+"""Browser preferences used in lean mode (2 means "block")."""
+
+BLOCKED_RESOURCE_PATTERNS = [
+    # Images and avatars. The <img> elements are still created (and
+    # keep their alt text), their contents just never get fetched.
+    "*.png*", "*.jpg*", "*.jpeg*", "*.gif*", "*.webp*", "*.avif*",
+    "*.ico*",
+    # Fonts.
+    "*.woff*", "*.ttf*", "*.otf*",
+    # Audio and video.
+    "*.mp4*", "*.webm*", "*.mp3*", "*.ogg*", "*.m4a*",
+]
+"""URL patterns of resource types blocked in lean mode."""
+
+BLOCKED_HOST_PATTERNS = [
+    # Generic third-party analytics and error reporting.
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*sentry.io*",
+    "*hotjar.com*",
+    # First-party telemetry endpoints of the apps we drive.
+    "*discord.com/api/v*/science*",
+    "*discord.com/api/v*/metrics*",
+    "*media.discordapp.net*",
+    "*instagram.com/logging/*",
+    "*instagram.com/ajax/bz*",
+]
+"""URL patterns of tracker and telemetry hosts blocked in lean mode."""
+
+_PAGE_METRICS_SCRIPT = """
+const nav = performance.getEntriesByType("navigation")[0];
+const resources = performance.getEntriesByType("resource");
+let bytes = nav ? nav.transferSize : 0;
+for (const entry of resources) {
+    bytes += entry.transferSize;
+}
+return {
+    bytes: bytes,
+    resources: resources.length,
+    ready: nav ? nav.domContentLoadedEventEnd : null,
+    heap: performance.memory ? performance.memory.usedJSHeapSize : null,
+};
+"""
+
+
+@dataclass
+class PageMetrics:
+    """Resource usage of the page currently loaded in the driver.
+
+    Byte counts come from the Resource Timing API, so cross-origin
+    responses without a `Timing-Allow-Origin` header count as 0 bytes.
+    Treat the number as a lower bound that is comparable across runs.
+    """
+    bytes_transferred: int
+    resource_count: int
+    ready_ms: float | None
+    js_heap_bytes: int | None
+
+    def __str__(self) -> str:
+        text = (f"{self.bytes_transferred / 1e6:.2f} MB transferred "
+                f"over {self.resource_count} resources")
+        if self.ready_ms is not None:
+            text += f", DOM ready in {self.ready_ms / 1000:.2f}s"
+        if self.js_heap_bytes is not None:
+            text += f", JS heap {self.js_heap_bytes / 1e6:.1f} MB"
+        return text
+
+
+def create_edge_driver(
+    headless: bool,
+    driver_path: Path | None,
+    lean: bool = False,
+    debugger_address: str | None = None,
+    logging_prefs: dict[str, str] | None = None,
+    tabs: bool = False,
+) -> webdriver.Edge:
+    """Initialize and return a configured Edge web driver instance.
+
+    Args:
+        headless (bool): Whether to run without a browser window.
+        driver_path (Path | None): Path to the web driver executable.
+        If None, resolve one from the local driver cache.
+        lean (bool, optional): Whether to block images, media, fonts and
+        trackers. Defaults to False.
+        debugger_address (str | None, optional): Remote debugging
+        address of an already running browser to attach to instead of
+        launching a new one. Defaults to None.
+        logging_prefs (dict[str, str] | None, optional): Log levels of
+        the driver logs to record, e.g. to read network events back with
+        `driver.get_log("performance")`. Defaults to None.
+        tabs (bool, optional): Whether pages will load in background
+        tabs (`--tabs`), which then mustn't be throttled. Defaults to
+        False.
+    """
+    if driver_path is None:
+        executable_path = resolve_driver_path()
+    else:
+        executable_path = str(driver_path)
+
+    service = Service(executable_path=executable_path)
+    options = edge_options(headless, lean, debugger_address, logging_prefs,
+                           tabs)
+
+    start = time.perf_counter()
+    with span("driver.start", attach=debugger_address is not None):
+        driver = webdriver.Edge(service=service, options=options)
+        instrument(driver)
+        driver.implicitly_wait(WAIT_TIMEOUT)
+        if debugger_address is None:
+            driver.maximize_window()
+    message = f"Driver started in {time.perf_counter() - start:.2f}s."
+    print(message)
+    log.info(message)
+
+    # The default buffer of 250 entries is easily exhausted by the web
+    # apps we drive, which would make the byte counts undercount.
+    driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {
+        "source": "performance.setResourceTimingBufferSize(10000);",
+    })
+    if lean:
+        block_nonessential_requests(driver)
+
+    return driver
+
+
+def create_remote_driver(
+    url: str,
+    headless: bool,
+    lean: bool = False,
+    logging_prefs: dict[str, str] | None = None,
+    tabs: bool = False,
+) -> webdriver.Remote:
+    """Start an Edge session on a remote Selenium server or grid.
+
+    Takes the same options as `create_edge_driver`, except that lean
+    mode can't block requests: the remote driver has no DevTools
+    commands, so it only gets the lean switches and preferences.
+    """
+    options = edge_options(headless, lean, None, logging_prefs, tabs)
+
+    start = time.perf_counter()
+    with span("driver.start", remote=url):
+        driver = webdriver.Remote(command_executor=url, options=options)
+        instrument(driver)  # type: ignore
+        driver.implicitly_wait(WAIT_TIMEOUT)
+        driver.maximize_window()
+    message = (f"Remote driver started at {url} in "
+               f"{time.perf_counter() - start:.2f}s.")
+    print(message)
+    log.info(message)
+    return driver
+
+
+def edge_options(
+    headless: bool,
+    lean: bool = False,
+    debugger_address: str | None = None,
+    logging_prefs: dict[str, str] | None = None,
+    tabs: bool = False,
+) -> Options:
+    """Return the browser options for `create_edge_driver`."""
+    options = Options()
+    if logging_prefs is not None:
+        options.set_capability("ms:loggingPrefs", logging_prefs)
+    # An attached browser was already launched with its own switches.
+    if debugger_address is not None:
+        options.debugger_address = debugger_address
+        return options
+
+    if headless:
+        options.add_argument("--headless")
+    # With --tabs, all but one of the pages load in background tabs.
+    if tabs:
+        for argument in BACKGROUND_TAB_ARGUMENTS:
+            options.add_argument(argument)
+    if lean:
+        for argument in LEAN_ARGUMENTS:
+            options.add_argument(argument)
+        options.add_experimental_option("prefs", LEAN_PREFS)
+    return options
+
+
+def block_nonessential_requests(driver: webdriver.Edge) -> None:
+    """Intercept requests over the DevTools protocol in lean mode.
+
+    This only applies to the current tab, so it has to be repeated for
+    every tab opened afterwards.
+    """
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {
+        "urls": BLOCKED_RESOURCE_PATTERNS + BLOCKED_HOST_PATTERNS,
+    })
+
+
+def reset_tabs(driver: webdriver.Remote) -> bool:
+    """Leave the browser with one blank tab, for the next run to reuse.
+
+    Returns:
+        bool: Whether it worked, as opposed to the browser being broken.
+    """
+    try:
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+        driver.get("about:blank")
+    except WebDriverException:
+        return False
+    return True
+
+
+def get_page_metrics(driver: webdriver.Edge) -> PageMetrics | None:
+    """
+    Return the resource usage of the currently loaded page, or None if
+    it could not be measured (e.g. the page was mid-navigation).
+    """
+    try:
+        result: dict = driver.execute_script(_PAGE_METRICS_SCRIPT)
+    except WebDriverException:
+        return None
+
+    return PageMetrics(
+        bytes_transferred=int(result["bytes"]),
+        resource_count=int(result["resources"]),
+        ready_ms=result["ready"],
+        js_heap_bytes=result["heap"],
+    )
@@ -0,0 +1,200 @@
+"""browser_manager.py
+
+Manage a long-lived local Edge instance that runs can attach to over its
+remote debugging address instead of cold-launching a browser each time.
+
+The browser is started once on demand and left running between runs.
+Every run that attaches to it counts as one use, and the browser is
+recycled (closed, to be relaunched by the next run) after too many uses
+or once its JS heap grows past a limit.
+"""
+
+import json
+import shutil
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+from .browser import LEAN_ARGUMENTS, get_page_metrics, reset_tabs
+from .config import (EDGE_BINARY, SHARED_BROWSER_DIR,
+                     SHARED_BROWSER_MAX_HEAP_MB, SHARED_BROWSER_MAX_USES,
+                     SHARED_BROWSER_PORT)
+from .logger import log
+
+STATE_PATH = SHARED_BROWSER_DIR / "state.json"
+"""Absolute path to the JSON file tracking the shared browser's usage."""
+
+PROFILE_DIR = SHARED_BROWSER_DIR / "profile"
+"""Absolute path to the user data directory of the shared browser."""
+
+STARTUP_TIMEOUT = 15.0
+"""Time in seconds to wait for a launched browser to become healthy."""
+
+_EDGE_CANDIDATES = [
+    r"C:\Program Files (x86)\Microsoft\Edge\Application\msedge.exe",
+    r"C:\Program Files\Microsoft\Edge\Application\msedge.exe",
+    "/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge",
+    "microsoft-edge",
+    "microsoft-edge-stable",
+    "msedge",
+]
+
+
+class SharedBrowser:
+    """Handle to the long-lived browser listening on a local port."""
+
+    def __init__(
+        self,
+        headless: bool,
+        lean: bool = False,
+        port: int = SHARED_BROWSER_PORT,
+    ) -> None:
+        self.headless = headless
+        self.lean = lean
+        self.port = port
+
+    @property
+    def address(self) -> str:
+        """The remote debugging address to pass to the web driver."""
+        return f"127.0.0.1:{self.port}"
+
+    def is_healthy(self) -> bool:
+        """Return whether the browser answers on its debugging port."""
+        url = f"http://{self.address}/json/version"
+        try:
+            with urllib.request.urlopen(url, timeout=1.0) as response:
+                return "Browser" in json.load(response)
+        except (OSError, ValueError):
+            return False
+
+    def ensure_running(self) -> str:
+        """Start the browser if it isn't up yet and return its address.
+
+        Raises:
+            TimeoutError: The launched browser never became healthy.
+        """
+        if self.is_healthy():
+            print(f"Attaching to running browser at {self.address}.")
+            return self.address
+
+        start = time.perf_counter()
+        self._launch()
+        while not self.is_healthy():
+            if time.perf_counter() - start > STARTUP_TIMEOUT:
+                raise TimeoutError(
+                    f"Shared browser did not come up at {self.address} "
+                    f"within {STARTUP_TIMEOUT}s"
+                )
+            time.sleep(0.1)
+
+        self._save_state({"uses": 0, "started": time.time()})
+        message = (f"Shared browser started at {self.address} "
+                   f"in {time.perf_counter() - start:.2f}s.")
+        print(message)
+        log.info(message)
+        return self.address
+
+    def release(self, driver: webdriver.Edge) -> None:
+        """Detach a driver from the browser at the end of a run.
+
+        Counts the run as one use, and closes the browser outright if it
+        has been used too many times or its JS heap has grown too large.
+        The next `ensure_running` then starts a fresh one.
+        """
+        state = self._load_state()
+        state["uses"] = state.get("uses", 0) + 1
+
+        metrics = get_page_metrics(driver)
+        heap_mb = (metrics.js_heap_bytes or 0) / 1e6 if metrics else 0.0
+
+        if state["uses"] >= SHARED_BROWSER_MAX_USES:
+            reason = f"{state['uses']} uses"
+        elif heap_mb >= SHARED_BROWSER_MAX_HEAP_MB:
+            reason = f"JS heap at {heap_mb:.0f} MB"
+        else:
+            reason = None
+
+        if reason is None:
+            reset_tabs(driver)
+            self._save_state(state)
+        else:
+            self._recycle(driver, reason)
+
+        # Attached sessions only detach on quit, leaving the browser up.
+        try:
+            driver.quit()
+        except WebDriverException:
+            pass
+
+    def _recycle(self, driver: webdriver.Edge, reason: str) -> None:
+        message = f"Recycling shared browser ({reason})."
+        print(message)
+        log.info(message)
+        try:
+            driver.execute_cdp_cmd("Browser.close", {})
+        except WebDriverException:
+            pass
+        STATE_PATH.unlink(missing_ok=True)
+
+    def _launch(self) -> None:
+        arguments = [
+            _find_edge_binary(),
+            f"--remote-debugging-port={self.port}",
+            f"--user-data-dir={PROFILE_DIR}",
+            "--no-first-run",
+            "about:blank",
+        ]
+        if self.headless:
+            arguments.insert(1, "--headless=new")
+        if self.lean:
+            arguments[1:1] = LEAN_ARGUMENTS
+
+        PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+        # Detach so the browser outlives this process.
+        if sys.platform == "win32":
+            flags = (subprocess.DETACHED_PROCESS
+                     | subprocess.CREATE_NEW_PROCESS_GROUP)
+            subprocess.Popen(arguments, creationflags=flags,
+                             stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL)
+        else:
+            subprocess.Popen(arguments, start_new_session=True,
+                             stdout=subprocess.DEVNULL,
+                             stderr=subprocess.DEVNULL)
+
+    def _load_state(self) -> dict:
+        try:
+            with STATE_PATH.open("rt", encoding="utf-8") as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self, state: dict) -> None:
+        STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with STATE_PATH.open("wt", encoding="utf-8") as fp:
+            json.dump(state, fp)
+
+
+def _find_edge_binary() -> str:
+    """Locate the Edge executable, preferring the configured one.
+
+    Raises:
+        FileNotFoundError: No Edge executable could be found.
+    """
+    if EDGE_BINARY is not None:
+        return EDGE_BINARY
+    for candidate in _EDGE_CANDIDATES:
+        if Path(candidate).is_file():
+            return candidate
+        found = shutil.which(candidate)
+        if found is not None:
+            return found
+    raise FileNotFoundError(
+        "Could not find the Edge executable, set EDGE_BINARY to its path"
+    )
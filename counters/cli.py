@@ -3,15 +3,23 @@
 Defines the entry point for the Poetry script.
 """
 
+import json
 import logging
 import sys
-from argparse import ArgumentParser, ArgumentTypeError
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
 from datetime import date, datetime, timedelta
 from pathlib import Path
+from typing import Any
 
-from .config import EXIT_FAILURE_STATUS_LOGGER, EXIT_SUCCESS, ProgramOptions
-from .core import CountersProgram
-from .status_logger.core import run_status_logger
+from . import tracing
+from .config import (BACKEND_HTTP, BACKEND_SELENIUM, EXIT_FAILURE,
+                     EXIT_FAILURE_STATUS_LOGGER, EXIT_SUCCESS, FSYNC_ALWAYS,
+                     FSYNC_INTERVAL, FSYNC_NEVER, GRID_URLS, SERVE_HOST,
+                     SERVE_PORT, ProgramOptions)
+from .profiling import PROFILE_ALL, PROFILE_CPU, PROFILE_MEMORY, RunProfiler
+
+# The rest of the program (Selenium, rich, jsonschema, the API clients)
+# is imported in main(), so that --profile also covers the imports.
 
 
 def valid_date(value: str) -> date:
@@ -69,6 +77,76 @@ parser.add_argument(
     type=Path,
     help="custom path to web driver executable to use",
 )
+parser.add_argument(
+    "--lean",
+    action="store_true",
+    help="have Selenium block images, media, fonts and trackers",
+)
+parser.add_argument(
+    "-b", "--backend",
+    choices=(BACKEND_SELENIUM, BACKEND_HTTP),
+    default=BACKEND_SELENIUM,
+    help="how to update Discord and Instagram: through the browser, or "
+    "over HTTP with a saved session, falling back to the browser",
+)
+parser.add_argument(
+    "--hedge",
+    action="store_true",
+    help="race a browser update that runs longer than usual against a "
+    "second attempt in a fresh browser",
+)
+parser.add_argument(
+    "--tabs",
+    action="store_true",
+    help="run the browser updaters at once, each in its own tab of the "
+    "same browser",
+)
+parser.add_argument(
+    "--trace",
+    action="store_true",
+    help="record timing spans and export them as a Chrome trace file",
+)
+parser.add_argument(
+    "--webdriver-stats",
+    action="store_true",
+    help="time every web driver command and report per-command latencies "
+    "and implicit-wait stalls",
+)
+parser.add_argument(
+    "--profile",
+    nargs="?",
+    choices=(PROFILE_ALL, PROFILE_CPU, PROFILE_MEMORY),
+    const=PROFILE_ALL,
+    help="profile CPU time and/or memory allocations of the run "
+    "(including dry runs and -l) and write the profiles under profiles/",
+)
+parser.add_argument(
+    "--resume",
+    action="store_true",
+    help="skip the targets that were already updated for the date with "
+    "the same details, e.g. to retry only the failures of a run",
+)
+parser.add_argument(
+    "--workers",
+    metavar="N",
+    type=int,
+    default=1,
+    help="split the targets by account across N worker processes, each "
+    "with its own browser",
+)
+parser.add_argument(
+    "--grid",
+    metavar="URL",
+    action="append",
+    help="run the browser on this Selenium standalone server or grid "
+    "instead of launching it locally (repeatable, defaults to "
+    "$COUNTERS_GRID_URL)",
+)
+parser.add_argument(
+    "-a", "--attach",
+    action="store_true",
+    help="attach to a long-lived shared browser instead of launching one",
+)
 
 # Special modes.
 
@@ -90,6 +168,25 @@ parser.add_argument(
     action="store_true",
     help="log Discord custom status instead of updating counters",
 )
+parser.add_argument(
+    "--poll",
+    metavar="INTERVAL",
+    type=float,
+    help="with -l, keep the page open and re-read the status every INTERVAL "
+    "seconds, logging it only when it changes",
+)
+parser.add_argument(
+    "--fsync",
+    choices=(FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER),
+    default=FSYNC_INTERVAL,
+    help="with --poll, how often to make the logged statuses durable",
+)
+parser.add_argument(
+    "-L", "--update-and-log-discord",
+    action="store_true",
+    help="after updating Discord, log the resulting status in the same "
+    "browser session",
+)
 
 # Supported platforms. If any of these are included, run those select
 # tasks instead of all.
@@ -116,7 +213,197 @@ parser.add_argument(
 )
 
 
+# Work queue subcommands: `counters queue enqueue|work|stats|requeue-dead`.
+
+queue_parser = ArgumentParser(
+    prog="counters queue",
+    description="Manage the durable work queue of target updates",
+)
+queue_subparsers = queue_parser.add_subparsers(dest="command", required=True)
+
+enqueue_parser = queue_subparsers.add_parser(
+    "enqueue",
+    help="add a job per target to update to a date",
+)
+enqueue_parser.add_argument(
+    "date_to_update_to",
+    nargs="?",
+    type=valid_date,
+    default=date.today(),
+    help="date to update counters to (defaults to today)",
+)
+for flag, name in (("-d", "discord"), ("-i", "instagram"),
+                   ("-s", "spotify"), ("-g", "github")):
+    enqueue_parser.add_argument(
+        flag, f"--{name}",
+        action="store_true",
+        help=f"enqueue the {name} targets (enqueues all if such flags "
+        "omitted)",
+    )
+
+work_parser = queue_subparsers.add_parser(
+    "work",
+    help="consume jobs from the queue (run several to scale out)",
+)
+work_parser.add_argument(
+    "--batch",
+    metavar="N",
+    type=int,
+    default=10,
+    help="maximum number of jobs of an account to lease at once",
+)
+work_parser.add_argument(
+    "--max-jobs",
+    metavar="N",
+    type=int,
+    help="exit after processing this many jobs",
+)
+work_parser.add_argument(
+    "--idle-timeout",
+    metavar="SECONDS",
+    type=float,
+    help="exit once the queue has been empty for this long",
+)
+work_parser.add_argument(
+    "-c", "--console",
+    action="store_true",
+    help="output to console only, don't touch log file",
+)
+work_parser.add_argument(
+    "-w", "--window",
+    action="store_true",
+    help="have Selenium run with a browser window instead of headlessly",
+)
+work_parser.add_argument(
+    "-p", "--path",
+    type=Path,
+    help="custom path to web driver executable to use",
+)
+work_parser.add_argument(
+    "--lean",
+    action="store_true",
+    help="have Selenium block images, media, fonts and trackers",
+)
+work_parser.add_argument(
+    "-b", "--backend",
+    choices=(BACKEND_SELENIUM, BACKEND_HTTP),
+    default=BACKEND_SELENIUM,
+    help="how to update Discord and Instagram",
+)
+work_parser.add_argument(
+    "--hedge",
+    action="store_true",
+    help="race slow browser updates against a fresh browser",
+)
+work_parser.add_argument(
+    "--grid",
+    metavar="URL",
+    action="append",
+    help="run the browser on this Selenium standalone server or grid "
+    "(repeatable, defaults to $COUNTERS_GRID_URL)",
+)
+work_parser.add_argument(
+    "--tabs",
+    action="store_true",
+    help="run the browser updates of a batch at once in tabs",
+)
+
+stats_parser = queue_subparsers.add_parser(
+    "stats",
+    help="show the queue depth, lag and recent dead letters",
+)
+stats_parser.add_argument(
+    "--json",
+    action="store_true",
+    help="print the statistics as JSON",
+)
+
+queue_subparsers.add_parser(
+    "requeue-dead",
+    help="give the dead-lettered jobs a fresh set of attempts",
+)
+
+
+# Local API: `counters serve`.
+
+serve_parser = ArgumentParser(
+    prog="counters serve",
+    description="Serve previews, runs and outcomes over a local HTTP API",
+)
+serve_parser.add_argument(
+    "--host",
+    default=SERVE_HOST,
+    help=f"address to listen on (defaults to {SERVE_HOST})",
+)
+serve_parser.add_argument(
+    "--port",
+    type=int,
+    default=SERVE_PORT,
+    help=f"port to listen on (defaults to {SERVE_PORT})",
+)
+serve_parser.add_argument(
+    "-c", "--console",
+    action="store_true",
+    help="output to console only, don't touch log file",
+)
+serve_parser.add_argument(
+    "-w", "--window",
+    action="store_true",
+    help="have Selenium run with a browser window instead of headlessly",
+)
+serve_parser.add_argument(
+    "-p", "--path",
+    type=Path,
+    help="custom path to web driver executable to use",
+)
+serve_parser.add_argument(
+    "--lean",
+    action="store_true",
+    help="have Selenium block images, media, fonts and trackers",
+)
+serve_parser.add_argument(
+    "-b", "--backend",
+    choices=(BACKEND_SELENIUM, BACKEND_HTTP),
+    default=BACKEND_SELENIUM,
+    help="how to update Discord and Instagram",
+)
+serve_parser.add_argument(
+    "--grid",
+    metavar="URL",
+    action="append",
+    help="run the browser on this Selenium standalone server or grid "
+    "(repeatable, defaults to $COUNTERS_GRID_URL)",
+)
+
+
+_SUBCOMMAND_FLAGS = {
+    "date_to_update_to": "date_to_update_to",
+    "console_only": "console",
+    "windowed": "window",
+    "driver_path": "path",
+    "lean": "lean",
+    "backend": "backend",
+    "hedge": "hedge",
+    "tabs": "tabs",
+    "grid_urls": "grid",
+}
+"""Options the subcommands can set, by the flag destination setting them."""
+
+
+def _subcommand_options(args: Namespace, **overrides: Any) -> ProgramOptions:
+    """
+    Return the options of a subcommand's runs: the defaults, with those
+    of `_SUBCOMMAND_FLAGS` it takes set from its flags, and `overrides`.
+    """
+    options = {option: getattr(args, flag)
+               for option, flag in _SUBCOMMAND_FLAGS.items()
+               if getattr(args, flag, None) is not None}
+    options.update(overrides)
+    return ProgramOptions.defaults(**options)
+
+
 def get_options() -> ProgramOptions:
+    """Parse the command line into the options of a run."""
     # Parse and unpack debugging options.
     args = parser.parse_args()
 
@@ -126,6 +413,26 @@ def get_options() -> ProgramOptions:
     if not any((args.discord, args.instagram, args.spotify, args.github)):
         args.discord = args.instagram = args.spotify = args.github = True
 
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
+    # Workers would fight over the single shared browser.
+    if args.workers > 1 and args.attach:
+        parser.error("--workers can't be combined with -a/--attach")
+    args.grid = args.grid or GRID_URLS
+    if args.grid and args.attach:
+        parser.error("--grid can't be combined with -a/--attach")
+    # A hedge races a second browser, which tabs are meant to avoid.
+    if args.tabs and args.hedge:
+        parser.error("--tabs can't be combined with --hedge")
+    # Abandoning an attempt in the shared browser would leave it running.
+    if args.hedge and args.attach:
+        parser.error("--hedge can't be combined with -a/--attach")
+    if args.poll is not None:
+        if not args.log_discord_status:
+            parser.error("--poll requires -l/--log-discord-status")
+        if args.poll <= 0:
+            parser.error("--poll INTERVAL must be positive")
+
     return ProgramOptions(
         date_to_update_to=args.date_to_update_to,
         console_only=args.console,
@@ -138,28 +445,184 @@ def get_options() -> ProgramOptions:
         dry_run_date=args.dry_run,
         log_discord_status=args.log_discord_status,
         dry_run_one_per_line=args.dry_run_one_per_line,
+        lean=args.lean,
+        attach=args.attach,
+        update_and_log_discord=args.update_and_log_discord,
+        backend=args.backend,
+        hedge=args.hedge,
+        trace=args.trace,
+        webdriver_stats=args.webdriver_stats,
+        profile=args.profile,
+        resume=args.resume,
+        workers=args.workers,
+        tabs=args.tabs,
+        grid_urls=args.grid,
+        poll_interval=args.poll,
+        fsync=args.fsync,
     )
 
 
 def main() -> None:
+    """Entry point of the `counters` command."""
+    # The queue has a CLI of its own, which the date positional of the
+    # main parser would otherwise swallow.
+    if sys.argv[1:2] == ["queue"]:
+        sys.exit(queue_main(sys.argv[2:]))
+    if sys.argv[1:2] == ["serve"]:
+        sys.exit(serve_main(sys.argv[2:]))
+
     options = get_options()
 
+    profiler = None
+    if options.profile is not None:
+        profiler = RunProfiler(options.profile)
+        profiler.start()
+
+    # pylint: disable-next=import-outside-toplevel
+    from . import webdriver_stats
+
     if options.console_only:
         logging.disable(100)
+    if options.trace:
+        tracing.enable()
+    if options.webdriver_stats:
+        webdriver_stats.enable()
+
+    try:
+        with tracing.span("run"):
+            exit_code = _run(options)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            paths = profiler.export(tracing.get_run_id())
+            print("Profiles written to "
+                  f"{', '.join(str(path) for path in paths)}.")
+
+    trace_path = tracing.export()
+    if trace_path is not None:
+        print(f"Trace written to {trace_path}.")
+    if options.webdriver_stats:
+        print(webdriver_stats.stats.report())
+        webdriver_stats.stats.export()
+
+    # So the scheduler/script conveys the failure too.
+    sys.exit(exit_code)
+
+
+def _run(options: ProgramOptions) -> int:
+    # pylint: disable=import-outside-toplevel
+    from .core import CountersProgram
+    from .status_logger.core import poll_status_logger, run_status_logger
 
     # Run status-logger sub-program and ignore everything else.
+    if options.log_discord_status and options.poll_interval is not None:
+        success = poll_status_logger(interval=options.poll_interval,
+                                     fsync=options.fsync,
+                                     console_only=options.console_only,
+                                     headless=not options.windowed,
+                                     driver_path=options.driver_path,
+                                     lean=options.lean,
+                                     attach=options.attach,
+                                     grid_urls=options.grid_urls)
+        return EXIT_SUCCESS if success else EXIT_FAILURE_STATUS_LOGGER
     if options.log_discord_status:
         success = run_status_logger(console_only=options.console_only,
                                     headless=not options.windowed,
-                                    driver_path=options.driver_path)
-        sys.exit(EXIT_SUCCESS if success else EXIT_FAILURE_STATUS_LOGGER)
+                                    driver_path=options.driver_path,
+                                    lean=options.lean,
+                                    attach=options.attach,
+                                    grid_urls=options.grid_urls)
+        return EXIT_SUCCESS if success else EXIT_FAILURE_STATUS_LOGGER
 
     # Run the main program.
-    counters = CountersProgram(options)
-    exit_code = counters.run()
+    if options.workers > 1 and options.dry_run_date is None:
+        from .sharding import ShardedProgram
+        counters = ShardedProgram(options)
+    else:
+        counters = CountersProgram(options)
+    return counters.run()
 
-    # So the scheduler/script conveys the failure too.
-    sys.exit(exit_code)
+
+def queue_main(argv: list[str]) -> int:
+    """Run the `counters queue` subcommand and return its exit code."""
+    # pylint: disable=import-outside-toplevel
+    from .work_queue import WorkQueue, format_stats
+
+    args = queue_parser.parse_args(argv)
+    if args.command == "work" and args.tabs and args.hedge:
+        work_parser.error("--tabs can't be combined with --hedge")
+    queue = WorkQueue()
+    try:
+        if args.command == "stats":
+            stats = queue.stats()
+            print(json.dumps(stats, indent=2) if args.json
+                  else format_stats(stats))
+            return EXIT_SUCCESS
+
+        if args.command == "requeue-dead":
+            print(f"Requeued {queue.requeue_dead()} dead-lettered jobs.")
+            return EXIT_SUCCESS
+
+        from .core import CountersProgram
+        from .queue_worker import QueueWorkerProgram
+
+        selected = (args.discord, args.instagram, args.spotify, args.github) \
+            if args.command == "enqueue" else ()
+        run_all = not any(selected)
+        options = _subcommand_options(
+            args,
+            run_discord=run_all or args.discord,
+            run_instagram=run_all or args.instagram,
+            run_spotify=run_all or args.spotify,
+            run_github=run_all or args.github,
+        )
+
+        if args.command == "enqueue":
+            program = CountersProgram(options)
+            data = program.load_bio_config_json()
+            if data is None:
+                program.failure_log.print_tracebacks()
+                return EXIT_FAILURE
+            updaters = program.get_updaters(data)
+            added = queue.enqueue(
+                options.date_to_update_to,
+                [(updater.platform_name, updater.account)
+                 for updater in updaters],
+            )
+            message = (f"Enqueued {added} of {len(updaters)} targets for "
+                       f"{options.date_to_update_to}")
+            if added < len(updaters):
+                message += " (the rest were already pending)"
+            print(f"{message}.")
+            return EXIT_SUCCESS
+
+        if options.console_only:
+            logging.disable(100)
+        worker = QueueWorkerProgram(options, queue, max(args.batch, 1))
+        return worker.work(args.max_jobs, args.idle_timeout)
+    finally:
+        queue.close()
+
+
+def serve_main(argv: list[str]) -> int:
+    """Run the `counters serve` subcommand and return its exit code."""
+    # pylint: disable-next=import-outside-toplevel
+    from .server import serve
+
+    args = serve_parser.parse_args(argv)
+    if not 0 <= args.port <= 65535:
+        serve_parser.error("--port must be between 0 and 65535")
+    # Runs get their dates and targets from the requests.
+    options = _subcommand_options(args)
+    if options.console_only:
+        logging.disable(100)
+    try:
+        serve(options, args.host, args.port)
+    except OSError as exc:
+        print(f"Could not serve on {args.host}:{args.port}: {exc}",
+              file=sys.stderr)
+        return EXIT_FAILURE
+    return EXIT_SUCCESS
 
 
 if __name__ == "__main__":
@@ -7,6 +7,7 @@ import os
 from dataclasses import dataclass
 from datetime import date
 from pathlib import Path
+from typing import Any
 
 import dotenv
 
@@ -16,7 +17,11 @@ dotenv.load_dotenv(override=True)
 
 # ==================== CENTRAL FILES ==================== #
 
-JSON_FILE_PATH = Path.home() / ".config" / "counters" / "bios.json"
+CONFIG_DIR = Path(os.environ.get("COUNTERS_CONFIG_DIR",
+                                 Path.home() / ".config" / "counters"))
+"""Absolute path to the directory of the configuration and program state."""
+
+JSON_FILE_PATH = CONFIG_DIR / "bios.json"
 """Absolute path to the central JSON file containing status templates."""
 
 JSON_SCHEMA_PATH = Path(__file__).parent / "schema" / "bios.schema.json"
@@ -28,12 +33,219 @@ DATE_FORMAT = "%Y-%m-%d"
 LOG_FILE_PATH = JSON_FILE_PATH.parent / "counters.log"
 """Absolute path to the program log file."""
 
+LOG_BATCH_SIZE = 256
+"""Most log records written between two flushes of a log file."""
+
+DRIVER_CACHE_DIR = JSON_FILE_PATH.parent / "drivers"
+"""Absolute path to the directory of cached web driver executables."""
+
+SESSIONS_DIR = JSON_FILE_PATH.parent / "sessions"
+"""Absolute path to the directory of exported browser sessions."""
+
+HISTORY_FILE_PATH = JSON_FILE_PATH.parent / "history.json"
+"""Absolute path to the recorded latencies of past runs."""
+
+TRACES_DIR = JSON_FILE_PATH.parent / "traces"
+"""Absolute path to the directory of exported timing traces."""
+
+PROFILES_DIR = JSON_FILE_PATH.parent / "profiles"
+"""Absolute path to the directory of CPU and memory profiles."""
+
+JOURNAL_DIR = JSON_FILE_PATH.parent / "journal"
+"""Absolute path to the directory of per-date journals of outcomes."""
+
+JOURNAL_RETENTION_DAYS = 14
+"""Number of days after which a date's journal is deleted."""
+
+QUEUE_DB_PATH = JSON_FILE_PATH.parent / "queue.sqlite3"
+"""Absolute path to the database of the work queue."""
+
+QUEUE_VISIBILITY_TIMEOUT = 120.0
+"""Time in seconds after which a leased job not kept alive is retried."""
+
+QUEUE_MAX_ATTEMPTS = 3
+"""Number of times a job is tried before it's dead-lettered."""
+
+QUEUE_RETRY_BACKOFF = 30.0
+"""Time in seconds before the first retry, doubled for every next one."""
+
+QUEUE_POLL_INTERVAL = 1.0
+"""Time in seconds an idle worker waits before checking for jobs."""
+
 
 # ==================== SELENIUM ==================== #
 
 WAIT_TIMEOUT = 15.0
 """Time in seconds to implicitly wait for a webpage to load."""
 
+STEP_TIMEOUT_MARGIN = 1.5
+"""Factor applied to a step's p95 latency to derive its timeout."""
+
+STEP_TIMEOUT_MIN = 2.0
+"""Lower bound in seconds of a learned step timeout."""
+
+STEP_TIMEOUT_MAX = 2 * WAIT_TIMEOUT
+"""Upper bound in seconds of a learned step timeout."""
+
+EDGE_BINARY = os.environ.get("EDGE_BINARY")
+"""Optional path to the Edge executable for launching a shared browser."""
+
+HEDGE_FALLBACK_THRESHOLD = 2 * WAIT_TIMEOUT
+"""
+Time in seconds after which to hedge a browser updater when there isn't
+enough history yet to use its 90th percentile latency.
+"""
+
+TAB_POLL_INTERVAL = 0.05
+"""Time in seconds to pause when no tab's page is ready, with --tabs."""
+
+SHARED_BROWSER_DIR = JSON_FILE_PATH.parent / "browser"
+"""Absolute path to the profile and state of the shared browser."""
+
+SHARED_BROWSER_PORT = 9222
+"""Remote debugging port the shared browser listens on."""
+
+SHARED_BROWSER_MAX_USES = 50
+"""Number of runs after which the shared browser is restarted."""
+
+SHARED_BROWSER_MAX_HEAP_MB = 512
+"""JS heap size in MB past which the shared browser is restarted."""
+
+
+# ==================== REMOTE BROWSERS ==================== #
+
+GRID_URLS = [url.strip() for url in
+             os.environ.get("COUNTERS_GRID_URL", "").split(",")
+             if url.strip()]
+"""
+URLs of Selenium standalone servers or grids to run the browser on
+instead of launching it locally (comma-separated). Empty for local.
+"""
+
+GRID_STATUS_TIMEOUT = 2.0
+"""Time in seconds to wait for an endpoint's status before skipping it."""
+
+GRID_QUEUE_TIMEOUT = 60.0
+"""Time in seconds to wait for a free Edge slot before queueing anyway."""
+
+GRID_POOL_SIZE = 2
+"""Number of idle remote sessions kept open for reuse by a process."""
+
+GRID_SESSION_MAX_USES = 20
+"""Number of uses after which a pooled remote session is ended."""
+
+
+# ==================== WEB APPS ==================== #
+
+# Overridable so the flows can be pointed at local stand-in servers.
+
+DISCORD_URL = os.environ.get("DISCORD_URL", "https://discord.com")
+"""Base URL of the Discord web app."""
+
+DISCORD_API_URL = os.environ.get("DISCORD_API_URL", f"{DISCORD_URL}/api/v9")
+"""Base URL of the Discord HTTP API used by the web app."""
+
+INSTAGRAM_URL = os.environ.get("INSTAGRAM_URL", "https://www.instagram.com")
+"""Base URL of the Instagram web app (and its HTTP API)."""
+
+
+SPOTIFY_API_URL = os.environ.get("SPOTIFY_API_URL",
+                                 "https://api.spotify.com/v1/")
+"""Base URL of the Spotify Web API."""
+
+SPOTIFY_TOKEN_URL = os.environ.get("SPOTIFY_TOKEN_URL",
+                                   "https://accounts.spotify.com/api/token")
+"""URL of the Spotify endpoint to refresh access tokens."""
+
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com")
+"""Base URL of the GitHub REST API."""
+
+RATE_LIMITS = {
+    "api.spotify.com": (5.0, 10),
+    "accounts.spotify.com": (1.0, 5),
+    "api.github.com": (1.0, 5),
+    "discord.com": (2.0, 5),
+    "www.instagram.com": (0.5, 3),
+}
+"""
+Requests per second and burst size per API host and credential, before
+the servers' rate limit headers are known. Other hosts aren't shaped.
+"""
+
+RATE_LIMIT_DEFAULT_BACKOFF = 5.0
+"""Time in seconds to back off after a 429 without a Retry-After."""
+
+RATE_LIMIT_MAX_RETRIES = 3
+"""Number of times a request answered with 429 is retried."""
+
+
+BACKEND_SELENIUM = "selenium"
+"""Update the web apps by driving the browser through their UI."""
+
+BACKEND_HTTP = "http"
+"""Update the web apps with HTTP requests, using the browser as fallback."""
+
+
+# ==================== LOCAL API ==================== #
+
+SERVE_HOST = "127.0.0.1"
+"""Address `counters serve` listens on by default (local only)."""
+
+SERVE_PORT = 8765
+"""Port `counters serve` listens on by default."""
+
+SERVE_RUN_HISTORY = 50
+"""Number of runs started by `counters serve` that it remembers."""
+
+SERVE_CACHE_SIZE = 64
+"""
+Number of values (e.g. the previews or outcomes of a date) `counters
+serve` keeps in memory, the least recently used being dropped first.
+"""
+
+
+# ==================== SHARDING ==================== #
+
+SHARD_DEFAULT_API_COST = 1.0
+"""Assumed time in seconds of an API target without history."""
+
+SHARD_DEFAULT_BROWSER_COST = 20.0
+"""Assumed time in seconds of a browser target without history."""
+
+SHARD_DEFAULT_DRIVER_STARTUP = 5.0
+"""Assumed time in seconds to start a browser without history."""
+
+
+# ==================== STATUS LOGGER ==================== #
+
+FSYNC_ALWAYS = "always"
+"""Flush and fsync the status log after every row."""
+
+FSYNC_INTERVAL = "interval"
+"""Flush and fsync the status log at most every STATUS_FSYNC_INTERVAL."""
+
+FSYNC_NEVER = "never"
+"""Leave flushing to the OS, and the status log buffered until exit."""
+
+STATUS_FSYNC_INTERVAL = 300.0
+"""Time in seconds between syncs of the status log under FSYNC_INTERVAL."""
+
+STATUS_POLL_MAX_ERRORS = 5
+"""Number of failed reads in a row after which polling gives up."""
+
+GATEWAY_STATUS_TIMEOUT = 10.0
+"""
+Time in seconds to wait for the status in the gateway traffic after
+logging in, before reading it from the page instead.
+"""
+
+GATEWAY_QUIET_TIMEOUT = 60.0
+"""
+Time in seconds without gateway traffic after which the status it
+reported is no longer trusted while polling. The gateway acknowledges a
+heartbeat about every 41 seconds, so a quiet socket has likely died.
+"""
+
 
 # ==================== CREDENTIALS ==================== #
 
@@ -111,3 +323,54 @@ class ProgramOptions:
     dry_run_date: date | None
     log_discord_status: bool
     dry_run_one_per_line: bool
+    lean: bool
+    attach: bool
+    update_and_log_discord: bool
+    backend: str
+    hedge: bool
+    trace: bool
+    webdriver_stats: bool
+    profile: str | None
+    resume: bool
+    workers: int
+    tabs: bool
+    grid_urls: list[str]
+    poll_interval: float | None
+    fsync: str
+
+    @classmethod
+    def defaults(cls, **overrides: Any) -> "ProgramOptions":
+        """
+        Options of a plain run updating every target to today, with
+        `overrides` applied. For the entry points that don't take the
+        main command line (which sets every field itself).
+        """
+        options: dict[str, Any] = {
+            "date_to_update_to": date.today(),
+            "console_only": False,
+            "windowed": False,
+            "driver_path": None,
+            "run_discord": True,
+            "run_instagram": True,
+            "run_spotify": True,
+            "run_github": True,
+            "dry_run_date": None,
+            "log_discord_status": False,
+            "dry_run_one_per_line": False,
+            "lean": False,
+            "attach": False,
+            "update_and_log_discord": False,
+            "backend": BACKEND_SELENIUM,
+            "hedge": False,
+            "trace": False,
+            "webdriver_stats": False,
+            "profile": None,
+            "resume": False,
+            "workers": 1,
+            "tabs": False,
+            "grid_urls": list(GRID_URLS),
+            "poll_interval": None,
+            "fsync": FSYNC_INTERVAL,
+        }
+        options.update(overrides)
+        return cls(**options)
@@ -1,23 +1,35 @@
 # pylint: disable=broad-exception-caught
 
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import date
 
 from selenium import webdriver
-from selenium.webdriver.edge.options import Options
-from selenium.webdriver.edge.service import Service
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
 
-from .config import EXIT_FAILURE, JSON_FILE_PATH, WAIT_TIMEOUT, ProgramOptions
+from .browser import create_edge_driver, get_page_metrics
+from .browser_manager import SharedBrowser
+from .config import (BACKEND_HTTP, EXIT_FAILURE, HEDGE_FALLBACK_THRESHOLD,
+                     JSON_FILE_PATH, PLATFORM_DISCORD, PLATFORM_INSTAGRAM,
+                     ProgramOptions)
 from .dry_run import execute_dry_run
 from .emailer import send_email
+from .hedging import update_bio_hedged
+from .history import history
+from .journal import Journal
 from .loader import load_bio_config_json
-from .logger import FailureLog
+from .logger import FailureLog, log, log_fields
+from .rate_limit import limiter
+from .remote import get_pool
+from .status_logger.core import verify_and_log_status
+from .tabs import TabFlow, TabRunner
+from .tracing import span
 from .updaters.base import Updater
 from .updaters.discord import DiscordUpdater
 from .updaters.github import GitHubUpdater
 from .updaters.instagram import InstagramUpdater
 from .updaters.spotify import SpotifyPlaylistUpdater
 from .utils import print_error
+from .web_session import SessionRejectedError
 
 
 class CountersProgram:
@@ -31,14 +43,30 @@ class CountersProgram:
     def __init__(self, options: ProgramOptions) -> None:
         self.options = options
         self.failure_log = FailureLog()
+        self.timings = dict[str, float]()
+        """Durations in seconds of the phases of the last run."""
+        self.shared_browser: SharedBrowser | None = None
+        """The long-lived browser attached to, if any."""
+        self.journal = Journal(options.date_to_update_to)
+        """Outcomes of the targets for the date being updated to."""
 
     def run(self) -> int:
         """Run the main process and return the exit code to use."""
-        data = self._load_bio_config_json()
+        run_start = time.perf_counter()
+
+        # Browser startup doesn't depend on the configuration, so get it
+        # going in the background before anything else.
+        driver_future = None
+        if self.options.dry_run_date is None and self._wants_browser():
+            driver_future = self._start_web_driver()
+
+        data = self.load_bio_config_json()
+        self.timings["config"] = time.perf_counter() - run_start
         if data is None:
+            self._discard_web_driver(driver_future)
             return EXIT_FAILURE
 
-        updaters = self._get_updaters(data)
+        updaters = self.get_updaters(data)
 
         if self.options.dry_run_date is not None:
             return execute_dry_run(
@@ -47,39 +75,188 @@ class CountersProgram:
                 self.options.dry_run_one_per_line,
             )
 
-        driver = self._init_web_driver()
-        if driver is None:
-            return EXIT_FAILURE
+        if not updaters:
+            print(
+                "Nothing to update! "
+                f"Check your configuration file at {JSON_FILE_PATH}."
+            )
+        elif self.options.resume:
+            updaters = self._skip_completed(updaters)
+
+        # API-backed updaters run while the browser is still starting.
+        api_updaters = [u for u in updaters if not u.uses_browser]
+        browser_updaters = [u for u in updaters if u.uses_browser]
+        attempted = list[Updater]()
+
+        step_start = time.perf_counter()
+        self._run_updaters(api_updaters, None)
+        attempted.extend(api_updaters)
+        self.timings["api_updaters"] = time.perf_counter() - step_start
+
+        # Try the browserless path first, keeping only the updaters whose
+        # saved session was rejected for the browser.
+        if self.options.backend == BACKEND_HTTP:
+            step_start = time.perf_counter()
+            browser_updaters = self._run_http_updaters(browser_updaters,
+                                                       attempted)
+            self.timings["http_updaters"] = time.perf_counter() - step_start
+
+        if browser_updaters and driver_future is None:
+            driver_future = self._start_web_driver()
+        elif not browser_updaters:
+            self._discard_web_driver(driver_future)
+            driver_future = None
 
-        self._run_updaters(updaters, driver)
-        driver.quit()
+        if driver_future is not None:
+            step_start = time.perf_counter()
+            driver = driver_future.result()
+            self.timings["driver_wait"] = time.perf_counter() - step_start
 
-        self._write_failure_report(updaters)
+            if driver is not None:
+                step_start = time.perf_counter()
+                driver = self._run_updaters(browser_updaters, driver)
+                attempted.extend(browser_updaters)
+                self._quit_web_driver(driver)
+                self.timings["browser_updaters"] = \
+                    time.perf_counter() - step_start
+
+        self.timings["total"] = time.perf_counter() - run_start
+        self._report_timings()
+        history.save()
+        self.journal.prune()
+
+        self._write_failure_report(attempted)
         return self.failure_log.get_exit_code()
 
-    def _load_bio_config_json(self) -> dict | None:
+    def _wants_browser(self) -> bool:
+        """Whether any selected updater is expected to need the driver."""
+        # The HTTP backend only needs one if a session gets rejected.
+        if self.options.backend == BACKEND_HTTP:
+            return False
+        platforms = list[str]()
+        if self.options.run_discord:
+            platforms.append(PLATFORM_DISCORD)
+        if self.options.run_instagram:
+            platforms.append(PLATFORM_INSTAGRAM)
+        # Don't launch a browser just to discard it if these are going to
+        # be skipped (checked properly once the details are prepared).
+        if self.options.resume:
+            platforms = [platform for platform in platforms
+                         if not self.journal.has_succeeded(platform)]
+        return bool(platforms)
+
+    def _skip_completed(self, updaters: list[Updater]) -> list[Updater]:
+        """
+        Return the updaters that haven't already succeeded with the same
+        details for the date being updated to.
+        """
+        date_to_update_to = self.options.date_to_update_to
+        remaining = list[Updater]()
+        for updater in updaters:
+            try:
+                details = updater.prepare_details(date_to_update_to)
+            except Exception:
+                # Let the run itself report the error.
+                remaining.append(updater)
+                continue
+            if not self.journal.has_succeeded(updater.platform_name,
+                                              details):
+                remaining.append(updater)
+
+        skipped = len(updaters) - len(remaining)
+        if skipped:
+            message = (f"Resuming: skipping {skipped} of {len(updaters)} "
+                       f"targets already updated for {date_to_update_to}.")
+            print(message)
+            log.info(message)
+        return remaining
+
+    def _start_web_driver(self) -> "Future[webdriver.Edge | None]":
+        executor = ThreadPoolExecutor(max_workers=1,
+                                      thread_name_prefix="driver")
+        future = executor.submit(self._init_web_driver)
+        executor.shutdown(wait=False)
+        return future
+
+    def _discard_web_driver(
+        self,
+        driver_future: "Future[webdriver.Edge | None] | None",
+    ) -> None:
+        if driver_future is None:
+            return
+        driver = driver_future.result()
+        if driver is not None:
+            self._quit_web_driver(driver)
+
+    def _report_timings(self) -> None:
+        """Print how much of the critical path the overlap saved."""
+        timings = self.timings
+        parts = [
+            f"config {timings['config']:.2f}s",
+            f"API updaters {timings['api_updaters']:.2f}s",
+        ]
+        if "driver_startup" in timings:
+            startup = timings["driver_startup"]
+            waited = timings.get("driver_wait", startup)
+            parts.append(
+                f"driver startup {startup:.2f}s "
+                f"(waited {waited:.2f}s, overlap saved "
+                f"{max(startup - waited, 0.0):.2f}s)"
+            )
+        if "browser_updaters" in timings:
+            parts.append(
+                f"browser updaters {timings['browser_updaters']:.2f}s")
+        throttled = limiter.total_wait()
+        if throttled > 0:
+            parts.append(f"rate limited {throttled:.2f}s")
+        parts.append(f"total {timings['total']:.2f}s")
+
+        message = "Timing: " + ", ".join(parts) + "."
+        print(message)
+        log.info(message,
+                 extra=log_fields(phase="run", duration=timings["total"]))
+
+    def load_bio_config_json(self) -> dict | None:
+        """
+        Load the central JSON file, or record why it couldn't be loaded
+        in the failure log and return None.
+        """
         try:
-            return load_bio_config_json()
+            with span("config.load"):
+                return load_bio_config_json()
         except Exception as exc:
             print_error("FAILED to load JSON data.")
             self.failure_log.json = exc
             return None
 
     def _init_web_driver(self) -> webdriver.Edge | None:
+        start = time.perf_counter()
         try:
-            if self.options.driver_path is None:
-                driver_path = EdgeChromiumDriverManager().install()
-            else:
-                driver_path = str(self.options.driver_path)
-
-            service = Service(executable_path=driver_path)
-            options = Options()
-            if not self.options.windowed:
-                options.add_argument("--headless")
-
-            driver = webdriver.Edge(service=service, options=options)
-            driver.implicitly_wait(WAIT_TIMEOUT)
-            driver.maximize_window()
+            with span("driver.init"):
+                if self.options.grid_urls:
+                    driver = get_pool(self.options.grid_urls).acquire(
+                        headless=not self.options.windowed,
+                        lean=self.options.lean,
+                        tabs=self.options.tabs,
+                    )
+                    print("Driver initialized.")
+                    return driver  # type: ignore
+
+                debugger_address = None
+                if self.options.attach:
+                    self.shared_browser = SharedBrowser(
+                        headless=not self.options.windowed,
+                        lean=self.options.lean,
+                    )
+                    debugger_address = self.shared_browser.ensure_running()
+
+                driver = create_edge_driver(
+                    headless=not self.options.windowed,
+                    driver_path=self.options.driver_path,
+                    lean=self.options.lean,
+                    debugger_address=debugger_address,
+                    tabs=self.options.tabs,
+                )
             print("Driver initialized.")
             return driver
 
@@ -88,7 +265,25 @@ class CountersProgram:
             self.failure_log.driver = exc
             return None
 
-    def _get_updaters(self, data: dict) -> list[Updater]:
+        finally:
+            self.timings["driver_startup"] = time.perf_counter() - start
+            history.record("driver.startup", self.timings["driver_startup"])
+
+    def _quit_web_driver(self, driver: webdriver.Edge) -> None:
+        # An attached browser is left running for the next run, and a
+        # remote session is kept for reuse.
+        if self.options.grid_urls:
+            get_pool(self.options.grid_urls).release(driver)
+        elif self.shared_browser is not None:
+            self.shared_browser.release(driver)
+        else:
+            driver.quit()
+
+    def get_updaters(self, data: dict) -> list[Updater]:
+        """
+        Return the updaters of the selected targets, configured from the
+        loaded central JSON.
+        """
         updaters = list[Updater]()
 
         # The tasks for these platforms are self-contained.
@@ -113,34 +308,245 @@ class CountersProgram:
         return updaters
 
     def _run_updaters(
+        self,
+        updaters: list[Updater],
+        driver: webdriver.Edge | None,
+    ) -> webdriver.Edge | None:
+        """
+        Run the updaters, returning the driver to dispose of afterwards
+        (a hedged attempt may have replaced the one passed in).
+        """
+        date_to_update_to = self.options.date_to_update_to
+        if self.options.tabs and driver is not None and len(updaters) > 1:
+            self._run_updaters_in_tabs(updaters, driver)
+            return driver
+
+        for updater in updaters:
+            platform_name = updater.platform_name
+            details = {}  # In case they're what fails to prepare.
+            try:
+                with span("updater.prepare_details", platform=platform_name):
+                    details = updater.prepare_details(date_to_update_to)
+                start = time.perf_counter()
+                with span("updater.update_bio", platform=platform_name):
+                    if self.options.hedge and driver is not None:
+                        driver = self._update_bio_hedged(updater, details,
+                                                         driver)
+                    else:
+                        updater.update_bio(details, driver)
+                history.record(f"updater.{platform_name}",
+                               time.perf_counter() - start)
+                if self._should_log_discord_status(updater, details):
+                    with span("status_logger.verify_and_log"):
+                        verify_and_log_status(driver, details["status"],
+                                              self.options.console_only)
+                print(f"Updated {platform_name}.")
+                self._record_outcome(platform_name, details,
+                                     duration=time.perf_counter() - start)
+                if driver is not None:
+                    self._report_page_metrics(platform_name, driver)
+                    if self.options.backend == BACKEND_HTTP:
+                        self._export_session(updater, driver)
+            except Exception as exc:
+                print_error(f"FAILED to update {platform_name}.")
+                self.failure_log.platforms[platform_name] = exc
+                self._record_outcome(platform_name, details, exc)
+
+        return driver
+
+    def _run_updaters_in_tabs(
         self,
         updaters: list[Updater],
         driver: webdriver.Edge,
     ) -> None:
-        if not updaters:
-            print(
-                "Nothing to update! "
-                f"Check your configuration file at {JSON_FILE_PATH}."
+        """Run the browser updaters at once, each in a tab of the driver."""
+        date_to_update_to = self.options.date_to_update_to
+        flows = list[tuple[str, TabFlow]]()
+        details_of = dict[str, dict]()
+        for updater in updaters:
+            platform_name = updater.platform_name
+            try:
+                with span("updater.prepare_details", platform=platform_name):
+                    details = updater.prepare_details(date_to_update_to)
+            except Exception as exc:
+                print_error(f"FAILED to update {platform_name}.")
+                self.failure_log.platforms[platform_name] = exc
+                self._record_outcome(platform_name, {}, exc)
+                continue
+            details_of[platform_name] = details
+            flows.append((platform_name,
+                          self._tab_flow(updater, details, driver)))
+
+        with span("updater.tabs", tabs=len(flows)):
+            outcomes = TabRunner(driver, self.options.lean).run(flows)
+
+        for platform_name, exc in outcomes.items():
+            if exc is None:
+                continue
+            print_error(f"FAILED to update {platform_name}.")
+            self.failure_log.platforms[platform_name] = exc
+            self._record_outcome(platform_name, details_of[platform_name],
+                                 exc)
+
+    def _tab_flow(
+        self,
+        updater: Updater,
+        details: dict,
+        driver: webdriver.Edge,
+    ) -> TabFlow:
+        """
+        Run `update_bio_steps`, followed by the same bookkeeping as a
+        sequential run, while the updater's tab is current.
+        """
+        platform_name = updater.platform_name
+        start = time.perf_counter()
+        yield from updater.update_bio_steps(details, driver)
+        history.record(f"updater.{platform_name}",
+                       time.perf_counter() - start)
+        if self._should_log_discord_status(updater, details):
+            verify_and_log_status(driver, details["status"],
+                                  self.options.console_only)
+        print(f"Updated {platform_name}.")
+        self._record_outcome(platform_name, details,
+                             duration=time.perf_counter() - start)
+        self._report_page_metrics(platform_name, driver)
+        if self.options.backend == BACKEND_HTTP:
+            self._export_session(updater, driver)
+
+    def _record_outcome(
+        self,
+        platform_name: str,
+        details: dict,
+        error: Exception | None = None,
+        duration: float | None = None,
+    ) -> None:
+        """Journal the outcome of updating the target, and log it."""
+        self.journal.record(platform_name, details, error)
+        fields = log_fields(platform_name, "update", duration)
+        if error is None:
+            log.info("Updated %s.", platform_name, extra=fields)
+        else:
+            log.error("Failed to update %s: %s: %s", platform_name,
+                      type(error).__name__, error, extra=fields)
+
+    def _update_bio_hedged(
+        self,
+        updater: Updater,
+        details: dict,
+        driver: webdriver.Edge,
+    ) -> webdriver.Edge:
+        key = f"updater.{updater.platform_name}"
+        threshold = history.percentile(key, 0.9) or HEDGE_FALLBACK_THRESHOLD
+        return update_bio_hedged(
+            updater,
+            details,
+            driver,
+            threshold,
+            create_driver=self._create_hedge_driver,
+            quit_driver=self._abandon_web_driver,
+        )
+
+    def _abandon_web_driver(self, driver: webdriver.Edge) -> None:
+        # A losing attempt may still be running, so don't pool its session.
+        if self.options.grid_urls:
+            get_pool(self.options.grid_urls).discard(driver)  # type: ignore
+        else:
+            self._quit_web_driver(driver)
+
+    def _create_hedge_driver(self) -> webdriver.Edge:
+        if self.options.grid_urls:
+            return get_pool(self.options.grid_urls).acquire(  # type: ignore
+                headless=not self.options.windowed,
+                lean=self.options.lean,
             )
-            return
+        return create_edge_driver(
+            headless=not self.options.windowed,
+            driver_path=self.options.driver_path,
+            lean=self.options.lean,
+        )
 
+    def _run_http_updaters(
+        self,
+        updaters: list[Updater],
+        attempted: list[Updater],
+    ) -> list[Updater]:
+        """
+        Run browser updaters over plain HTTP, appending them to
+        `attempted`. Return the ones that need to fall back to the
+        browser because their saved session was rejected.
+        """
         date_to_update_to = self.options.date_to_update_to
+        fallbacks = list[Updater]()
 
         for updater in updaters:
             platform_name = updater.platform_name
+            details = {}  # In case they're what fails to prepare.
             try:
-                details = updater.prepare_details(date_to_update_to)
-                updater.update_bio(details, driver)
-                print(f"Updated {platform_name}.")
+                with span("updater.prepare_details", platform=platform_name):
+                    details = updater.prepare_details(date_to_update_to)
+                start = time.perf_counter()
+                with span("updater.update_bio_http", platform=platform_name):
+                    updater.update_bio_http(details)
+                print(f"Updated {platform_name} over HTTP.")
+                self._record_outcome(platform_name, details,
+                                     duration=time.perf_counter() - start)
+                attempted.append(updater)
+            except SessionRejectedError as exc:
+                print(f"{platform_name} session rejected ({exc}), "
+                      "falling back to the browser.")
+                fallbacks.append(updater)
             except Exception as exc:
-                print_error(f"FAILED to update {platform_name}.")
+                print_error(f"FAILED to update {platform_name} over HTTP.")
                 self.failure_log.platforms[platform_name] = exc
+                self._record_outcome(platform_name, details, exc)
+                attempted.append(updater)
+
+        return fallbacks
+
+    def _export_session(
+        self,
+        updater: Updater,
+        driver: webdriver.Edge,
+    ) -> None:
+        # Not being able to save it only costs the next run a browser.
+        try:
+            updater.export_session(driver)
+        except Exception as exc:
+            print_error(f"Could not export {updater.platform_name} session: "
+                        f"{exc}")
+
+    def _should_log_discord_status(
+        self,
+        updater: Updater,
+        details: dict,
+    ) -> bool:
+        """
+        Whether to read back and log the Discord status in the session
+        the updater just used, instead of in a separate status-logger run.
+        """
+        return (self.options.update_and_log_discord
+                and isinstance(updater, DiscordUpdater)
+                and details["status"] is not None)
+
+    def _report_page_metrics(
+        self,
+        platform_name: str,
+        driver: webdriver.Edge,
+    ) -> None:
+        metrics = get_page_metrics(driver)
+        if metrics is None:
+            return
+        message = f"{platform_name} page: {metrics}."
+        print(message)
+        log.info(message)
 
     def _write_failure_report(self, updaters: list[Updater]) -> None:
         if not self.options.console_only:
             platforms_attempted = [u.platform_name for u in updaters]
             report = self.failure_log.generate_report(platforms_attempted)
-            self.failure_log.write_report_to_file(report)
-            send_email(report)
+            with span("report.write"):
+                self.failure_log.write_report_to_file(report)
+            with span("report.email"):
+                send_email(report)
         else:
             self.failure_log.print_tracebacks()
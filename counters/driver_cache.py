@@ -0,0 +1,145 @@
+"""driver_cache.py
+
+Resolve the Edge web driver executable from a local, version-pinned
+cache instead of asking the driver manager (which performs version
+discovery over the network) on every run.
+
+The cache is a directory of driver binaries plus a JSON manifest mapping
+installed browser versions to the binary that matches them. As long as
+the browser hasn't updated since the last run, resolution touches no
+network at all.
+"""
+
+import json
+import shutil
+import time
+from pathlib import Path
+
+from webdriver_manager.core.os_manager import (ChromeType,
+                                               OperationSystemManager)
+from webdriver_manager.microsoft import EdgeChromiumDriverManager
+
+from .config import DRIVER_CACHE_DIR
+from .logger import log
+from .tracing import span
+
+MANIFEST_PATH = DRIVER_CACHE_DIR / "manifest.json"
+"""Absolute path to the browser version -> driver binary manifest."""
+
+
+def resolve_driver_path() -> str:
+    """See `_resolve_driver_path`."""
+    with span("driver.resolve"):
+        return _resolve_driver_path()
+
+
+def _resolve_driver_path() -> str:
+    """Return the path to a web driver matching the installed Edge.
+
+    Resolution order:
+
+    1. The cached binary for the exact installed browser version.
+    2. A fresh download through the driver manager, which is then
+       copied into the cache and recorded in the manifest.
+    3. If the download fails (e.g. no network), the newest cached
+       binary for the same major version, if any.
+
+    Raises:
+        Exception: Whatever the driver manager raised if no fallback
+        could be found.
+    """
+    start = time.perf_counter()
+    browser_version = _get_browser_version()
+    manifest = _load_manifest()
+
+    cached_path = manifest.get(browser_version or "")
+    if cached_path is not None and Path(cached_path).is_file():
+        _log_resolution("cache hit", browser_version, start)
+        return cached_path
+
+    try:
+        downloaded_path = EdgeChromiumDriverManager().install()
+    except Exception:
+        fallback_path = _find_same_major(manifest, browser_version)
+        if fallback_path is None:
+            raise
+        _log_resolution("download failed, using same major version",
+                        browser_version, start)
+        return fallback_path
+
+    # Version couldn't be detected, so there's nothing to key on.
+    if browser_version is None:
+        _log_resolution("browser version unknown, downloaded",
+                        browser_version, start)
+        return downloaded_path
+
+    cached_path = _store_in_cache(downloaded_path, browser_version)
+    manifest[browser_version] = cached_path
+    _save_manifest(manifest)
+    _log_resolution("cache miss, downloaded", browser_version, start)
+    return cached_path
+
+
+def _get_browser_version() -> str | None:
+    """Detect the installed Edge version from the local system only."""
+    try:
+        manager = OperationSystemManager()
+        return manager.get_browser_version_from_os(ChromeType.MSEDGE)
+    except Exception:  # pylint: disable=broad-exception-caught
+        return None
+
+
+def _load_manifest() -> dict[str, str]:
+    try:
+        with MANIFEST_PATH.open("rt", encoding="utf-8") as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest: dict[str, str]) -> None:
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    # Write then rename so a crash never leaves a truncated manifest.
+    temp_path = MANIFEST_PATH.with_suffix(".tmp")
+    with temp_path.open("wt", encoding="utf-8") as fp:
+        json.dump(manifest, fp, indent=2)
+    temp_path.replace(MANIFEST_PATH)
+
+
+def _store_in_cache(driver_path: str, browser_version: str) -> str:
+    """Copy a downloaded driver into the cache, returning the new path."""
+    source = Path(driver_path)
+    destination = DRIVER_CACHE_DIR / browser_version / source.name
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(source, destination)
+    return str(destination)
+
+
+def _find_same_major(
+    manifest: dict[str, str],
+    browser_version: str | None,
+) -> str | None:
+    if browser_version is None:
+        return None
+    major = browser_version.split(".")[0]
+    candidates = [
+        version for version, path in manifest.items()
+        if version.split(".")[0] == major and Path(path).is_file()
+    ]
+    if not candidates:
+        return None
+    newest = max(candidates,
+                 key=lambda v: tuple(int(part) for part in v.split(".")))
+    return manifest[newest]
+
+
+def _log_resolution(
+    outcome: str,
+    browser_version: str | None,
+    start: float,
+) -> None:
+    elapsed = time.perf_counter() - start
+    message = (f"Driver resolved in {elapsed:.2f}s "
+               f"(Edge {browser_version or '?'}, {outcome}).")
+    print(message)
+    log.info(message)
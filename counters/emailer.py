@@ -8,10 +8,11 @@ https://docs.python.org/3/library/email.examples.html
 
 import smtplib
 import sys
-from datetime import date, datetime
+from datetime import date
 from email.message import EmailMessage
 
-from .config import ERROR_EMAIL, ERROR_EMAIL_PASSWORD, LOG_FILE_PATH
+from .config import ERROR_EMAIL, ERROR_EMAIL_PASSWORD
+from .logger import log, log_fields
 
 
 def send_email(content: str | None) -> None:
@@ -48,8 +49,6 @@ def send_email(content: str | None) -> None:
     except smtplib.SMTPException as exc:
         message = f"Failed to send email: {exc}"
         sys.stderr.write(message)
-        entry = f"[{datetime.now()}] {message}\n"
-        with LOG_FILE_PATH.open("at", encoding="utf-8") as log:
-            log.write(entry)
+        log.error(message, extra=log_fields(phase="report.email"))
     else:
         print("Email sent successfully.")
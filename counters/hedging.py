@@ -0,0 +1,125 @@
+"""hedging.py
+
+Hedged execution of browser updaters: if an attempt is taking longer
+than usual, race it against a second attempt in a fresh browser and keep
+whichever finishes first. The slow tail (e.g. a page hanging until the
+implicit wait expires) then costs at most one threshold plus one normal
+run, while typical runs pay nothing extra.
+"""
+
+# pylint: disable=broad-exception-caught
+
+import threading
+from collections.abc import Callable
+from concurrent.futures import (FIRST_COMPLETED, Future, ThreadPoolExecutor,
+                                wait)
+
+from selenium import webdriver
+
+from .logger import log
+from .updaters.base import Updater
+
+
+def update_bio_hedged(
+    updater: Updater,
+    details: dict,
+    driver: webdriver.Edge,
+    threshold: float,
+    create_driver: Callable[[], webdriver.Edge],
+    quit_driver: Callable[[webdriver.Edge], None],
+) -> webdriver.Edge:
+    """Run `updater.update_bio`, hedging with a second attempt if slow.
+
+    Args:
+        updater (Updater): The browser updater to run.
+        details (dict): Prepared details to pass to the updater.
+        driver (webdriver.Edge): The driver for the first attempt.
+        threshold (float): Seconds to wait on the first attempt before
+        starting the second.
+        create_driver (Callable): Factory for the second attempt's
+        driver.
+        quit_driver (Callable): Disposes of the first attempt's driver
+        if it loses.
+
+    Returns:
+        webdriver.Edge: The driver of the winning attempt, to be used
+        for any further work. The loser's driver has been quit, which
+        also cancels its attempt.
+
+    Raises:
+        Exception: The first error, if both attempts failed.
+    """
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hedge")
+    primary = executor.submit(updater.update_bio, details, driver)
+    done, _ = wait([primary], timeout=threshold)
+    if done:
+        executor.shutdown(wait=False)
+        primary.result()
+        return driver
+
+    message = (f"{updater.platform_name} exceeded {threshold:.1f}s, "
+               "starting a hedged attempt.")
+    print(message)
+    log.info(message)
+
+    hedge_drivers = list[webdriver.Edge]()
+    cancelled = threading.Event()
+
+    def hedged_attempt() -> webdriver.Edge:
+        hedge_driver = create_driver()
+        hedge_drivers.append(hedge_driver)
+        # The first attempt may have won while this one was starting.
+        if cancelled.is_set():
+            hedge_driver.quit()
+            raise RuntimeError("Hedged attempt cancelled")
+        updater.update_bio(details, hedge_driver)
+        return hedge_driver
+
+    hedge = executor.submit(hedged_attempt)
+    executor.shutdown(wait=False)
+
+    winner, error = _wait_for_first_success({primary, hedge})
+
+    if winner is hedge:
+        message = f"Hedged attempt for {updater.platform_name} won."
+        print(message)
+        log.info(message)
+        _quit_quietly(quit_driver, driver)
+        return hedge.result()
+
+    cancelled.set()
+    for hedge_driver in hedge_drivers:
+        _quit_quietly(lambda d: d.quit(), hedge_driver)
+    if winner is None:
+        assert error is not None
+        raise error
+    return driver
+
+
+def _wait_for_first_success(
+    futures: set[Future],
+) -> tuple[Future | None, BaseException | None]:
+    """
+    Return the first future to succeed (None if all failed) and the
+    first error seen.
+    """
+    first_error = None
+    pending = futures
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            error = future.exception()
+            if error is None:
+                return future, first_error
+            first_error = first_error or error
+    return None, first_error
+
+
+def _quit_quietly(
+    quit_driver: Callable[[webdriver.Edge], None],
+    driver: webdriver.Edge,
+) -> None:
+    try:
+        quit_driver(driver)
+    except Exception:
+        pass
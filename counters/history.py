@@ -0,0 +1,78 @@
+"""history.py
+
+Persist recent latencies of named operations across runs, so that
+decisions like hedging thresholds can be based on how long things
+actually take instead of on fixed constants.
+"""
+
+import json
+import math
+import threading
+
+from .config import HISTORY_FILE_PATH
+
+WINDOW_SIZE = 50
+"""Number of most recent samples kept per key."""
+
+MIN_SAMPLES = 5
+"""Number of samples needed before percentiles are reported."""
+
+
+class LatencyHistory:
+    """Rolling window of recent durations (in seconds) per key."""
+
+    def __init__(self) -> None:
+        self._samples: dict[str, list[float]] | None = None
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.recorded = list[tuple[str, float]]()
+        """Samples recorded by this process, in order."""
+        self.persist = True
+        """Whether `save` writes to disk (off in `--workers` workers)."""
+
+    def record(self, key: str, seconds: float) -> None:
+        """Add a sample for `key`, dropping the oldest if necessary."""
+        with self._lock:
+            samples = self._load().setdefault(key, [])
+            samples.append(round(seconds, 4))
+            del samples[:-WINDOW_SIZE]
+            self._dirty = True
+            self.recorded.append((key, seconds))
+
+    def percentile(self, key: str, fraction: float) -> float | None:
+        """Return the given percentile (0 to 1) of the samples for `key`.
+
+        Return None if there are fewer than `MIN_SAMPLES` samples.
+        """
+        with self._lock:
+            samples = sorted(self._load().get(key, []))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        index = min(math.ceil(fraction * len(samples)) - 1, len(samples) - 1)
+        return samples[max(index, 0)]
+
+    def save(self) -> None:
+        """Write the samples back to disk if any were recorded."""
+        with self._lock:
+            if not self._dirty or self._samples is None or not self.persist:
+                return
+            HISTORY_FILE_PATH.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = HISTORY_FILE_PATH.with_suffix(".tmp")
+            with temp_path.open("wt", encoding="utf-8") as fp:
+                json.dump(self._samples, fp)
+            temp_path.replace(HISTORY_FILE_PATH)
+            self._dirty = False
+
+    def _load(self) -> dict[str, list[float]]:
+        """Lazily read the samples from disk. Call with the lock held."""
+        if self._samples is None:
+            try:
+                with HISTORY_FILE_PATH.open("rt", encoding="utf-8") as fp:
+                    self._samples = json.load(fp)
+            except (OSError, ValueError):
+                self._samples = {}
+        return self._samples
+
+
+history = LatencyHistory()
+"""The history shared by the whole process."""
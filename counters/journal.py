@@ -0,0 +1,124 @@
+"""journal.py
+
+Append-only journal of per-target outcomes for each date applied.
+
+Every updater run appends one JSON line to the journal of the date being
+updated to, recording whether it succeeded and a hash of the details it
+applied. With `--resume`, a later run for the same date skips the
+targets whose latest entry is a success with the same details, so that
+retrying after a crash or a partial failure only redoes what didn't
+complete.
+"""
+
+import hashlib
+import json
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+from .config import JOURNAL_DIR, JOURNAL_RETENTION_DAYS
+from .tracing import get_run_id
+
+OUTCOME_SUCCESS = "success"
+OUTCOME_FAILURE = "failure"
+
+
+def hash_details(details: dict) -> str:
+    """Return a short, stable hash of an updater's prepared details."""
+    encoded = json.dumps(details, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class Journal:
+    """The journal of outcomes for one date."""
+
+    def __init__(self, day: date, directory: Path = JOURNAL_DIR) -> None:
+        self.day = day
+        self.directory = directory
+        self.path = directory / f"{day.isoformat()}.jsonl"
+        self._latest: dict[str, dict] | None = None
+        self._torn = False
+        """Whether the file ends in a partial line."""
+        self._lock = threading.Lock()
+
+    def has_succeeded(self, target: str, details: dict | None = None) -> bool:
+        """Whether the target's latest outcome for the date is a success.
+
+        If `details` is given, the success must also have applied the
+        same details (e.g. the template wasn't edited since).
+        """
+        with self._lock:
+            entry = self._load().get(target)
+        if entry is None or entry["outcome"] != OUTCOME_SUCCESS:
+            return False
+        return details is None or entry["details"] == hash_details(details)
+
+    def record(
+        self,
+        target: str,
+        details: dict,
+        error: Exception | None = None,
+    ) -> None:
+        """Append the outcome of updating the target with `details`."""
+        entry = {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "run_id": get_run_id(),
+            "target": target,
+            "details": hash_details(details),
+            "outcome": OUTCOME_SUCCESS if error is None else OUTCOME_FAILURE,
+        }
+        if error is not None:
+            entry["error"] = f"{type(error).__name__}: {error}"
+        with self._lock:
+            latest = self._load()
+            self.directory.mkdir(parents=True, exist_ok=True)
+            # One write per line, flushed on close, so an interrupted run
+            # loses at most the entry being written.
+            with self.path.open("at", encoding="utf-8") as fp:
+                prefix = "\n" if self._torn else ""
+                fp.write(prefix + json.dumps(entry) + "\n")
+            self._torn = False
+            latest[target] = entry
+
+    def entries(self) -> list[dict]:
+        """Read all entries of the date, oldest first."""
+        entries = list[dict]()
+        try:
+            with self.path.open("rt", encoding="utf-8") as fp:
+                for line in fp:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            pass
+        return entries
+
+    def prune(self) -> None:
+        """Delete journals older than `JOURNAL_RETENTION_DAYS`."""
+        cutoff = date.today() - timedelta(days=JOURNAL_RETENTION_DAYS)
+        for path in self.directory.glob("*.jsonl"):
+            try:
+                day = date.fromisoformat(path.stem)
+            except ValueError:
+                continue
+            if day < cutoff:
+                path.unlink(missing_ok=True)
+
+    def _load(self) -> dict[str, dict]:
+        """Lazily read the latest entry per target. Call with the lock."""
+        if self._latest is None:
+            self._latest = {}
+            try:
+                with self.path.open("rt", encoding="utf-8") as fp:
+                    for line in fp:
+                        self._torn = not line.endswith("\n")
+                        try:
+                            entry = json.loads(line)
+                        except ValueError:
+                            # Partial line from an interrupted write.
+                            continue
+                        self._latest[entry["target"]] = entry
+            except OSError:
+                pass
+        return self._latest
@@ -4,6 +4,7 @@ from datetime import datetime
 import jsonschema
 
 from .config import DATE_FORMAT, JSON_FILE_PATH, JSON_SCHEMA_PATH
+from .tracing import span
 
 
 def load_bio_config_json() -> dict:  # TODO: Define a better type for this.
@@ -62,10 +63,12 @@ def _validate_json() -> dict:
     Returns:
         dict: The JSON data if validated successfully.
     """
-    with JSON_SCHEMA_PATH.open("rt", encoding="utf-8") as fp:
-        schema = json.load(fp)
-    with JSON_FILE_PATH.open("rt", encoding="utf-8") as fp:
-        data = json.load(fp)
-
-    jsonschema.validate(instance=data, schema=schema)
+    with span("config.parse"):
+        with JSON_SCHEMA_PATH.open("rt", encoding="utf-8") as fp:
+            schema = json.load(fp)
+        with JSON_FILE_PATH.open("rt", encoding="utf-8") as fp:
+            data = json.load(fp)
+
+    with span("config.validate"):
+        jsonschema.validate(instance=data, schema=schema)
     return data
@@ -1,26 +1,182 @@
 """logger.py
 
 Handles logging the status of the run to the dedicated log file.
+
+Log calls never touch the disk themselves: a `QueueHandler` hands their
+records to a background thread, which writes them as JSON lines, one
+object per record with its time, level, run ID and message, and the
+target, phase and duration when the call gave them (see `log_fields`).
+The thread is started by the first record and only opens a file when it
+has something to write to it, flushing once per batch of records.
 """
 
+# pylint: disable=broad-exception-caught
+
+import atexit
+import json
 import logging
 import os
+import queue
 import re
+import threading
 import traceback
 from datetime import datetime
+from functools import cache
+from logging.handlers import QueueHandler
 from pathlib import Path
-from typing import Generator
+from typing import Any, Generator, TextIO
 
-from .config import (EXIT_FAILURE_GITHUB, EXIT_FAILURE_INSTAGRAM,
-                     EXIT_FAILURE_SPOTIFY, LOG_FILE_PATH, PLATFORM_GITHUB,
-                     PLATFORM_INSTAGRAM, PLATFORM_SPOTIFY)
+from .config import (EXIT_FAILURE, EXIT_FAILURE_GITHUB, EXIT_FAILURE_INSTAGRAM,
+                     EXIT_FAILURE_SPOTIFY, LOG_BATCH_SIZE, LOG_FILE_PATH,
+                     PLATFORM_GITHUB, PLATFORM_INSTAGRAM, PLATFORM_SPOTIFY)
+from .tracing import get_run_id
 from .utils import print_error
 
-logging.basicConfig(filename=LOG_FILE_PATH,
-                    filemode="at",
-                    encoding="utf-8",
-                    level=logging.INFO,
-                    format="[%(asctime)s] %(message)s")
+REPORT_SUCCESS = "No problems detected."
+"""Message of the report of a run without errors."""
+
+_FIELDS = ("target", "phase", "duration")
+_STOP = None
+
+
+class _LogWriter:
+    """Writes queued log records to their files on a background thread.
+
+    A record goes to the file named by its `log_path` attribute, the
+    program log file by default. Each file is flushed whenever the queue
+    runs dry, or after `LOG_BATCH_SIZE` records.
+    """
+
+    def __init__(self) -> None:
+        self.queue = queue.SimpleQueue[logging.LogRecord | None]()
+        self._files = dict[Path, TextIO]()
+        self._thread = threading.Thread(target=self._write, daemon=True,
+                                        name="log-writer")
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Write out the queued records and close the files."""
+        self.queue.put(_STOP)
+        self._thread.join()
+
+    def _write(self) -> None:
+        stopping = False
+        while not stopping:
+            batch = [self.queue.get()]
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            touched = set[TextIO]()
+            for record in batch:
+                if record is _STOP:
+                    stopping = True
+                    continue
+                try:
+                    fp = self._open(getattr(record, "log_path",
+                                            LOG_FILE_PATH))
+                    fp.write(_format_record(record) + "\n")
+                    touched.add(fp)
+                except Exception as exc:
+                    print_error(f"Could not write to the log: {exc}")
+            for fp in touched:
+                try:
+                    fp.flush()
+                except OSError as exc:
+                    print_error(f"Could not write to the log: {exc}")
+
+        for fp in self._files.values():
+            fp.close()
+
+    def _open(self, path: Path) -> TextIO:
+        fp = self._files.get(path)
+        if fp is None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # pylint: disable-next=consider-using-with
+            fp = self._files[path] = path.open("at", encoding="utf-8")
+        return fp
+
+
+_writer_lock = threading.Lock()
+
+
+class _Handler(QueueHandler):
+    """Queues records for the writer, tagged with the run and file."""
+
+    def __init__(self, path: Path | None = None) -> None:
+        super().__init__(None)  # type: ignore
+        self.path = path
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = super().prepare(record)
+        record.run_id = get_run_id()
+        if self.path is not None:
+            record.log_path = self.path
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        _get_writer().queue.put(record)
+
+
+def _get_writer() -> _LogWriter:
+    """Return the process's log writer, starting it on first use."""
+    # The cache alone could start two writers on concurrent first uses.
+    with _writer_lock:
+        return _start_writer()
+
+
+@cache
+def _start_writer() -> _LogWriter:
+    writer = _LogWriter()
+    # Registered after logging's own shutdown hook, so it runs before it.
+    atexit.register(writer.stop)
+    return writer
+
+
+def _format_record(record: logging.LogRecord) -> str:
+    entry = {
+        "time": datetime.fromtimestamp(record.created).isoformat(),
+        "level": record.levelname,
+        "run_id": getattr(record, "run_id", None),
+        "message": record.getMessage(),
+    }
+    for name in _FIELDS:
+        value = getattr(record, name, None)
+        if value is not None:
+            entry[name] = value
+    return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def log_fields(
+    target: str | None = None,
+    phase: str | None = None,
+    duration: float | None = None,
+) -> dict[str, Any]:
+    """Return the `extra` for a log call, to record the structured fields
+    along with its message."""
+    if duration is not None:
+        duration = round(duration, 3)
+    return {"target": target, "phase": phase, "duration": duration}
+
+
+def get_file_logger(name: str, path: Path) -> logging.Logger:
+    """Return a logger writing to its own file instead of the program
+    log file, through the same background writer."""
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        logger.addHandler(_Handler(path))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+# Like logging.basicConfig, leave the root logger alone if the host
+# application configured it.
+if not logging.root.handlers:
+    logging.root.addHandler(_Handler())
+    logging.root.setLevel(logging.INFO)
 log = logging.getLogger(__package__)
 
 
@@ -57,6 +213,9 @@ class FailureLog:
         """
         result = 0
 
+        if self.driver is not None:
+            result |= EXIT_FAILURE
+
         if PLATFORM_GITHUB in self.platforms:
             result |= EXIT_FAILURE_GITHUB
         if PLATFORM_INSTAGRAM in self.platforms:
@@ -91,18 +250,19 @@ class FailureLog:
             content += self._format_error(self.json)
             # No other errors could be reached if this failed.
             return content
+
+        # Independent task failures.
+        content = ""
+
+        # The API-backed tasks still run if the driver failed to start,
+        # so report them after it.
         if self.driver:
-            content = "There was an error initializing the Edge web driver:\n"
+            content += "There was an error initializing the Edge web driver:\n"
             content += self._format_error(self.driver)
-            # No other errors could be reached if this failed.
-            return content
 
         # Summary lines.
         summaries = list[str]()
 
-        # Independent task failures.
-        content = ""
-
         for platform_name in platforms_attempted:
             exc = self.platforms.get(platform_name)
             if exc is None:
@@ -130,14 +290,11 @@ class FailureLog:
             report (str | None): Error report. None if no errors
             occurred.
         """
-        entry = f"[{datetime.now()}] "
+        fields = log_fields(phase="report")
         if report is None:
-            entry += "No problems detected.\n"
+            log.info(REPORT_SUCCESS, extra=fields)
         else:
-            entry += f"Encountered errors:\n{report}\n"
-
-        with LOG_FILE_PATH.open("at", encoding="utf-8") as fp:
-            fp.write(entry)
+            log.error("Encountered errors:\n%s", report, extra=fields)
 
     def _format_error(self, error: Exception) -> str:
         """Return the traceback of the error as a string.
@@ -154,12 +311,24 @@ def get_last_success_timestamp() -> datetime | None:
     and return the timestamp at which it was logged. Return None if no
     such entry could be found.
     """
+    # Entries written before the log was JSON lines.
     matcher = re.compile(r"\[(.+?)\] No problems detected.")
-    for line in _reverse_readline(LOG_FILE_PATH):
-        match = matcher.match(line)
-        if match is not None:
-            timestamp: str = match.group(1)
-            return datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S.%f")
+    try:
+        for line in _reverse_readline(LOG_FILE_PATH):
+            if line.startswith("{"):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("message") == REPORT_SUCCESS:
+                    return datetime.fromisoformat(entry["time"])
+                continue
+            match = matcher.match(line)
+            if match is not None:
+                timestamp: str = match.group(1)
+                return datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S.%f")
+    except FileNotFoundError:
+        pass
     return None
 
 
@@ -0,0 +1,176 @@
+"""profiling.py
+
+CPU and memory profiling of a whole run, for `--profile`.
+
+While active, three profilers watch the run:
+
+* cProfile, for exact call counts and cumulative times per function,
+  written as a pstats file (open it with `python -m pstats` or snakeviz).
+* A sampling thread recording the stack of every other thread at a fixed
+  interval, written in the collapsed-stack format that flame graph tools
+  (flamegraph.pl, speedscope, inferno) read directly.
+* tracemalloc, whose snapshots taken at the start and the end of the run
+  are compared into a plain-text summary of the top allocation sites.
+
+Tracing allocations slows down allocation-heavy code (most of all,
+imports) several times over, which skews the CPU profiles towards it.
+Profile only one of `PROFILE_CPU` or `PROFILE_MEMORY` for accurate
+timings.
+"""
+
+import cProfile
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from types import FrameType
+
+from .config import PROFILES_DIR
+
+PROFILE_CPU = "cpu"
+"""Run cProfile and the stack sampler."""
+
+PROFILE_MEMORY = "memory"
+"""Run tracemalloc."""
+
+PROFILE_ALL = "all"
+"""Run every profiler."""
+
+SAMPLE_INTERVAL = 0.005
+"""Time in seconds between two stack samples."""
+
+TRACEMALLOC_FRAMES = 1
+"""Number of frames tracemalloc keeps per allocation."""
+
+TOP_ALLOCATIONS = 25
+"""Number of allocation sites listed in the summary."""
+
+
+class RunProfiler:
+    """CPU and memory profilers to start before a run and stop after."""
+
+    def __init__(
+        self,
+        mode: str = PROFILE_ALL,
+        interval: float = SAMPLE_INTERVAL,
+    ) -> None:
+        self.cpu = mode in (PROFILE_CPU, PROFILE_ALL)
+        self.memory = mode in (PROFILE_MEMORY, PROFILE_ALL)
+        self.interval = interval
+        self.profile = cProfile.Profile()
+        self.stacks = Counter[str]()
+        """Number of samples per collapsed stack."""
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample,
+                                         name="profile-sampler",
+                                         daemon=True)
+        self._start_snapshot: tracemalloc.Snapshot | None = None
+        self._end_snapshot: tracemalloc.Snapshot | None = None
+        self._peak_bytes = 0
+        self._elapsed = 0.0
+        self._started = 0.0
+
+    def start(self) -> None:
+        if self.memory:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._start_snapshot = tracemalloc.take_snapshot()
+        self._started = time.perf_counter()
+        if self.cpu:
+            self._sampler.start()
+            self.profile.enable()
+
+    def stop(self) -> None:
+        if self.cpu:
+            self.profile.disable()
+        self._elapsed = time.perf_counter() - self._started
+        if self.cpu:
+            self._stop.set()
+            self._sampler.join()
+        if self.memory:
+            self._end_snapshot = tracemalloc.take_snapshot()
+            self._peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def export(self, name: str, directory: Path = PROFILES_DIR) -> list[Path]:
+        """Write the profiles, named after `name` (e.g. a run ID).
+
+        Returns:
+            list[Path]: Paths to the files written: the pstats and
+            collapsed-stack files and/or the allocation summary.
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = list[Path]()
+
+        if self.cpu:
+            pstats_path = directory / f"{name}.pstats"
+            self.profile.dump_stats(pstats_path)
+            paths.append(pstats_path)
+
+            stacks_path = directory / f"{name}.folded"
+            with stacks_path.open("wt", encoding="utf-8") as fp:
+                for stack, count in self.stacks.most_common():
+                    fp.write(f"{stack} {count}\n")
+            paths.append(stacks_path)
+
+        if self.memory:
+            allocations_path = directory / f"{name}.allocations.txt"
+            allocations_path.write_text(self._allocations_summary(),
+                                        encoding="utf-8")
+            paths.append(allocations_path)
+
+        return paths
+
+    def _sample(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name
+                     for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                thread_name = names.get(thread_id, str(thread_id))
+                self.stacks[_collapse(thread_name, frame)] += 1
+
+    def _allocations_summary(self) -> str:
+        assert self._start_snapshot is not None
+        assert self._end_snapshot is not None
+        # Leave out allocations made by the profilers themselves.
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__),
+                   tracemalloc.Filter(False, __file__)]
+        start = self._start_snapshot.filter_traces(filters)
+        end = self._end_snapshot.filter_traces(filters)
+
+        total = sum(stat.size for stat in end.statistics("filename"))
+        lines = [
+            f"Run time: {self._elapsed:.2f}s (slowed down by tracing)",
+            f"Peak traced memory: {self._peak_bytes / 2**20:.1f} MiB",
+            f"Still allocated at the end: {total / 2**20:.1f} MiB",
+            "",
+            f"Top {TOP_ALLOCATIONS} allocation sites by growth during "
+            "the run:",
+        ]
+        for stat in end.compare_to(start, "lineno")[:TOP_ALLOCATIONS]:
+            lines.append(f"  {stat}")
+
+        lines.append("")
+        lines.append("Largest allocation tracebacks:")
+        for stat in end.statistics("traceback")[:3]:
+            lines.append(f"  {stat.size / 1024:.1f} KiB in "
+                         f"{stat.count} blocks")
+            lines.extend(f"    {line}" for line in stat.traceback.format())
+        return "\n".join(lines) + "\n"
+
+
+def _collapse(thread_name: str, frame: FrameType | None) -> str:
+    """Format a stack root-first, with `;` between frames."""
+    frames = list[str]()
+    while frame is not None:
+        code = frame.f_code
+        filename = Path(code.co_filename)
+        frames.append(f"{code.co_name} ({filename.parent.name}/"
+                      f"{filename.name}:{code.co_firstlineno})")
+        frame = frame.f_back
+    frames.append(thread_name)
+    return ";".join(reversed(frames))
@@ -0,0 +1,212 @@
+"""queue_worker.py
+
+Consume target updates from the work queue, for `counters queue work`.
+
+A worker runs the leased jobs through the same updater pipeline as a
+normal run, keeping its browser open across batches, and acknowledges or
+fails each job according to its outcome.
+"""
+
+# pylint: disable=broad-exception-caught
+
+import dataclasses
+import os
+import socket
+import threading
+import time
+import traceback
+import uuid
+from collections import defaultdict
+from datetime import date
+
+from selenium import webdriver
+
+from .config import (BACKEND_HTTP, EXIT_FAILURE, EXIT_SUCCESS,
+                     QUEUE_POLL_INTERVAL, QUEUE_VISIBILITY_TIMEOUT,
+                     ProgramOptions)
+from .core import CountersProgram
+from .history import history
+from .journal import Journal
+from .logger import FailureLog, log
+from .updaters.base import Updater
+from .utils import print_error
+from .work_queue import Job, WorkQueue
+
+
+class QueueWorkerProgram(CountersProgram):
+    """The main program, running leased jobs instead of a whole config."""
+
+    def __init__(
+        self,
+        options: ProgramOptions,
+        queue: WorkQueue,
+        batch_size: int,
+    ) -> None:
+        super().__init__(options)
+        self.queue = queue
+        self.batch_size = batch_size
+        self.owner = (f"{socket.gethostname()}:{os.getpid()}:"
+                      f"{uuid.uuid4().hex[:8]}")
+        """Identity of this worker on its leases."""
+        self.driver: webdriver.Edge | None = None
+        self.dead_lettered = 0
+
+    def work(
+        self,
+        max_jobs: int | None = None,
+        idle_timeout: float | None = None,
+    ) -> int:
+        """Process jobs until `max_jobs` were processed, or the queue has
+        been empty for `idle_timeout` seconds (forever if None).
+
+        Returns:
+            int: The exit code: a failure if any job was dead-lettered.
+        """
+        processed = 0
+        idle_since = time.monotonic()
+        try:
+            while max_jobs is None or processed < max_jobs:
+                limit = self.batch_size
+                if max_jobs is not None:
+                    limit = min(limit, max_jobs - processed)
+                jobs = self.queue.lease(self.owner, limit)
+                if not jobs:
+                    idle = time.monotonic() - idle_since
+                    if idle_timeout is not None and idle >= idle_timeout:
+                        break
+                    time.sleep(QUEUE_POLL_INTERVAL)
+                    continue
+
+                with _LeaseKeeper(self.queue, self.owner, jobs):
+                    self._run_jobs(jobs)
+                history.save()
+                processed += len(jobs)
+                idle_since = time.monotonic()
+        finally:
+            if self.driver is not None:
+                self._quit_web_driver(self.driver)
+
+        return EXIT_FAILURE if self.dead_lettered else EXIT_SUCCESS
+
+    def _run_jobs(self, jobs: list[Job]) -> None:
+        self.failure_log = FailureLog()
+        # Reloaded for every batch, so edits apply without a restart.
+        data = self.load_bio_config_json()
+        if data is None:
+            for job in jobs:
+                self._fail(job, self.failure_log.json)
+            return
+
+        by_day = defaultdict[date, list[Job]](list)
+        for job in jobs:
+            by_day[job.day].append(job)
+
+        for day, day_jobs in by_day.items():
+            # Failures are looked up by target, so only keep this day's.
+            self.failure_log = FailureLog()
+            self.options = dataclasses.replace(self.options,
+                                               date_to_update_to=day)
+            self.journal = Journal(day)
+            updaters = {updater.platform_name: updater
+                        for updater in self.get_updaters(data)}
+
+            runnable = list[tuple[Job, Updater]]()
+            for job in day_jobs:
+                updater = updaters.get(job.target)
+                if updater is None:
+                    self._fail(job, LookupError(
+                        f"{job.target} is no longer configured"), retry=False)
+                else:
+                    runnable.append((job, updater))
+
+            # Updates that went through before a crash are in the journal.
+            remaining = self._skip_completed([u for _, u in runnable])
+            self._run_batch(remaining)
+
+            for job, updater in runnable:
+                exc = self.failure_log.platforms.get(job.target)
+                if exc is not None:
+                    self._fail(job, exc)
+                elif not self.queue.complete(self.owner, job):
+                    print_error(f"Lost the lease on {job.target} for "
+                                f"{job.day}, another worker has it now.")
+
+    def _run_batch(self, updaters: list[Updater]) -> None:
+        self._run_updaters([u for u in updaters if not u.uses_browser], None)
+
+        browser_updaters = [u for u in updaters if u.uses_browser]
+        if self.options.backend == BACKEND_HTTP:
+            browser_updaters = self._run_http_updaters(browser_updaters, [])
+        if not browser_updaters:
+            return
+
+        if self.driver is None:
+            self.driver = self._init_web_driver()
+        if self.driver is None:
+            for updater in browser_updaters:
+                self.failure_log.platforms[updater.platform_name] = \
+                    self.failure_log.driver  # type: ignore
+            return
+
+        self.driver = self._run_updaters(browser_updaters, self.driver)
+        # Don't carry a browser that may be broken into the next batch.
+        if any(u.platform_name in self.failure_log.platforms
+               for u in browser_updaters):
+            self._quit_web_driver(self.driver)  # type: ignore
+            self.driver = None
+
+    def _fail(
+        self,
+        job: Job,
+        exc: Exception | None,
+        retry: bool = True,
+    ) -> None:
+        error = "".join(traceback.format_exception(exc)) if exc else "?"
+        if not self.queue.fail(self.owner, job, error, retry):
+            print_error(f"Lost the lease on {job.target} for {job.day}, "
+                        "another worker has it now.")
+            return
+        if retry and job.attempts < job.max_attempts:
+            message = (f"{job.target} for {job.day} failed (attempt "
+                       f"{job.attempts} of {job.max_attempts}), will retry.")
+        else:
+            message = (f"{job.target} for {job.day} failed for good, moved "
+                       "to the dead letters.")
+            self.dead_lettered += 1
+        print_error(message)
+        log.error(message)
+
+
+class _LeaseKeeper:
+    """Keeps extending the leases on jobs while they're being run."""
+
+    def __init__(self, queue: WorkQueue, owner: str, jobs: list[Job]) -> None:
+        # SQLite connections can't be shared with the keeper thread.
+        self.path = queue.path
+        self.owner = owner
+        self.jobs = jobs
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._keep, daemon=True,
+                                        name="lease-keeper")
+
+    def __enter__(self) -> "_LeaseKeeper":
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback_) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _keep(self) -> None:
+        queue = None
+        try:
+            while not self._stop.wait(QUEUE_VISIBILITY_TIMEOUT / 3):
+                if queue is None:
+                    queue = WorkQueue(self.path)
+                queue.extend(self.owner, self.jobs)
+        except Exception as exc:
+            # The leases will just expire and the jobs be retried.
+            print_error(f"Could not extend leases: {exc}")
+        finally:
+            if queue is not None:
+                queue.close()
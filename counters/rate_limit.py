@@ -0,0 +1,183 @@
+"""rate_limit.py
+
+Token-bucket rate limiting of outgoing API requests.
+
+Every request made by the updaters (Spotify through tekore, GitHub
+through PyGithub, and the web apps' HTTP backend) first takes a token
+from the bucket of its host and credential. Buckets start from the
+static limits in `RATE_LIMITS` and then follow what the server says:
+
+* `Retry-After` (with a 429 or 503) blocks the bucket for that long.
+* `X-RateLimit-Remaining` with `X-RateLimit-Reset(-After)` spreads the
+  remaining budget evenly over what's left of the window, and blocks the
+  bucket until the reset once the budget is spent.
+
+Requests are thus paced to the fastest rate the server allows instead of
+bursting into 429s and sleeping them off one client at a time.
+"""
+
+import hashlib
+import math
+import threading
+import time
+from collections.abc import Mapping
+from urllib.parse import urlsplit
+
+from .config import RATE_LIMIT_DEFAULT_BACKOFF, RATE_LIMITS
+
+THROTTLED_STATUSES = {429, 503}
+"""Status codes whose Retry-After header applies to the whole bucket."""
+
+
+class TokenBucket:
+    """Tokens refilled at a steady rate, up to a burst capacity."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        """Tokens added per second."""
+        self.capacity = capacity
+        """Maximum number of tokens, i.e. of back-to-back requests."""
+        self.tokens = capacity
+        self.waited = 0.0
+        """Total time in seconds callers were made to wait."""
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._paced_rate: float | None = None
+        self._paced_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, sleeping until one is available.
+
+        Returns:
+            float: Time in seconds spent waiting.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # Reserve the token now so concurrent callers queue up behind
+            # each other instead of all waking up at once.
+            self.tokens -= 1
+            wait = max(self._blocked_until - now, 0.0)
+            if self.tokens < 0:
+                wait += -self.tokens / max(self._rate(now), 1e-3)
+            self.waited += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def block(self, seconds: float) -> None:
+        """Hand out no tokens for the given time."""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until,
+                                      time.monotonic() + seconds)
+
+    def pace(self, remaining: int, reset_after: float) -> None:
+        """Spread the remaining budget of the window until its reset."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if remaining <= 0:
+                self._blocked_until = max(self._blocked_until,
+                                          now + reset_after)
+                self.tokens = min(self.tokens, 0.0)
+                return
+            self.tokens = min(self.tokens, float(remaining))
+            if reset_after > 0:
+                self._paced_rate = remaining / reset_after
+                self._paced_until = now + reset_after
+
+    def _rate(self, now: float) -> float:
+        if self._paced_rate is not None and now < self._paced_until:
+            return min(self.rate, self._paced_rate)
+        return self.rate
+
+    def _refill(self, now: float) -> None:
+        """Add the tokens accrued since the last update."""
+        start = max(self._updated, self._blocked_until)
+        if now > start:
+            self.tokens = min(self.capacity,
+                              self.tokens + (now - start) * self._rate(now))
+        self._updated = now
+
+
+class RateLimiter:
+    """Buckets per API host and credential, shared by all updaters."""
+
+    def __init__(
+        self,
+        limits: Mapping[str, tuple[float, float]] | None = None,
+    ) -> None:
+        self.limits = RATE_LIMITS if limits is None else limits
+        self._buckets = dict[tuple[str, str], TokenBucket]()
+        self._lock = threading.Lock()
+
+    def bucket(self, url: str, credential: str | None) -> TokenBucket:
+        """Return the bucket for the URL's host and the credential."""
+        host = urlsplit(url).hostname or ""
+        # Keyed by a digest so the secrets don't linger in memory here.
+        key = (host, _digest(credential))
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                # Unknown hosts aren't shaped, but still obey the server.
+                rate, capacity = self.limits.get(host, (math.inf, math.inf))
+                bucket = self._buckets[key] = TokenBucket(rate, capacity)
+        return bucket
+
+    def acquire(self, url: str, credential: str | None) -> float:
+        """Wait for the go-ahead to make a request to `url`."""
+        return self.bucket(url, credential).acquire()
+
+    def observe(
+        self,
+        url: str,
+        credential: str | None,
+        status: int,
+        headers: Mapping[str, str],
+    ) -> None:
+        """Update the bucket from the rate limit headers of a response."""
+        bucket = self.bucket(url, credential)
+        headers = {name.lower(): value for name, value in headers.items()}
+
+        retry_after = _parse_float(headers.get("retry-after"))
+        if status in THROTTLED_STATUSES:
+            bucket.block(retry_after if retry_after is not None
+                         else RATE_LIMIT_DEFAULT_BACKOFF)
+        elif retry_after is not None:
+            bucket.block(retry_after)
+
+        remaining = _parse_float(headers.get("x-ratelimit-remaining"))
+        if remaining is None:
+            return
+        reset_after = _parse_float(headers.get("x-ratelimit-reset-after"))
+        if reset_after is None:
+            reset_at = _parse_float(headers.get("x-ratelimit-reset"))
+            if reset_at is None:
+                return
+            reset_after = max(reset_at - time.time(), 0.0)
+        bucket.pace(int(remaining), reset_after)
+
+    def total_wait(self) -> float:
+        """Return the total time requests were held back, in seconds."""
+        with self._lock:
+            return sum(bucket.waited for bucket in self._buckets.values())
+
+
+limiter = RateLimiter()
+"""The limiter shared by the whole process."""
+
+
+def _digest(credential: str | None) -> str:
+    if credential is None:
+        return ""
+    return hashlib.sha256(credential.encode()).hexdigest()[:16]
+
+
+def _parse_float(value: str | None) -> float | None:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
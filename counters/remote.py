@@ -0,0 +1,221 @@
+"""remote.py
+
+Run the browser on remote Selenium standalone servers or grids, for
+`--grid URL`, instead of launching Edge on the machine running counters.
+
+Sessions are pooled: a driver given back after a run is reset to a
+blank tab and kept open for the next one in the same process (e.g. the
+next batch of a queue worker), up to a number of uses, and all pooled
+sessions are ended when the process exits. A reused session keeps its
+cookies, so it is usually still logged in, which the updaters' login
+steps check for before filling in a form.
+
+New sessions are dispatched by node capacity. Every configured endpoint
+reports its nodes and their slots on `/status`, and the session goes to
+the endpoint with the most idle Edge slots on nodes that are up. When
+none has a free slot, the pool waits for one for a while rather than
+piling more requests onto the grid's session queue.
+"""
+
+import atexit
+import json
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+
+from .browser import create_remote_driver, reset_tabs
+from .config import (GRID_POOL_SIZE, GRID_QUEUE_TIMEOUT, GRID_SESSION_MAX_USES,
+                     GRID_STATUS_TIMEOUT)
+from .logger import log
+
+EDGE_BROWSER_NAMES = {"MicrosoftEdge", "msedge"}
+"""Browser names a node slot for Edge can be advertised with."""
+
+
+@dataclass
+class EndpointStatus:
+    """Edge capacity of a standalone server or grid."""
+    url: str
+    free_slots: int
+    """Idle Edge slots on nodes that are up."""
+    total_slots: int
+    """All Edge slots on nodes that are up."""
+
+
+def get_status(url: str) -> EndpointStatus | None:
+    """Query the endpoint's `/status`, or None if it didn't answer."""
+    status_url = url.rstrip("/") + "/status"
+    try:
+        with urllib.request.urlopen(status_url,
+                                    timeout=GRID_STATUS_TIMEOUT) as response:
+            value = json.load(response)["value"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+    # A driver server (e.g. msedgedriver itself) has no nodes to report.
+    if "nodes" not in value:
+        ready = bool(value.get("ready"))
+        return EndpointStatus(url, int(ready), 1)
+
+    free = total = 0
+    for node in value.get("nodes", []):
+        if node.get("availability", "UP") != "UP":
+            continue
+        for slot in node.get("slots", []):
+            stereotype = slot.get("stereotype", {})
+            if stereotype.get("browserName") not in EDGE_BROWSER_NAMES:
+                continue
+            total += 1
+            if slot.get("session") is None:
+                free += 1
+    return EndpointStatus(url, free, total)
+
+
+@dataclass
+class _PooledSession:
+    driver: webdriver.Remote
+    key: tuple
+    """The options the session was started with."""
+    uses: int = 0
+
+
+class SessionPool:
+    """Remote Edge sessions on a set of endpoints, reused within a process.
+
+    Safe to share between threads, but a session is only ever handed to
+    one caller at a time.
+    """
+
+    def __init__(self, urls: list[str]) -> None:
+        self.urls = urls
+        self._idle = list[_PooledSession]()
+        self._leased = dict[str, _PooledSession]()
+        self._lock = threading.Lock()
+
+    def acquire(
+        self,
+        headless: bool,
+        lean: bool = False,
+        logging_prefs: dict[str, str] | None = None,
+        tabs: bool = False,
+    ) -> webdriver.Remote:
+        """Return an idle session started with the same options, or start
+        a new one on the endpoint with the most free capacity.
+
+        Raises:
+            WebDriverException: No endpoint can run Edge.
+        """
+        key = (headless, lean, json.dumps(logging_prefs, sort_keys=True),
+               tabs)
+        with self._lock:
+            for session in self._idle:
+                if session.key == key:
+                    self._idle.remove(session)
+                    break
+            else:
+                session = None
+
+        if session is not None and _is_alive(session.driver):
+            print("Reusing a pooled remote browser session.")
+        else:
+            if session is not None:
+                _quit(session.driver)
+            url = self._choose_endpoint()
+            driver = create_remote_driver(url, headless, lean, logging_prefs,
+                                          tabs)
+            session = _PooledSession(driver, key)
+
+        session.uses += 1
+        with self._lock:
+            self._leased[session.driver.session_id] = session  # type: ignore
+        return session.driver
+
+    def release(self, driver: webdriver.Remote) -> None:
+        """Give a session back, keeping it for reuse if there's room."""
+        with self._lock:
+            session = self._leased.pop(driver.session_id, None)  # type: ignore
+            keep = (session is not None
+                    and session.uses < GRID_SESSION_MAX_USES
+                    and len(self._idle) < GRID_POOL_SIZE)
+        if keep and reset_tabs(driver):
+            with self._lock:
+                self._idle.append(session)  # type: ignore
+        else:
+            _quit(driver)
+
+    def discard(self, driver: webdriver.Remote) -> None:
+        """End a session instead of giving it back."""
+        with self._lock:
+            self._leased.pop(driver.session_id, None)  # type: ignore
+        _quit(driver)
+
+    def close(self) -> None:
+        """End all idle sessions."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for session in idle:
+            _quit(session.driver)
+
+    def _choose_endpoint(self) -> str:
+        """Return the URL of the endpoint to start a session on.
+
+        Raises:
+            WebDriverException: None of the endpoints can run Edge.
+        """
+        deadline = time.monotonic() + GRID_QUEUE_TIMEOUT
+        while True:
+            statuses = [status for status in map(get_status, self.urls)
+                        if status is not None and status.total_slots]
+            if not statuses:
+                raise WebDriverException(
+                    "None of the grid endpoints is reachable with a node "
+                    f"that can run Edge: {', '.join(self.urls)}")
+            best = max(statuses,
+                       key=lambda status: (status.free_slots,
+                                           status.total_slots))
+            if best.free_slots or time.monotonic() >= deadline:
+                break
+            time.sleep(1.0)
+
+        message = (f"Dispatching browser to {best.url} ({best.free_slots} "
+                   f"of {best.total_slots} Edge slots free).")
+        print(message)
+        log.info(message)
+        return best.url
+
+
+_pools = dict[tuple[str, ...], SessionPool]()
+
+
+def get_pool(urls: list[str]) -> SessionPool:
+    """Return the process-wide pool of sessions on the endpoints."""
+    key = tuple(urls)
+    pool = _pools.get(key)
+    if pool is None:
+        pool = _pools[key] = SessionPool(urls)
+    return pool
+
+
+@atexit.register
+def _close_pools() -> None:
+    for pool in _pools.values():
+        pool.close()
+
+
+def _is_alive(driver: webdriver.Remote) -> bool:
+    try:
+        driver.window_handles  # pylint: disable=pointless-statement
+    except WebDriverException:
+        return False
+    return True
+
+
+def _quit(driver: webdriver.Remote) -> None:
+    try:
+        driver.quit()
+    except WebDriverException:
+        pass
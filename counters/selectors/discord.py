@@ -20,6 +20,10 @@ SET_STATUS_ITEM = CSSSelector("#account-set-custom-status")
 EDIT_STATUS_ITEM = CSSSelector("#account-edit-custom-status")
 """The "Edit Custom Status" menu item in the avatar menu popup."""
 
+CUSTOM_STATUS_ITEM = CSSSelector(
+    f"{EDIT_STATUS_ITEM.value}, {SET_STATUS_ITEM.value}")
+"""Whichever of the two custom status menu items is present."""
+
 STATUS_INPUT = CSSSelector(".inputDefault__80165")
 """The text input box that appear upon clicking Edit Custom Status."""
 
@@ -0,0 +1,388 @@
+"""server.py
+
+Local HTTP API over the program's state, for `counters serve`.
+
+All endpoints answer JSON:
+
+    GET  /previews[?date=YYYY-MM-DD]  What each target would be updated
+                                      with on the date (as `--dry-run`).
+    POST /runs                        Start a run: {"date": "YYYY-MM-DD",
+                                      "targets": ["discord", ...],
+                                      "resume": false}, all optional.
+    GET  /runs                        Runs started by this server.
+    GET  /runs/<run ID>               One of them.
+    GET  /outcomes[?date=YYYY-MM-DD]  Latest outcome per target for the
+                                      date, from the journal.
+    GET  /statuses[?limit=N]          The status-logger history.
+
+The validated configuration, the previews rendered from it, and the
+parsed journals and status log are kept in memory and only reloaded when
+their files change, so a request costs a stat instead of re-reading and
+re-validating the JSON. Runs execute one at a time, on a background
+thread of the server process.
+"""
+
+# pylint: disable=broad-exception-caught
+
+import csv
+import dataclasses
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import Callable
+from datetime import date, datetime
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import parse_qs, urlsplit
+
+from . import tracing
+from .config import (JSON_FILE_PATH, JSON_SCHEMA_PATH, SERVE_CACHE_SIZE,
+                     SERVE_RUN_HISTORY, ProgramOptions)
+from .core import CountersProgram
+from .journal import Journal
+from .loader import load_bio_config_json
+from .logger import log
+from .sharding import ACCOUNT_OPTIONS
+from .status_logger.writer import DESTINATION_PATH
+from .updaters.base import Updater
+from .utils import print_error
+
+_CONFIG_PATHS = (JSON_FILE_PATH, JSON_SCHEMA_PATH)
+
+
+class ApiError(Exception):
+    """An error to answer a request with."""
+
+    def __init__(self, status: HTTPStatus, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class FileCache:
+    """Values computed from files, recomputed once any of them changes.
+
+    A file counts as changed when its modification time or size does, so
+    checking costs one stat per file. At most `maxsize` values are kept,
+    the least recently used being dropped first.
+    """
+
+    def __init__(self, maxsize: int = SERVE_CACHE_SIZE) -> None:
+        self.maxsize = maxsize
+        self._entries = OrderedDict[Any, tuple[tuple, Any]]()
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        key: Any,
+        paths: tuple[Path, ...],
+        compute: Callable[[], Any],
+    ) -> Any:
+        """Return the value under `key`, computed from the files at
+        `paths`, calling `compute` if there is none or they changed."""
+        stamp = tuple(_stamp(path) for path in paths)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._entries.move_to_end(key)
+                return entry[1]
+        # Concurrent misses may both compute, which is harmless.
+        value = compute()
+        with self._lock:
+            self._entries[key] = (stamp, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+
+class RunManager:
+    """Runs started through the API, one at a time."""
+
+    def __init__(self, options: ProgramOptions) -> None:
+        self.options = options
+        """Options the runs are based on."""
+        self.runs = deque[dict](maxlen=SERVE_RUN_HISTORY)
+        self._active: dict | None = None
+        self._lock = threading.Lock()
+
+    def start(self, day: date, targets: list[str], resume: bool) -> dict:
+        """Start a run in the background and return its record.
+
+        Raises:
+            ApiError: A run is already in progress.
+        """
+        selected = {option: account in targets
+                    for account, option in ACCOUNT_OPTIONS.items()}
+        options = dataclasses.replace(self.options, date_to_update_to=day,
+                                      resume=resume, **selected)
+        with self._lock:
+            if self._active is not None:
+                raise ApiError(HTTPStatus.CONFLICT,
+                               f"Run {self._active['id']} is in progress")
+            record = {
+                "id": tracing.new_run(),
+                "date": day.isoformat(),
+                "targets": targets,
+                "state": "running",
+                "started": _now(),
+                "finished": None,
+                "exit_code": None,
+                "outcomes": None,
+            }
+            self._active = record
+            self.runs.appendleft(record)
+
+        thread = threading.Thread(target=self._run, args=(record, options),
+                                  name=f"run-{record['id']}", daemon=True)
+        thread.start()
+        return record
+
+    def get(self, run_id: str) -> dict | None:
+        """Return the record of a run, or None if it's not remembered."""
+        with self._lock:
+            for record in self.runs:
+                if record["id"] == run_id:
+                    return dict(record)
+        return None
+
+    def list(self) -> list[dict]:
+        """Return the records of the remembered runs, newest first."""
+        with self._lock:
+            return [dict(record) for record in self.runs]
+
+    def _run(self, record: dict, options: ProgramOptions) -> None:
+        message = f"API run {record['id']} started for {record['date']}."
+        print(message)
+        log.info(message)
+        exit_code = None
+        try:
+            exit_code = CountersProgram(options).run()
+        except Exception as exc:
+            print_error(f"API run {record['id']} crashed: {exc}")
+
+        journal = Journal(options.date_to_update_to)
+        outcomes = {entry["target"]: entry for entry in journal.entries()
+                    if entry.get("run_id") == record["id"]}
+        with self._lock:
+            record["state"] = "failed" if exit_code is None else "finished"
+            record["finished"] = _now()
+            record["exit_code"] = exit_code
+            record["outcomes"] = list(outcomes.values())
+            self._active = None
+
+
+class CountersApi:
+    """The request handlers, over the caches and the run manager."""
+
+    def __init__(self, options: ProgramOptions) -> None:
+        self.options = options
+        self.cache = FileCache()
+        self.run_manager = RunManager(options)
+
+    def previews(self, day: date) -> dict:
+        """What each target would be updated with on the date."""
+        def render() -> list[dict]:
+            return [
+                {"target": updater.platform_name,
+                 "account": updater.account,
+                 "details": updater.prepare_details(day)}
+                for updater in self._updaters()
+            ]
+        return {
+            "date": day.isoformat(),
+            "targets": self.cache.get(("previews", day), _CONFIG_PATHS,
+                                      render),
+        }
+
+    def outcomes(self, day: date) -> dict:
+        """The latest outcome journaled for each target on the date."""
+        journal = Journal(day)
+
+        def latest() -> list[dict]:
+            by_target = {entry["target"]: entry
+                         for entry in journal.entries()}
+            return list(by_target.values())
+        return {
+            "date": day.isoformat(),
+            "targets": self.cache.get(("outcomes", day), (journal.path,),
+                                      latest),
+        }
+
+    def statuses(self, limit: int) -> dict:
+        """The last `limit` rows of the status-logger history."""
+        rows = self.cache.get("statuses", (Path(DESTINATION_PATH),),
+                              _read_statuses)
+        return {"statuses": rows[-limit:] if limit else []}
+
+    def _updaters(self) -> list[Updater]:
+        """All configured targets, from the cached configuration."""
+        try:
+            data = self.cache.get("config", _CONFIG_PATHS,
+                                  load_bio_config_json)
+        except Exception as exc:
+            raise ApiError(HTTPStatus.UNPROCESSABLE_ENTITY,
+                           f"Invalid configuration: {exc}") from None
+        return CountersProgram(self.options).get_updaters(data)
+
+    def handle(self, method: str, path: str, query: dict,
+               body: Any) -> tuple[HTTPStatus, Any]:
+        """Route a request. Return the status and JSON-able response."""
+        parts = [part for part in path.split("/") if part]
+        if method == "GET" and parts == ["previews"]:
+            return HTTPStatus.OK, self.previews(_query_date(query))
+        if method == "GET" and parts == ["outcomes"]:
+            return HTTPStatus.OK, self.outcomes(_query_date(query))
+        if method == "GET" and parts == ["statuses"]:
+            return HTTPStatus.OK, self.statuses(_query_int(query, "limit",
+                                                           100))
+        if method == "GET" and parts == ["runs"]:
+            return HTTPStatus.OK, {"runs": self.run_manager.list()}
+        if method == "GET" and len(parts) == 2 and parts[0] == "runs":
+            record = self.run_manager.get(parts[1])
+            if record is None:
+                raise ApiError(HTTPStatus.NOT_FOUND,
+                               f"No run {parts[1]} was started here")
+            return HTTPStatus.OK, record
+        if method == "POST" and parts == ["runs"]:
+            body = {} if body is None else body
+            if not isinstance(body, dict):
+                raise ApiError(HTTPStatus.BAD_REQUEST,
+                               "Body must be a JSON object")
+            record = self.run_manager.start(
+                _parse_date(body.get("date")),
+                _parse_targets(body.get("targets")),
+                bool(body.get("resume", False)),
+            )
+            return HTTPStatus.ACCEPTED, record
+        raise ApiError(HTTPStatus.NOT_FOUND, f"No route for {method} {path}")
+
+
+def serve(options: ProgramOptions, host: str, port: int) -> None:
+    """Serve the API until interrupted."""
+    api = CountersApi(options)
+    server = ThreadingHTTPServer((host, port), _make_handler(api))
+    server.daemon_threads = True
+    message = f"Serving the counters API at http://{host}:{port}."
+    print(message)
+    log.info(message)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def _make_handler(api: CountersApi) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        """Answers the requests with `api`, as JSON."""
+
+        def do_GET(self) -> None:  # pylint: disable=invalid-name
+            """Answer a GET request."""
+            self._handle(None)
+
+        def do_POST(self) -> None:  # pylint: disable=invalid-name
+            """Answer a POST request, parsing its body as JSON."""
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self._reply(HTTPStatus.BAD_REQUEST,
+                            {"error": "Body is not valid JSON"})
+                return
+            self._handle(body)
+
+        def log_message(self, format, *args) -> None:  # noqa: A002
+            # pylint: disable=redefined-builtin
+            pass
+
+        def _handle(self, body: Any) -> None:
+            url = urlsplit(self.path)
+            start = time.perf_counter()
+            try:
+                status, response = api.handle(self.command, url.path,
+                                              parse_qs(url.query), body)
+            except ApiError as exc:
+                status, response = exc.status, {"error": str(exc)}
+            except Exception as exc:
+                status = HTTPStatus.INTERNAL_SERVER_ERROR
+                response = {"error": f"{type(exc).__name__}: {exc}"}
+            self._reply(status, response,
+                        time.perf_counter() - start)
+
+        def _reply(self, status: HTTPStatus, response: Any,
+                   elapsed: float = 0.0) -> None:
+            data = json.dumps(response, default=str).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.send_header("Server-Timing",
+                             f"app;dur={elapsed * 1000:.2f}")
+            self.end_headers()
+            self.wfile.write(data)
+
+    return Handler
+
+
+def _read_statuses() -> list[dict]:
+    try:
+        with open(DESTINATION_PATH, "rt", encoding="utf-8",
+                  newline="") as fp:
+            return [{"date": row[0], "time": row[1],
+                     "emoji": row[2] or None, "text": row[3]}
+                    for row in csv.reader(fp) if len(row) == 4]
+    except FileNotFoundError:
+        return []
+
+
+def _stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _parse_date(value: Any) -> date:
+    if value is None:
+        return date.today()
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ApiError(HTTPStatus.BAD_REQUEST,
+                       f"{value!r} is not a valid ISO date") from None
+
+
+def _parse_targets(value: Any) -> list[str]:
+    """Map target names (any case) to account names, defaulting to all."""
+    accounts = {account.lower(): account for account in ACCOUNT_OPTIONS}
+    if value is None:
+        return list(ACCOUNT_OPTIONS)
+    if not isinstance(value, list) or not all(
+            isinstance(name, str) and name.lower() in accounts
+            for name in value):
+        raise ApiError(HTTPStatus.BAD_REQUEST,
+                       f"targets must be a list of {', '.join(accounts)}")
+    return [accounts[name.lower()] for name in value]
+
+
+def _query_date(query: dict) -> date:
+    return _parse_date(query.get("date", [None])[0])
+
+
+def _query_int(query: dict, name: str, default: int) -> int:
+    value = query.get(name, [None])[0]
+    if value is None:
+        return default
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST,
+                       f"{name} must be an integer") from None
@@ -0,0 +1,271 @@
+"""sharding.py
+
+Run the updaters on several worker processes, for `--workers N`.
+
+The coordinator loads the configuration, groups the targets by account
+and deals the accounts out to the workers, longest first, onto whichever
+worker has the least work so far (LPT scheduling). The work of a target
+is estimated from its median latency in past runs, and a worker that
+gets any browser targets is also charged for starting a browser. All
+targets of an account go to the same worker, so one account is never
+logged into from two browsers at once, and the saved sessions it reuses
+stay consistent.
+
+Each worker is a fresh process running the normal pipeline on its share
+of the targets, with its own browser and API clients. It writes neither
+the failure report nor the history: it hands back its outcomes and the
+latencies it measured, and the coordinator merges them into one
+`FailureLog`, report, exit code and history.
+"""
+
+# pylint: disable=broad-exception-caught
+
+import dataclasses
+import heapq
+import logging
+import multiprocessing
+import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from .config import (EXIT_FAILURE, JSON_FILE_PATH, PLATFORM_DISCORD,
+                     PLATFORM_GITHUB, PLATFORM_INSTAGRAM, PLATFORM_SPOTIFY,
+                     SHARD_DEFAULT_API_COST, SHARD_DEFAULT_BROWSER_COST,
+                     SHARD_DEFAULT_DRIVER_STARTUP, ProgramOptions)
+from .core import CountersProgram
+from .history import history
+from .logger import log
+from .updaters.base import Updater
+from .utils import print_error
+
+ACCOUNT_OPTIONS = {
+    PLATFORM_DISCORD: "run_discord",
+    PLATFORM_INSTAGRAM: "run_instagram",
+    PLATFORM_SPOTIFY: "run_spotify",
+    PLATFORM_GITHUB: "run_github",
+}
+"""The option selecting the targets of each account."""
+
+
+class WorkerError(Exception):
+    """An error raised in a worker, carrying its formatted traceback."""
+
+    def __init__(self, formatted: str) -> None:
+        super().__init__(formatted)
+        self.formatted = formatted
+
+    def __str__(self) -> str:
+        return f"\n\"\"\"\n{self.formatted}\"\"\""
+
+
+@dataclass
+class Shard:
+    """The accounts assigned to one worker."""
+    accounts: list[str] = field(default_factory=list)
+    targets: list[str] = field(default_factory=list)
+    """Platform names of the accounts' updaters."""
+    cost: float = 0.0
+    """Estimated time in seconds to update them."""
+    uses_browser: bool = False
+
+
+@dataclass
+class ShardResult:
+    """What a worker hands back to the coordinator."""
+    attempted: list[str]
+    """Platform names of the updaters the worker ran."""
+    failures: dict[str, str]
+    """Formatted tracebacks of the failed updaters, by platform name."""
+    driver_failure: str | None
+    samples: list[tuple[str, float]]
+    """Latencies the worker recorded, to add to the history."""
+    wall: float
+
+
+class ShardProgram(CountersProgram):
+    """The main program as run by a worker on its share of the targets."""
+
+    def __init__(self, options: ProgramOptions) -> None:
+        super().__init__(options)
+        self.attempted = list[str]()
+
+    def _write_failure_report(self, updaters: list[Updater]) -> None:
+        # The coordinator writes the one report for all workers.
+        self.attempted = [updater.platform_name for updater in updaters]
+
+
+def run_shard(
+    program_class: type[ShardProgram],
+    options: ProgramOptions,
+) -> ShardResult:
+    """Entry point of a worker process."""
+    if options.console_only:
+        logging.disable(100)
+    history.persist = False
+
+    start = time.perf_counter()
+    program = program_class(options)
+    program.run()
+    failure_log = program.failure_log
+    return ShardResult(
+        attempted=program.attempted,
+        failures={name: _format_error(exc)
+                  for name, exc in failure_log.platforms.items()},
+        driver_failure=(None if failure_log.driver is None
+                        else _format_error(failure_log.driver)),
+        samples=history.recorded,
+        wall=time.perf_counter() - start,
+    )
+
+
+def estimate_cost(updater: Updater) -> float:
+    """Median latency of the updater in past runs, or a default."""
+    median = history.percentile(f"updater.{updater.platform_name}", 0.5)
+    if median is not None:
+        return median
+    if updater.uses_browser:
+        return SHARD_DEFAULT_BROWSER_COST
+    return SHARD_DEFAULT_API_COST
+
+
+def partition(updaters: list[Updater], workers: int) -> list[Shard]:
+    """Deal the updaters' accounts out to at most `workers` shards.
+
+    Accounts are assigned in decreasing order of cost to the shard with
+    the lowest total so far, charging a shard for a browser startup when
+    it gets its first browser account.
+    """
+    costs = defaultdict[str, float](float)
+    targets = defaultdict[str, list[str]](list)
+    browser_accounts = set[str]()
+    for updater in updaters:
+        costs[updater.account] += estimate_cost(updater)
+        targets[updater.account].append(updater.platform_name)
+        if updater.uses_browser:
+            browser_accounts.add(updater.account)
+    startup = history.percentile("driver.startup", 0.5) \
+        or SHARD_DEFAULT_DRIVER_STARTUP
+
+    shards = [Shard() for _ in range(min(workers, len(costs)))]
+    heap = [(0.0, index) for index in range(len(shards))]
+    # Ties broken by name so the same config shards the same way.
+    for account in sorted(costs, key=lambda name: (-costs[name], name)):
+        _, index = heapq.heappop(heap)
+        shard = shards[index]
+        shard.accounts.append(account)
+        shard.targets.extend(targets[account])
+        shard.cost += costs[account]
+        if account in browser_accounts and not shard.uses_browser:
+            shard.cost += startup
+            shard.uses_browser = True
+        heapq.heappush(heap, (shard.cost, index))
+    return shards
+
+
+class ShardedProgram(CountersProgram):
+    """The main program, coordinating `options.workers` worker processes."""
+
+    shard_program = ShardProgram
+    """The program the workers run (swappable, e.g. for benchmarks)."""
+
+    def run(self) -> int:
+        run_start = time.perf_counter()
+
+        data = self.load_bio_config_json()
+        self.timings["config"] = time.perf_counter() - run_start
+        if data is None:
+            return EXIT_FAILURE
+
+        updaters = self.get_updaters(data)
+        if not updaters:
+            print(
+                "Nothing to update! "
+                f"Check your configuration file at {JSON_FILE_PATH}."
+            )
+            return self.failure_log.get_exit_code()
+
+        shards = partition(updaters, self.options.workers)
+        for number, shard in enumerate(shards, start=1):
+            message = (f"Worker {number}: {', '.join(shard.accounts)} "
+                       f"(estimated {shard.cost:.1f}s).")
+            print(message)
+            log.info(message)
+
+        results = self._run_shards(shards)
+
+        attempted = list[str]()
+        for result in results:
+            attempted.extend(result.attempted)
+            for platform_name, formatted in result.failures.items():
+                self.failure_log.platforms[platform_name] = \
+                    WorkerError(formatted)
+            if result.driver_failure and self.failure_log.driver is None:
+                self.failure_log.driver = WorkerError(result.driver_failure)
+            for key, seconds in result.samples:
+                history.record(key, seconds)
+
+        self.timings["total"] = time.perf_counter() - run_start
+        self._report_shard_timings(shards, results)
+        history.save()
+        self.journal.prune()
+
+        names = set(attempted)
+        self._write_failure_report([updater for updater in updaters
+                                    if updater.platform_name in names])
+        return self.failure_log.get_exit_code()
+
+    def _run_shards(self, shards: list[Shard]) -> list[ShardResult]:
+        # Spawned rather than forked: workers start clean (no inherited
+        # threads or browser handles) and behave the same on Windows.
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(len(shards), mp_context=context) \
+                as executor:
+            futures = [
+                executor.submit(run_shard, self.shard_program,
+                                self._shard_options(shard))
+                for shard in shards
+            ]
+            results = list[ShardResult]()
+            for shard, future in zip(shards, futures):
+                try:
+                    results.append(future.result())
+                except Exception as exc:
+                    # The worker itself died: fail all of its targets.
+                    print_error(f"FAILED to run worker for "
+                                f"{', '.join(shard.accounts)}.")
+                    formatted = _format_error(exc)
+                    results.append(ShardResult(
+                        attempted=shard.targets,
+                        failures=dict.fromkeys(shard.targets, formatted),
+                        driver_failure=None,
+                        samples=[],
+                        wall=0.0,
+                    ))
+        return results
+
+    def _shard_options(self, shard: Shard) -> ProgramOptions:
+        selected = {option: account in shard.accounts
+                    for account, option in ACCOUNT_OPTIONS.items()}
+        return dataclasses.replace(self.options, workers=1, **selected)
+
+    def _report_shard_timings(
+        self,
+        shards: list[Shard],
+        results: list[ShardResult],
+    ) -> None:
+        parts = [f"config {self.timings['config']:.2f}s"]
+        for number, (shard, result) in enumerate(zip(shards, results),
+                                                 start=1):
+            parts.append(f"worker {number} {result.wall:.2f}s "
+                         f"(estimated {shard.cost:.2f}s)")
+        parts.append(f"total {self.timings['total']:.2f}s")
+
+        message = "Timing: " + ", ".join(parts) + "."
+        print(message)
+        log.info(message)
+
+
+def _format_error(error: BaseException) -> str:
+    return "".join(traceback.format_exception(error))
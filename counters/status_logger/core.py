@@ -3,45 +3,40 @@
 Webscraping sequences to obtain the current Discord cusom status.
 """
 
+import time
 from pathlib import Path
 
 from selenium import webdriver
-from selenium.common.exceptions import NoSuchElementException
+from selenium.common.exceptions import (NoSuchElementException,
+                                        TimeoutException, WebDriverException)
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.wait import WebDriverWait
 
-from ..config import DISCORD_EMAIL, DISCORD_PASSWORD
-from ..selectors.discord import (EMAIL_INPUT, EMOJI_IMG, PASSWORD_INPUT,
-                                 TEXT_SPAN)
+from ..browser import get_page_metrics
+from ..config import DISCORD_URL, STATUS_POLL_MAX_ERRORS, WAIT_TIMEOUT
+from ..history import history
+from ..selectors.discord import AVATAR_ICON, EMOJI_IMG, TEXT_SPAN
+from ..steps import immediate, step
+from ..tracing import span
+from ..updaters.discord import login
 from .driver import get_driver
+from .gateway import LOGGING_PREFS, GatewayReader
 from .logger import log_exit_status, send_error_email
-from .writer import log_status
+from .writer import StatusWriter, last_logged_status, log_status
 
 # ==================== SCRAPING SUBROUTINES ==================== #
 
 
-def _login(driver: webdriver.Edge) -> None:
-    """Handle authentication landing page.
-
-    Copied directly from my counters/update_discord.py.
+def _extract_emoji(driver: webdriver.Edge) -> str | None:
+    """Extract the emoji part of the custom status.
 
-    Args:
-        driver (webdriver.Edge): Edge web driver instance.
+    Meant to be called after `_extract_text`, by which point the sidebar
+    has rendered, so the lookup doesn't wait for the element to appear.
     """
-    # Find elements
-    email_input = driver.find_element(*EMAIL_INPUT)
-    password_input = driver.find_element(*PASSWORD_INPUT)
-
-    # Enter credentials
-    email_input.clear()
-    email_input.send_keys(DISCORD_EMAIL)
-    password_input.clear()
-    password_input.send_keys(DISCORD_PASSWORD + "\n")
-
-
-def _extract_emoji(driver: webdriver.Edge) -> str | None:
-    """Extract the emoji part of the custom status."""
     # An emoji was used: this img element should be present
     try:
-        emoji_img = driver.find_element(*EMOJI_IMG)
+        with immediate(driver):
+            emoji_img = driver.find_element(*EMOJI_IMG)
     # An emoji wasn't used
     except NoSuchElementException:
         return None
@@ -53,7 +48,8 @@ def _extract_text(driver: webdriver.Edge) -> str:
     """Extract the text part of the custom status."""
     # Get the <span> element that contains the text part
     try:
-        text_span = driver.find_element(*TEXT_SPAN)
+        with step(driver, "discord.read_status"):
+            text_span = driver.find_element(*TEXT_SPAN)
     # <span> element doesn't exist if text is blank
     except NoSuchElementException:
         return ""
@@ -61,11 +57,17 @@ def _extract_text(driver: webdriver.Edge) -> str:
     return text_span.text
 
 
-def _get_status(driver: webdriver.Edge) -> tuple[str | None, str]:
+def _get_status(driver: webdriver.Edge,
+                reader: GatewayReader | None = None,
+                ) -> tuple[str | None, str]:
     """Extract the current Discord custom status.
 
     Args:
         driver (webdriver.Edge): Initialized web driver instance.
+        reader (GatewayReader | None, optional): Reader of the gateway
+        traffic, if the driver records it. The status is then taken
+        from the gateway, and only read from the page if it doesn't
+        arrive in time. Defaults to None.
 
     Returns:
         tuple[str | None, str]: A 2-tuple containing:
@@ -73,23 +75,133 @@ def _get_status(driver: webdriver.Edge) -> tuple[str | None, str]:
             1: The text part.
     """
     # Scraping sequences here
-    driver.get("https://discord.com/login")
-    _login(driver)
-    emoji = _extract_emoji(driver)
+    driver.get(f"{DISCORD_URL}/login")
+    login(driver)
+    if reader is not None:
+        with span("status_logger.gateway"):
+            status = reader.wait_for_status(driver)
+        if status is not None:
+            return status
+        print("Status not found in the gateway traffic, reading the page.")
+    return read_status(driver)
+
+
+def read_status(driver: webdriver.Edge) -> tuple[str | None, str]:
+    """Extract the custom status from an already logged-in page.
+
+    Returns:
+        tuple[str | None, str]: Same as `_get_status`.
+    """
     text = _extract_text(driver)
+    emoji = _extract_emoji(driver)
     return (emoji, text)
 
 
-# ==================== INTERFACE FUNCTION ==================== #
+_READ_STATUS_SCRIPT = """
+const img = document.querySelector(arguments[0]);
+const span = document.querySelector(arguments[1]);
+const panel = document.querySelector(arguments[2]);
+return [img ? img.alt : null, span ? span.innerText : null, panel !== null];
+"""
+
+
+def _poll_read_status(driver: webdriver.Edge,
+                      reader: GatewayReader,
+                      ) -> tuple[str | None, str] | None:
+    """Read the custom status without waiting.
+
+    From the gateway traffic if it reported the status and is still
+    alive, otherwise from the page in a single script call, so that a
+    logout or a dead socket still shows up as a miss.
+
+    Returns:
+        tuple[str | None, str] | None: Same as `_get_status`, (None, "")
+        if no status is set, or None if the sidebar isn't rendered (e.g.
+        the page is reloading or logged out).
+    """
+    # Also drains the log, which would otherwise grow for as long as
+    # the page stays open.
+    reader.poll(driver)
+    status = reader.live_status()
+    if status is not None:
+        return status
+    emoji, text, rendered = driver.execute_script(
+        _READ_STATUS_SCRIPT, EMOJI_IMG.value, TEXT_SPAN.value,
+        AVATAR_ICON.value)
+    if not rendered:
+        return None
+    return (emoji, text or "")
+
+
+def _log_in_again(driver: webdriver.Edge) -> None:
+    """Go back through the login page after repeated misses.
+
+    A failure is only printed: the miss that led here already counts
+    towards giving up.
+    """
+    try:
+        driver.get(f"{DISCORD_URL}/login")
+        login(driver)
+    except WebDriverException as exc:
+        print(f"Could not log in again: {exc.msg}")
+
+
+# ==================== INTERFACE FUNCTIONS ==================== #
+
+
+def verify_and_log_status(driver: webdriver.Edge,
+                          expected_text: str,
+                          console_only: bool,
+                          ) -> None:
+    """Log the status just set by the Discord updater on the same page.
+
+    Reuses the updater's authenticated session instead of launching a
+    browser and logging in again.
+
+    Raises:
+        Exception: The status read back doesn't match `expected_text`,
+        meaning the update didn't take effect.
+    """
+    # Give the sidebar a moment to reflect the submitted status.
+    condition = EC.text_to_be_present_in_element(
+        (TEXT_SPAN.by, TEXT_SPAN.value), expected_text,
+    )
+    try:
+        WebDriverWait(driver, WAIT_TIMEOUT).until(condition)
+    except TimeoutException:
+        pass
+
+    emoji, text = read_status(driver)
+    print(f"Extracted {emoji=} and {text=}.")
+    error = None
+    if text != expected_text:
+        error = Exception(
+            f"Status read back as {text!r} after setting it to "
+            f"{expected_text!r}. The update may not have taken effect."
+        )
+
+    if not console_only:
+        log_status(emoji, text)
+        log_exit_status(error)
+    if error is not None:
+        raise error
 
 
 def run_status_logger(console_only: bool,
                       headless: bool,
                       driver_path: Path | None = None,
+                      lean: bool = False,
+                      attach: bool = False,
+                      grid_urls: list[str] | None = None,
                       ) -> bool:
     try:
-        with get_driver(headless, driver_path) as driver:
-            emoji, text = _get_status(driver)
+        with get_driver(headless, driver_path, lean, attach,
+                        LOGGING_PREFS, grid_urls) as driver:
+            with span("status_logger.get_status"):
+                emoji, text = _get_status(driver, GatewayReader())
+            metrics = get_page_metrics(driver)
+        if metrics is not None:
+            print(f"Discord page: {metrics}.")
         print(f"Extracted {emoji=} and {text=}.")
         # I almost never not have a status; this must mean scraping failed
         if not emoji and not text:
@@ -115,3 +227,80 @@ def run_status_logger(console_only: bool,
             log_exit_status(None)
         print("Finished running the status-logger package: SUCCESS.")
         return True
+    finally:
+        history.save()
+
+
+def poll_status_logger(interval: float,
+                       fsync: str,
+                       console_only: bool,
+                       headless: bool,
+                       driver_path: Path | None = None,
+                       lean: bool = False,
+                       attach: bool = False,
+                       grid_urls: list[str] | None = None,
+                       ) -> bool:
+    """Keep one logged-in page open and log the status whenever it changes.
+
+    Polls until interrupted, or until the status couldn't be read
+    `STATUS_POLL_MAX_ERRORS` times in a row (even after logging in again).
+    """
+    error = None
+    writer = None if console_only else StatusWriter(fsync)
+    # Don't log the status again just because the poller was restarted.
+    last = None if console_only else last_logged_status()
+    errors = 0
+    reader = GatewayReader()
+    try:
+        with get_driver(headless, driver_path, lean, attach,
+                        LOGGING_PREFS, grid_urls) as driver:
+            with span("status_logger.get_status"):
+                status = _get_status(driver, reader)
+            print(f"Polling the status every {interval:g}s, Ctrl+C to stop.")
+            while True:
+                if status is None:
+                    errors += 1
+                    if errors >= STATUS_POLL_MAX_ERRORS:
+                        raise Exception(
+                            f"Status could not be read {errors} times in a "
+                            "row. The session may have expired or the page "
+                            "layout changed."
+                        )
+                    # One miss can be a re-render, more likely a logout.
+                    if errors > 1:
+                        _log_in_again(driver)
+                elif status != last:
+                    errors = 0
+                    emoji, text = status
+                    print(f"Status changed to {emoji=} and {text=}.")
+                    if writer is not None:
+                        writer.write(emoji, text)
+                    last = status
+                else:
+                    errors = 0
+
+                time.sleep(interval)
+                try:
+                    status = _poll_read_status(driver, reader)
+                except WebDriverException:
+                    status = None
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        error = e
+    finally:
+        if writer is not None:
+            writer.close()
+        history.save()
+
+    if error is not None:
+        if not console_only:
+            log_exit_status(error)
+            send_error_email(error)
+        print("Stopped polling the Discord status: ERROR.")
+        print(f"{type(error).__name__}: {error}")
+        return False
+    if not console_only:
+        log_exit_status(None)
+    print("Stopped polling the Discord status: SUCCESS.")
+    return True
@@ -8,29 +8,49 @@ from contextlib import contextmanager
 from pathlib import Path
 
 from selenium import webdriver
-from selenium.webdriver.edge.options import Options
-from selenium.webdriver.edge.service import Service
-from webdriver_manager.microsoft import EdgeChromiumDriverManager
 
-from ..config import WAIT_TIMEOUT
+from ..browser import create_edge_driver
+from ..browser_manager import SharedBrowser
+from ..remote import get_pool
 
 
 @contextmanager
-def get_driver(headless: bool, path: Path | None
+def get_driver(headless: bool,
+               path: Path | None,
+               lean: bool = False,
+               attach: bool = False,
+               logging_prefs: dict[str, str] | None = None,
+               grid_urls: list[str] | None = None,
                ) -> Generator[webdriver.Edge, None, None]:
-    """Initialize and return the Edge web driver instance to use."""
-    if path is None:
-        driver_path = EdgeChromiumDriverManager().install()
-    else:
-        driver_path = str(path)
-    service = Service(executable_path=driver_path)
-    options = Options()
-    if headless:
-        options.add_argument("--headless")
-    driver = webdriver.Edge(service=service, options=options)
-    driver.maximize_window()
-    driver.implicitly_wait(WAIT_TIMEOUT)
+    """Initialize and return the Edge web driver instance to use.
+
+    If `attach` is set, attach to the shared long-lived browser (starting
+    it if necessary) instead of launching a new one, and leave it running
+    afterwards. If `grid_urls` are given, use a pooled session on those
+    remote endpoints instead. `logging_prefs` is passed on to
+    `create_edge_driver`.
+    """
+    if grid_urls:
+        pool = get_pool(grid_urls)
+        remote_driver = pool.acquire(headless, lean, logging_prefs)
+        try:
+            yield remote_driver  # type: ignore
+        finally:
+            pool.release(remote_driver)
+        return
+
+    shared_browser = None
+    debugger_address = None
+    if attach:
+        shared_browser = SharedBrowser(headless, lean)
+        debugger_address = shared_browser.ensure_running()
+
+    driver = create_edge_driver(headless, path, lean, debugger_address,
+                                logging_prefs)
     try:
         yield driver
     finally:
-        driver.quit()
+        if shared_browser is not None:
+            shared_browser.release(driver)
+        else:
+            driver.quit()
@@ -0,0 +1,178 @@
+"""gateway.py
+
+Read the Discord custom status from the web app's own gateway traffic.
+
+The web app learns the user's sessions, and the custom status activity
+on them, from its gateway websocket: the READY dispatch right after
+login, then a SESSIONS_REPLACE dispatch whenever the status changes.
+With the browser's performance log enabled, the driver records those
+frames as DevTools network events, so the status can be read as soon
+as it arrives, without waiting for the sidebar to render and without
+depending on its hashed class names.
+
+The gateway is compressed as one zlib stream per connection, split over
+the binary frames, each message ending with a sync flush marker.
+"""
+
+import base64
+import json
+import time
+import zlib
+from dataclasses import dataclass, field
+
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.remote.command import Command
+
+from ..config import GATEWAY_QUIET_TIMEOUT, GATEWAY_STATUS_TIMEOUT
+
+LOGGING_PREFS = {"performance": "ALL"}
+"""Capability value making the driver record DevTools network events."""
+
+_ZLIB_SUFFIX = b"\x00\x00\xff\xff"
+_OPCODE_TEXT = 1
+_OPCODE_BINARY = 2
+_GATEWAY_DISPATCH = 0
+_CUSTOM_STATUS_ACTIVITY = 4
+
+
+@dataclass
+class _Connection:
+    compressed: bool
+    inflator: "zlib._Decompress" = field(default_factory=zlib.decompressobj)
+    buffer: bytearray = field(default_factory=bytearray)
+
+
+class GatewayReader:
+    """Follows the gateway connections in the driver's performance log.
+
+    `status` is None until a READY or SESSIONS_REPLACE dispatch was
+    seen, then the (emoji, text) of the custom status it carried. It is
+    reset whenever a gateway connection closes or a new one opens, until
+    the next such dispatch.
+    """
+
+    def __init__(self) -> None:
+        self.status: tuple[str | None, str] | None = None
+        self._connections = dict[str, _Connection]()
+        self._last_frame = 0.0
+
+    def poll(self, driver: webdriver.Edge) -> bool:
+        """Process the log entries recorded since the last call.
+
+        The driver drops the entries it returns, so this also keeps the
+        log from growing while a page stays open.
+
+        Returns:
+            bool: Whether `status` was updated.
+        """
+        try:
+            # The command behind Edge's get_log, which remote drivers lack.
+            entries = driver.execute(Command.GET_LOG,
+                                     {"type": "performance"})["value"]
+        except WebDriverException:
+            # Performance logging wasn't enabled for this session.
+            return False
+
+        updated = False
+        for entry in entries:
+            message = json.loads(entry["message"])["message"]
+            method, params = message["method"], message["params"]
+            if method == "Network.webSocketCreated":
+                url = params["url"]
+                if "gateway" in url:
+                    # A reconnect: the status is stale until its READY.
+                    self.status = None
+                    self._connections[params["requestId"]] = \
+                        _Connection(compressed="compress=zlib-stream" in url)
+            elif method == "Network.webSocketFrameReceived":
+                connection = self._connections.get(params["requestId"])
+                if connection is None:
+                    continue
+                self._last_frame = time.monotonic()
+                try:
+                    payload = self._decode(connection, params["response"])
+                except (zlib.error, ValueError):
+                    # e.g. the stream's start was drained elsewhere, so
+                    # the rest can't be inflated. Ignore the connection
+                    # and let the page be read until the next one.
+                    self._connections.pop(params["requestId"], None)
+                    self.status = None
+                    continue
+                if payload is not None:
+                    updated |= self._dispatch(payload)
+            elif method == "Network.webSocketClosed":
+                if self._connections.pop(params["requestId"], None):
+                    self.status = None
+        return updated
+
+    def live_status(
+        self,
+        max_quiet: float = GATEWAY_QUIET_TIMEOUT,
+    ) -> tuple[str | None, str] | None:
+        """Return `status` if the gateway is still sending frames.
+
+        Returns None once no frame arrived for `max_quiet` seconds, e.g.
+        because the socket silently died.
+        """
+        if time.monotonic() - self._last_frame > max_quiet:
+            return None
+        return self.status
+
+    def wait_for_status(
+        self,
+        driver: webdriver.Edge,
+        timeout: float = GATEWAY_STATUS_TIMEOUT,
+    ) -> tuple[str | None, str] | None:
+        """Poll the log until the status is known or `timeout` elapses."""
+        deadline = time.monotonic() + timeout
+        while self.status is None and time.monotonic() < deadline:
+            if not self.poll(driver):
+                time.sleep(0.1)
+        return self.status
+
+    def _decode(self, connection: _Connection, frame: dict) -> dict | None:
+        """Return the gateway payload completed by the frame, if any."""
+        if frame["opcode"] == _OPCODE_TEXT:
+            return json.loads(frame["payloadData"])
+        if frame["opcode"] != _OPCODE_BINARY or not connection.compressed:
+            return None
+
+        connection.buffer += base64.b64decode(frame["payloadData"])
+        if not connection.buffer.endswith(_ZLIB_SUFFIX):
+            return None
+        data = connection.inflator.decompress(connection.buffer)
+        connection.buffer.clear()
+        return json.loads(data)
+
+    def _dispatch(self, payload: dict) -> bool:
+        if payload.get("op") != _GATEWAY_DISPATCH:
+            return False
+        if payload.get("t") == "READY":
+            sessions = payload["d"].get("sessions", [])
+        elif payload.get("t") == "SESSIONS_REPLACE":
+            sessions = payload["d"]
+        else:
+            return False
+        self.status = _status_of(sessions)
+        return True
+
+
+def _status_of(sessions: list[dict]) -> tuple[str | None, str]:
+    """Extract the custom status from the user's sessions.
+
+    Prefers the "all" pseudo-session, which aggregates the others.
+    """
+    sessions = sorted(sessions,
+                      key=lambda session: session.get("session_id") != "all")
+    for session in sessions:
+        for activity in session.get("activities", []):
+            if activity.get("type") != _CUSTOM_STATUS_ACTIVITY:
+                continue
+            emoji = activity.get("emoji")
+            name = emoji and emoji.get("name")
+            # Custom emojis have an id, and appear as :name: in the page.
+            if name and emoji.get("id"):
+                name = f":{name}:"
+            return (name or None, activity.get("state") or "")
+    return (None, "")
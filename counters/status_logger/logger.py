@@ -7,15 +7,18 @@ import os
 import smtplib
 import sys
 import traceback
-from datetime import date, datetime
+from datetime import date
 from email.message import EmailMessage
+from pathlib import Path
 
 from ..config import ERROR_EMAIL, ERROR_EMAIL_PASSWORD
-from . import ensure_file_path
+from ..logger import get_file_logger
 
 LOG_FILE_PATH = os.path.join(os.path.expanduser("~"),
                              ".config/status-logger/status-logger.log")
 
+log = get_file_logger(__name__, Path(LOG_FILE_PATH))
+
 
 def _get_traceback(error: Exception) -> str:
     """Return the traceback of the error as a string."""
@@ -43,15 +46,10 @@ def log_exit_status(error: Exception | None) -> None:
         was raised in the program. None if the program did not
         encounter any errors.
     """
-    entry = f"[{datetime.now()}] "
     if error is None:
-        entry += "No errors detected.\n"
+        log.info("No errors detected.")
     else:
-        entry += _get_error_message(error) + "\n"
-
-    ensure_file_path(LOG_FILE_PATH)
-    with open(LOG_FILE_PATH, "at", encoding="utf-8") as fp:
-        fp.write(entry)
+        log.error(_get_error_message(error))
 
 
 def send_error_email(error: Exception) -> None:
@@ -76,8 +74,6 @@ def send_error_email(error: Exception) -> None:
     except smtplib.SMTPException as exc:
         message = f"Failed to send email: {exc}"
         sys.stderr.write(message)
-        entry = f"[{datetime.now()}] {message}\n"
-        with open(LOG_FILE_PATH, "at", encoding="utf-8") as log:
-            log.write(entry)
+        log.error(message)
     else:
         print("Email sent successfully.")
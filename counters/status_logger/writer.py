@@ -5,14 +5,24 @@ Logs the extracted status to the destination file.
 
 import csv
 import os
+import time
 from datetime import datetime
 
+from ..config import (FSYNC_ALWAYS, FSYNC_INTERVAL, FSYNC_NEVER,
+                      STATUS_FSYNC_INTERVAL)
 from . import ensure_file_path
 
 DESTINATION_PATH = os.path.join(os.path.expanduser("~"),
                                 ".config/status-logger/statuses.csv")
 
 
+def _make_row(emoji: str | None, text: str) -> list:
+    # Ideally, I'll have a status per day, so the date should be enough
+    # The time part is included for potential debugging purposes
+    timestamp = datetime.now()
+    return [timestamp.date(), timestamp.time(), emoji, text]
+
+
 def log_status(emoji: str | None, text: str) -> None:
     """Log the status to the CSV file.
 
@@ -26,15 +36,74 @@ def log_status(emoji: str | None, text: str) -> None:
     """
     ensure_file_path(DESTINATION_PATH)
 
-    # Ideally, I'll have a status per day, so the date should be enough
-    # The time part is included for potential debugging purposes
-    timestamp = datetime.now()
-    date = timestamp.date()
-    time = timestamp.time()
-
     # According to: https://docs.python.org/3/library/csv.html#csv.writer
     # File objects should use newline=""
     # encoding kwarg is necessary because emojis are Unicode chars
     with open(DESTINATION_PATH, "at", encoding="utf-8", newline="") as fp:
         writer = csv.writer(fp)
-        writer.writerow([date, time, emoji, text])
+        writer.writerow(_make_row(emoji, text))
+
+
+def last_logged_status() -> tuple[str | None, str] | None:
+    """Return the (emoji, text) of the last row of the CSV file, or None
+    if nothing was logged yet."""
+    try:
+        with open(DESTINATION_PATH, "rt", encoding="utf-8", newline="") as fp:
+            last = None
+            for row in csv.reader(fp):
+                if len(row) == 4:
+                    last = row
+    except FileNotFoundError:
+        return None
+    if last is None:
+        return None
+    # csv writes None as an empty field.
+    return (last[2] or None, last[3])
+
+
+class StatusWriter:
+    """Appends statuses to the CSV file through one buffered handle.
+
+    How often the rows are made durable is set by the fsync policy (see
+    the FSYNC_* constants). The buffer is always flushed on close.
+    """
+
+    def __init__(self, fsync: str, interval: float = STATUS_FSYNC_INTERVAL,
+                 ) -> None:
+        self.fsync = fsync
+        self.interval = interval
+        ensure_file_path(DESTINATION_PATH)
+        # pylint: disable-next=consider-using-with
+        self._fp = open(DESTINATION_PATH, "at", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._fp)
+        self._last_sync = time.monotonic()
+        self.rows_written = 0
+
+    def __enter__(self) -> "StatusWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def write(self, emoji: str | None, text: str) -> None:
+        self._writer.writerow(_make_row(emoji, text))
+        self.rows_written += 1
+        if self.fsync == FSYNC_ALWAYS:
+            self.sync()
+        elif (self.fsync == FSYNC_INTERVAL
+              and time.monotonic() - self._last_sync >= self.interval):
+            self.sync()
+
+    def sync(self) -> None:
+        """Flush the buffer and fsync the file."""
+        self._fp.flush()
+        os.fsync(self._fp.fileno())
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if self._fp.closed:
+            return
+        self._fp.flush()
+        if self.fsync != FSYNC_NEVER:
+            os.fsync(self._fp.fileno())
+        self._fp.close()
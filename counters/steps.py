@@ -0,0 +1,74 @@
+"""steps.py
+
+Named Selenium steps with timeouts learned from their past latencies.
+
+Instead of every lookup waiting the same fixed `WAIT_TIMEOUT`, each step
+(e.g. "discord.login") records how long it takes when it succeeds, and
+its implicit wait is derived from a high percentile of those samples
+plus a margin. Broken selectors then fail in a few seconds, while steps
+that are slow but healthy still get the time they usually need.
+"""
+
+import time
+from collections.abc import Generator
+from contextlib import contextmanager
+
+from selenium import webdriver
+
+from .config import (STEP_TIMEOUT_MARGIN, STEP_TIMEOUT_MAX, STEP_TIMEOUT_MIN,
+                     WAIT_TIMEOUT)
+from .history import history
+from .tracing import span
+
+
+def step_timeout(name: str, default: float = WAIT_TIMEOUT) -> float:
+    """Return the timeout in seconds to use for the named step.
+
+    Falls back to `default` until enough samples have been recorded.
+    """
+    p95 = history.percentile(f"step.{name}", 0.95)
+    if p95 is None:
+        return default
+    timeout = p95 * STEP_TIMEOUT_MARGIN + 1.0
+    return min(max(timeout, STEP_TIMEOUT_MIN), STEP_TIMEOUT_MAX)
+
+
+@contextmanager
+def step(
+    driver: webdriver.Edge,
+    name: str,
+    default: float = WAIT_TIMEOUT,
+) -> Generator[float, None, None]:
+    """Run a block of Selenium calls as the named step.
+
+    Sets the driver's implicit wait to the step's timeout for the
+    duration of the block, yielding the timeout for explicit waits. The
+    block's latency is recorded only if it completes without error, so
+    failures don't inflate future timeouts.
+    """
+    timeout = step_timeout(name, default)
+    driver.implicitly_wait(timeout)
+    start = time.perf_counter()
+    try:
+        with span(f"step.{name}", timeout=timeout):
+            yield timeout
+    finally:
+        driver.implicitly_wait(WAIT_TIMEOUT)
+    history.record(f"step.{name}", time.perf_counter() - start)
+
+
+@contextmanager
+def immediate(driver: webdriver.Edge) -> Generator[None, None, None]:
+    """
+    Don't implicitly wait inside the block, for lookups of elements that
+    are either already on the page or not going to appear at all.
+
+    The implicit wait in effect before, e.g. that of an enclosing step,
+    is restored afterwards.
+    """
+    previous = driver.timeouts.implicit_wait
+    driver.implicitly_wait(0)
+    try:
+        yield
+    finally:
+        driver.implicitly_wait(previous)
@@ -0,0 +1,218 @@
+"""tabs.py
+
+Run several browser updaters at once in tabs of the same browser.
+
+A WebDriver session executes one command at a time on its current
+window, so the updaters can't run on threads. Instead, an updater's
+browser flow is written as a generator (see `Updater.update_bio_steps`)
+that starts its page loads without blocking, via `navigate`, and yields
+a `Wait` for whatever the rest of the step needs to be on the page. The
+`TabRunner` gives each flow its own tab and goes round-robin over them,
+checking every pending wait without blocking and resuming the flows
+whose page is ready, so one tab's loads and waits overlap with the work
+in the others.
+
+Only the runner switches between windows, and a flow only runs while
+its own tab is the current window.
+"""
+
+# pylint: disable=broad-exception-caught
+
+import time
+from collections.abc import Callable, Generator, Sequence
+from dataclasses import dataclass
+
+from selenium import webdriver
+from selenium.common.exceptions import (NoSuchWindowException,
+                                        TimeoutException, WebDriverException)
+
+from .browser import block_nonessential_requests
+from .config import TAB_POLL_INTERVAL, WAIT_TIMEOUT
+from .history import history
+from .selectors.selector import Selector
+from .steps import step_timeout
+
+Condition = Callable[[webdriver.Edge], bool]
+
+
+@dataclass
+class Wait:
+    """What a tab's flow waits for before its next step.
+
+    The timeout is learned like that of a named step, from the time it
+    took to be satisfied in past runs.
+    """
+    condition: Condition
+    step: str
+    default: float = WAIT_TIMEOUT
+
+
+TabFlow = Generator[Wait, None, None]
+"""A browser flow that yields whenever it waits on its page."""
+
+
+def navigate(driver: webdriver.Edge, url: str) -> None:
+    """Start loading `url` in the current tab without waiting for it."""
+    # Unlike driver.get, this returns as soon as the navigation starts.
+    driver.execute_script("window.location.href = arguments[0];", url)
+
+
+def present(*selectors: Selector) -> Condition:
+    """Condition that all of the elements are on the page."""
+    def condition(driver: webdriver.Edge) -> bool:
+        return all(driver.find_elements(*selector) for selector in selectors)
+    return condition
+
+
+def any_of(*conditions: Condition) -> Condition:
+    """Condition that at least one of the conditions holds."""
+    def condition(driver: webdriver.Edge) -> bool:
+        return any(check(driver) for check in conditions)
+    return condition
+
+
+@dataclass
+class _Tab:
+    name: str
+    flow: TabFlow
+    handle: str = ""
+    wait: Wait | None = None
+    wait_start: float = 0.0
+    deadline: float = 0.0
+
+
+class TabRunner:
+    """Interleaves browser flows, each in its own tab of one driver."""
+
+    def __init__(self, driver: webdriver.Edge, lean: bool = False) -> None:
+        self.driver = driver
+        self.lean = lean
+        """Whether the new tabs need lean mode's request blocking."""
+        self._implicit_wait = WAIT_TIMEOUT
+        """The driver's implicit wait, only sent when it changes."""
+
+    def run(
+        self,
+        flows: Sequence[tuple[str, TabFlow]],
+    ) -> dict[str, Exception | None]:
+        """Run the named flows until they all finish.
+
+        The first flow reuses the current tab and each other one gets a
+        new tab, closed afterwards (leaving the driver on the first).
+
+        Returns:
+            dict[str, Exception | None]: The error each flow raised, or
+            None if it completed, by name.
+        """
+        driver = self.driver
+        outcomes = dict[str, Exception | None]()
+        original = driver.current_window_handle
+        tabs = [_Tab(name, flow) for name, flow in flows]
+        opened = list[str]()
+        current = original
+        try:
+            for index, tab in enumerate(tabs):
+                if index == 0:
+                    tab.handle = original
+                else:
+                    tab.handle = current = self._open_tab()
+                    opened.append(tab.handle)
+
+            active = list(tabs)
+            while active:
+                progressed = False
+                for tab in list(active):
+                    if current != tab.handle:
+                        try:
+                            driver.switch_to.window(tab.handle)
+                        except NoSuchWindowException as exc:
+                            # e.g. the page crashed and took its tab along.
+                            outcomes[tab.name] = exc
+                            active.remove(tab)
+                            tab.flow.close()
+                            continue
+                        current = tab.handle
+                    if self._advance(tab, outcomes):
+                        progressed = True
+                    if tab.name in outcomes:
+                        active.remove(tab)
+                if not progressed:
+                    time.sleep(TAB_POLL_INTERVAL)
+        finally:
+            for tab in tabs:
+                tab.flow.close()
+            self._close_tabs(opened, original)
+        return outcomes
+
+    def _advance(
+        self,
+        tab: _Tab,
+        outcomes: dict[str, Exception | None],
+    ) -> bool:
+        """Resume the tab's flow if its wait is over.
+
+        Returns:
+            bool: Whether the flow was resumed.
+        """
+        error = None
+        if tab.wait is not None:
+            try:
+                # Checks mustn't block: the page isn't expected to be ready.
+                self._set_implicit_wait(0)
+                ready = bool(tab.wait.condition(self.driver))
+            except WebDriverException as exc:
+                ready, error = False, exc
+            if error is None and not ready:
+                if time.monotonic() < tab.deadline:
+                    return False
+                error = TimeoutException(
+                    f"Timed out waiting for {tab.wait.step}")
+            if error is None:
+                history.record(f"step.{tab.wait.step}",
+                               time.perf_counter() - tab.wait_start)
+
+        # The flows' own lookups expect the usual implicit wait.
+        self._set_implicit_wait(WAIT_TIMEOUT)
+        try:
+            if error is None:
+                wait = next(tab.flow)
+            else:
+                # Raised at the yield, so the flow can handle it.
+                wait = tab.flow.throw(error)
+        except StopIteration:
+            outcomes[tab.name] = None
+            return True
+        except Exception as exc:
+            outcomes[tab.name] = exc
+            return True
+
+        tab.wait = wait
+        tab.wait_start = time.perf_counter()
+        tab.deadline = time.monotonic() + step_timeout(wait.step,
+                                                       wait.default)
+        return True
+
+    def _open_tab(self) -> str:
+        """Open a new tab, switch to it and return its handle."""
+        driver = self.driver
+        driver.switch_to.new_window("tab")
+        # Blocking is per tab, and remote drivers can't do it.
+        if self.lean and hasattr(driver, "execute_cdp_cmd"):
+            block_nonessential_requests(driver)
+        return driver.current_window_handle
+
+    def _set_implicit_wait(self, seconds: float) -> None:
+        if self._implicit_wait != seconds:
+            self.driver.implicitly_wait(seconds)
+            self._implicit_wait = seconds
+
+    def _close_tabs(self, handles: list[str], original: str) -> None:
+        driver = self.driver
+        self._set_implicit_wait(WAIT_TIMEOUT)
+        for handle in handles:
+            try:
+                driver.switch_to.window(handle)
+                driver.close()
+            except WebDriverException:
+                pass
+        driver.switch_to.window(original)
@@ -0,0 +1,196 @@
+"""tracing.py
+
+Lightweight hierarchical timing spans for every phase of a run.
+
+Wrap a phase in `with span("name", key=value):` to time it. Spans nest
+per thread, and once a run finishes they can be exported both as a
+Chrome trace-event file (open it in chrome://tracing or Perfetto) and as
+one compact JSON line appended to a per-run log.
+
+Tracing is off unless `enable` is called. While off, `span` returns a
+shared no-op object, so instrumented code pays one attribute check and
+one function call per span.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from .config import TRACES_DIR
+
+
+class Span:
+    """A timed phase of the run. Use as a context manager."""
+
+    __slots__ = ("name", "args", "parent", "start_ns", "end_ns", "tid",
+                 "error")
+
+    def __init__(self, name: str, args: dict[str, Any]) -> None:
+        self.name = name
+        self.args = args
+        self.parent: str | None = None
+        self.start_ns = 0
+        self.end_ns = 0
+        self.tid = 0
+        self.error = False
+
+    def __enter__(self) -> "Span":
+        stack = _tracer.stack()
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self.tid = threading.get_ident()
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.end_ns = time.perf_counter_ns()
+        self.error = exc_type is not None
+        _tracer.stack().pop()
+        _tracer.finish(self)
+
+
+class _NoopSpan:
+    """Stand-in returned by `span` while tracing is disabled."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        return None
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Tracer:
+    def __init__(self) -> None:
+        self.enabled = False
+        self.run_id = uuid.uuid4().hex[:12]
+        self.started = datetime.now()
+        self.origin_ns = time.perf_counter_ns()
+        self.spans = list[Span]()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._thread_names = dict[int, str]()
+
+    def stack(self) -> list[Span]:
+        """Spans open in the current thread, innermost last."""
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def finish(self, finished_span: Span) -> None:
+        """Record a span that has ended."""
+        with self._lock:
+            self.spans.append(finished_span)
+            self._thread_names.setdefault(
+                finished_span.tid, threading.current_thread().name)
+
+    def chrome_trace(self) -> dict:
+        """Recorded spans in the Chrome trace event format."""
+        pid = os.getpid()
+        events: list[dict] = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+             "args": {"name": name}}
+            for tid, name in self._thread_names.items()
+        ]
+        for finished in self.spans:
+            events.append({
+                "name": finished.name,
+                "cat": "counters",
+                "ph": "X",
+                "ts": (finished.start_ns - self.origin_ns) / 1000,
+                "dur": (finished.end_ns - finished.start_ns) / 1000,
+                "pid": pid,
+                "tid": finished.tid,
+                "args": {**finished.args, "error": finished.error},
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def run_record(self) -> dict:
+        """Summary of the run and its spans, one line of runs.jsonl."""
+        return {
+            "run_id": self.run_id,
+            "started": self.started.isoformat(timespec="seconds"),
+            "total_ms": round(
+                (time.perf_counter_ns() - self.origin_ns) / 1e6, 3),
+            "spans": [
+                {
+                    "name": finished.name,
+                    "parent": finished.parent,
+                    "start_ms": round(
+                        (finished.start_ns - self.origin_ns) / 1e6, 3),
+                    "dur_ms": round(
+                        (finished.end_ns - finished.start_ns) / 1e6, 3),
+                    **({"args": finished.args} if finished.args else {}),
+                    **({"error": True} if finished.error else {}),
+                }
+                for finished in self.spans
+            ],
+        }
+
+
+_tracer = _Tracer()
+
+
+def span(name: str, **args: Any) -> Span | _NoopSpan:
+    """Return a context manager timing the named phase.
+
+    Keyword arguments are attached to the span (e.g. the platform name).
+    """
+    if not _tracer.enabled:
+        return _NOOP_SPAN
+    return Span(name, args)
+
+
+def enable() -> None:
+    """Start recording spans for the rest of the process."""
+    _tracer.enabled = True
+
+
+def is_enabled() -> bool:
+    """Whether spans are being recorded."""
+    return _tracer.enabled
+
+
+def get_run_id() -> str:
+    """Return the ID identifying this process's run."""
+    return _tracer.run_id
+
+
+def new_run() -> str:
+    """Start another run in the same process (e.g. in `counters serve`),
+    with a fresh ID and no spans. Return the new run ID."""
+    global _tracer  # pylint: disable=global-statement
+    enabled = _tracer.enabled
+    _tracer = _Tracer()
+    _tracer.enabled = enabled
+    return _tracer.run_id
+
+
+def export(directory: Path = TRACES_DIR) -> Path | None:
+    """Write out the spans recorded so far.
+
+    Writes `<run ID>.trace.json` in Chrome trace-event format and appends
+    one line to `runs.jsonl`. Does nothing if tracing is disabled.
+
+    Returns:
+        Path | None: Path to the trace-event file, if written.
+    """
+    if not _tracer.enabled:
+        return None
+
+    directory.mkdir(parents=True, exist_ok=True)
+    trace_path = directory / f"{_tracer.run_id}.trace.json"
+    with trace_path.open("wt", encoding="utf-8") as fp:
+        json.dump(_tracer.chrome_trace(), fp)
+    with (directory / "runs.jsonl").open("at", encoding="utf-8") as fp:
+        fp.write(json.dumps(_tracer.run_record()) + "\n")
+    return trace_path
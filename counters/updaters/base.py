@@ -5,6 +5,9 @@ from typing import Generic, TypeVar
 import rich.panel
 from selenium import webdriver
 
+from ..tabs import TabFlow
+from ..web_session import SessionRejectedError
+
 DetailsDict = TypeVar("DetailsDict")
 
 
@@ -14,6 +17,9 @@ class Updater(ABC, Generic[DetailsDict]):
     social media platform.
     """
 
+    uses_browser = False
+    """Whether `update_bio` drives the web driver it is passed."""
+
     def __init__(self, data: dict) -> None:
         """Initialize the updater.
 
@@ -27,6 +33,14 @@ class Updater(ABC, Generic[DetailsDict]):
     def platform_name(self) -> str:
         """The name of the platform this updater is for."""
 
+    @property
+    def account(self) -> str:
+        """
+        The account this updater acts as. Updaters of the same account
+        share credentials and sessions, so they're run together.
+        """
+        return self.platform_name
+
     @abstractmethod
     def prepare_details(self, today: date) -> DetailsDict:
         """Prepare the details to use when updating the bio."""
@@ -35,6 +49,37 @@ class Updater(ABC, Generic[DetailsDict]):
     def update_bio(self, details: DetailsDict, driver: webdriver.Edge) -> None:
         """Update the bio (or equivalent) on social media platform."""
 
+    def update_bio_steps(
+        self,
+        details: DetailsDict,
+        driver: webdriver.Edge,
+    ) -> TabFlow:
+        """
+        Same as `update_bio`, as a flow that yields instead of blocking
+        while its page loads, so it can share the browser with other
+        updaters in tabs. By default, runs `update_bio` in one go.
+        """
+        self.update_bio(details, driver)
+        yield from ()
+
+    def update_bio_http(self, details: DetailsDict) -> None:
+        """
+        Update the bio with plain HTTP requests using a session exported
+        from an earlier browser run, instead of driving the browser.
+
+        Raises:
+            SessionRejectedError: There is no usable session, so the
+            caller should fall back to `update_bio`.
+        """
+        raise SessionRejectedError(
+            f"{self.platform_name} has no HTTP backend")
+
+    def export_session(self, driver: webdriver.Edge) -> None:
+        """
+        Save the session of the driver after a successful `update_bio`
+        for later use by `update_bio_http`. Does nothing by default.
+        """
+
     @abstractmethod
     def format_preview(self, details: DetailsDict) -> rich.panel.Panel:
         """Format the console presentation of this task."""
@@ -8,22 +8,72 @@ from typing import TypedDict
 
 from rich.panel import Panel
 from selenium import webdriver
-from selenium.common.exceptions import NoSuchElementException
+from selenium.webdriver.support.wait import WebDriverWait
 
-from ..config import DISCORD_EMAIL, DISCORD_PASSWORD, PLATFORM_DISCORD
+from ..config import (DISCORD_API_URL, DISCORD_EMAIL, DISCORD_PASSWORD,
+                      DISCORD_URL, PLATFORM_DISCORD)
 # Experimenting CSS selectors as an alternative to full XPaths
 # Not sure how often these will change in comparison
-from ..selectors.discord import (AVATAR_ICON, EDIT_STATUS_ITEM, EMAIL_INPUT,
-                                 PASSWORD_INPUT, SET_STATUS_ITEM, STATUS_INPUT)
+from ..selectors.discord import (AVATAR_ICON, CUSTOM_STATUS_ITEM, EMAIL_INPUT,
+                                 PASSWORD_INPUT, STATUS_INPUT)
+from ..steps import immediate, step
+from ..tabs import TabFlow, Wait, any_of, navigate, present
 from ..utils import format_generic_task_preview
+from ..web_session import WebSession
 from .base import Updater
 
+_TOKEN_SCRIPT = """
+// Discord removes window.localStorage once the app has loaded, but a
+// fresh iframe still exposes the same storage.
+const frame = document.createElement("iframe");
+document.body.appendChild(frame);
+const token = frame.contentWindow.localStorage.getItem("token");
+frame.remove();
+return token ? JSON.parse(token) : null;
+"""
+
+
+def _login_page_or_app(driver: webdriver.Edge) -> bool:
+    """Condition that the login form is shown, or the app if /login
+    redirected to it."""
+    return any_of(present(EMAIL_INPUT, PASSWORD_INPUT),
+                  present(AVATAR_ICON))(driver)
+
+
+def login(driver: webdriver.Edge) -> None:
+    """Handle the authentication landing page.
+
+    A browser whose profile or session was reused may still be logged
+    in, in which case /login redirects to the app and there's nothing to
+    do. Shared with the status-logger subprogram, which logs in the same
+    way.
+    """
+    with step(driver, "discord.login") as timeout:
+        with immediate(driver):
+            WebDriverWait(driver, timeout).until(_login_page_or_app)
+            logged_in = not driver.find_elements(*EMAIL_INPUT)
+        if logged_in:
+            print("Already logged in to Discord.")
+            return
+
+        # Find elements
+        email_input = driver.find_element(*EMAIL_INPUT)
+        password_input = driver.find_element(*PASSWORD_INPUT)
+
+        # Enter credentials
+        email_input.clear()
+        email_input.send_keys(DISCORD_EMAIL)
+        password_input.clear()
+        password_input.send_keys(DISCORD_PASSWORD + "\n")
+
 
 class DiscordDetails(TypedDict):
     status: str | None
 
 
 class DiscordUpdater(Updater[DiscordDetails]):
+    uses_browser = True
+
     @property
     def platform_name(self) -> str:
         return PLATFORM_DISCORD
@@ -45,10 +95,47 @@ class DiscordUpdater(Updater[DiscordDetails]):
         status = details["status"]
         if status is None:
             return
-        driver.get("https://discord.com/login")
-        self._login(driver)
+        driver.get(f"{DISCORD_URL}/login")
+        login(driver)
+        self._update_status(driver, status)
+
+    def update_bio_steps(
+        self,
+        details: DiscordDetails,
+        driver: webdriver.Edge,
+    ) -> TabFlow:
+        status = details["status"]
+        if status is None:
+            return
+        navigate(driver, f"{DISCORD_URL}/login")
+        yield Wait(_login_page_or_app, "discord.login_page")
+        login(driver)
+        yield Wait(present(AVATAR_ICON), "discord.app_load")
         self._update_status(driver, status)
 
+    def update_bio_http(self, details: DiscordDetails) -> None:
+        status = details["status"]
+        if status is None:
+            return
+        session = WebSession(self.platform_name)
+        session.load()
+
+        # Only replace the text, keeping the emoji like the browser flow.
+        settings_url = f"{DISCORD_API_URL}/users/@me/settings"
+        settings = session.request("GET", settings_url)
+        custom_status = settings.get("custom_status") or {}
+        custom_status["text"] = status
+        session.request("PATCH", settings_url,
+                        json_body={"custom_status": custom_status})
+
+    def export_session(self, driver: webdriver.Edge) -> None:
+        # The API authenticates with the token, not with cookies.
+        token = driver.execute_script(_TOKEN_SCRIPT)
+        if token is None:
+            return
+        session = WebSession(self.platform_name)
+        session.save_from_driver(driver, headers={"Authorization": token})
+
     def format_preview(self, details: DiscordDetails) -> Panel:
         return format_generic_task_preview(
             platform_name="Discord",
@@ -56,33 +143,22 @@ class DiscordUpdater(Updater[DiscordDetails]):
             color="blue",
         )
 
-    def _login(self, driver: webdriver.Edge) -> None:
-        # Find elements
-        email_input = driver.find_element(*EMAIL_INPUT)
-        password_input = driver.find_element(*PASSWORD_INPUT)
-
-        # Enter credentials
-        email_input.clear()
-        email_input.send_keys(DISCORD_EMAIL)
-        password_input.clear()
-        password_input.send_keys(DISCORD_PASSWORD + "\n")
-
     def _update_status(self, driver: webdriver.Edge, status: str) -> None:
-        # Bring up menu in the bottom left corner
-        avatar_icon = driver.find_element(*AVATAR_ICON)
-        avatar_icon.click()
-
-        # Click the "Edit custom status" option
-        # If there's currently no status, it's "Set custom status" instead
-        try:
-            custom_status = driver.find_element(*EDIT_STATUS_ITEM)
-        except NoSuchElementException:
-            custom_status = driver.find_element(*SET_STATUS_ITEM)
-        custom_status.click()
-
-        # Get the input text bot
-        status_input = driver.find_element(*STATUS_INPUT)
-
-        # Enter the status into the text box
-        status_input.clear()
-        status_input.send_keys(status + "\n")
+        with step(driver, "discord.open_status_menu"):
+            # Bring up menu in the bottom left corner
+            avatar_icon = driver.find_element(*AVATAR_ICON)
+            avatar_icon.click()
+
+            # Click the "Edit custom status" option
+            # If there's currently no status, it's "Set custom status"
+            # instead, so look for either in one go
+            custom_status = driver.find_element(*CUSTOM_STATUS_ITEM)
+            custom_status.click()
+
+        with step(driver, "discord.submit_status"):
+            # Get the input text bot
+            status_input = driver.find_element(*STATUS_INPUT)
+
+            # Enter the status into the text box
+            status_input.clear()
+            status_input.send_keys(status + "\n")
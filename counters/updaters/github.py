@@ -6,10 +6,13 @@ Interface for updating the GitHub profile bio.
 from datetime import date
 from typing import TypedDict
 
-from github import Auth, Github
+from github import Auth, Github, RateLimitExceededException
 from rich.panel import Panel
 
-from ..config import GITHUB_PAT, PLATFORM_GITHUB
+from ..config import (GITHUB_API_URL, GITHUB_PAT, PLATFORM_GITHUB,
+                      RATE_LIMIT_MAX_RETRIES)
+from ..logger import log
+from ..rate_limit import limiter
 from ..utils import format_generic_task_preview
 from .base import Updater
 
@@ -37,9 +40,31 @@ class GitHubUpdater(Updater[GitHubDetails]):
         if bio is None:
             return
         auth = Auth.Token(GITHUB_PAT)
-        github = Github(auth=auth)
+        github = Github(auth=auth, base_url=GITHUB_API_URL)
         user = github.get_user()
-        user.edit(bio=bio)
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            limiter.acquire(GITHUB_API_URL, GITHUB_PAT)
+            try:
+                user.edit(bio=bio)
+            except RateLimitExceededException as exc:
+                limiter.observe(GITHUB_API_URL, GITHUB_PAT, exc.status,
+                                exc.headers or {})
+                if attempt == RATE_LIMIT_MAX_RETRIES:
+                    raise
+                log.warning("GitHub rate limit exceeded, retrying.")
+                continue
+            break
+
+        # PyGithub keeps the rate limit headers of the last response. Its
+        # Github.rate_limiting would request /rate_limit if there were
+        # none, so read them from the requester instead.
+        requester = user._requester  # pylint: disable=protected-access
+        remaining, limit = requester.rate_limiting
+        if limit >= 0:
+            limiter.observe(GITHUB_API_URL, GITHUB_PAT, 200, {
+                "X-RateLimit-Remaining": str(remaining),
+                "X-RateLimit-Reset": str(requester.rate_limiting_resettime),
+            })
 
     def format_preview(self, details: GitHubDetails) -> Panel:
         return format_generic_task_preview(
@@ -13,19 +13,39 @@ from selenium.webdriver.remote.webelement import WebElement
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.wait import WebDriverWait
 
-from ..config import INSTAGRAM_PASSWORD, INSTAGRAM_USERNAME, PLATFORM_INSTAGRAM
+from ..config import (INSTAGRAM_PASSWORD, INSTAGRAM_URL, INSTAGRAM_USERNAME,
+                      PLATFORM_INSTAGRAM)
 from ..selectors.instagram import (BIO_BOX, LOGIN_BUTTON, NOT_NOW_BUTTON,
                                    PASSWORD_INPUT, SUBMIT_BUTTON,
                                    USERNAME_INPUT)
+from ..steps import immediate, step
+from ..tabs import TabFlow, Wait, any_of, navigate, present
 from ..utils import format_generic_task_preview
+from ..web_session import SessionRejectedError, WebSession
 from .base import Updater
 
+INSTAGRAM_APP_ID = "936619743392459"
+"""App ID the Instagram web app sends with its API requests."""
+
+_FORM_FIELDS = ("first_name", "email", "username", "phone_number",
+                "external_url")
+"""Fields of the edit profile form that must be resubmitted as-is."""
+
+
+def _login_or_edit_page(driver: webdriver.Edge) -> bool:
+    """Condition that the login form is shown, or the edit page if the
+    session is still logged in."""
+    return any_of(present(USERNAME_INPUT, PASSWORD_INPUT, LOGIN_BUTTON),
+                  present(BIO_BOX, SUBMIT_BUTTON))(driver)
+
 
 class InstagramDetails(TypedDict):
     bio: str | None
 
 
 class InstagramUpdater(Updater[InstagramDetails]):
+    uses_browser = True
+
     @property
     def platform_name(self) -> str:
         return PLATFORM_INSTAGRAM
@@ -47,11 +67,72 @@ class InstagramUpdater(Updater[InstagramDetails]):
         bio = details["bio"]
         if bio is None:
             return
-        driver.get("https://www.instagram.com/accounts/edit")
-        self._login(driver)
-        self._navigate_to_profile(driver)
+        driver.get(f"{INSTAGRAM_URL}/accounts/edit")
+        if self._login(driver):
+            self._navigate_to_profile(driver)
         self._update_profile(driver, bio)
 
+    def update_bio_steps(
+        self,
+        details: InstagramDetails,
+        driver: webdriver.Edge,
+    ) -> TabFlow:
+        bio = details["bio"]
+        if bio is None:
+            return
+        navigate(driver, f"{INSTAGRAM_URL}/accounts/edit")
+        yield Wait(_login_or_edit_page, "instagram.login_page")
+        if self._login(driver):
+            # Same as _navigate_to_profile, without blocking on the prompt.
+            try:
+                yield Wait(present(NOT_NOW_BUTTON), "instagram.prompt",
+                           default=5.0)
+                driver.find_element(*NOT_NOW_BUTTON).click()
+            except TimeoutException:
+                navigate(driver, f"{INSTAGRAM_URL}/accounts/edit")
+            yield Wait(present(BIO_BOX, SUBMIT_BUTTON), "instagram.edit_page")
+        self._update_profile(driver, bio)
+
+    def update_bio_http(self, details: InstagramDetails) -> None:
+        bio = details["bio"]
+        if bio is None:
+            return
+        session = WebSession(self.platform_name)
+        session.load()
+        headers = {
+            "X-CSRFToken": session.cookies.get("csrftoken", ""),
+            "X-IG-App-ID": INSTAGRAM_APP_ID,
+            "X-Requested-With": "XMLHttpRequest",
+            "Referer": f"{INSTAGRAM_URL}/accounts/edit/",
+        }
+
+        # The edit endpoint replaces the whole profile, so fetch the
+        # current values of the other fields first.
+        response = session.request(
+            "GET", f"{INSTAGRAM_URL}/api/v1/accounts/edit/web_form_data/",
+            headers=headers,
+        )
+        form_data = response.get("form_data")
+        if form_data is None or response.get("require_login"):
+            raise SessionRejectedError("Instagram session is logged out")
+
+        fields = {key: str(form_data.get(key) or "") for key in _FORM_FIELDS}
+        fields["biography"] = bio
+        if form_data.get("chaining_enabled"):
+            fields["chaining_enabled"] = "on"
+
+        response = session.request(
+            "POST", f"{INSTAGRAM_URL}/api/v1/web/accounts/edit/",
+            form_body=fields, headers=headers,
+        )
+        if response.get("require_login"):
+            raise SessionRejectedError("Instagram session is logged out")
+        if response.get("status") != "ok":
+            raise Exception(f"Instagram rejected the bio update: {response}")
+
+    def export_session(self, driver: webdriver.Edge) -> None:
+        WebSession(self.platform_name).save_from_driver(driver)
+
     def format_preview(self, details: InstagramDetails) -> Panel:
         return format_generic_task_preview(
             platform_name="Instagram",
@@ -59,19 +140,34 @@ class InstagramUpdater(Updater[InstagramDetails]):
             color="bright_magenta",
         )
 
-    def _login(self, driver: webdriver.Edge) -> None:
-        """Handle the authentication landing page."""
-        # Find elements
-        username_elem = driver.find_element(*USERNAME_INPUT)
-        password_elem = driver.find_element(*PASSWORD_INPUT)
-        login_button = driver.find_element(*LOGIN_BUTTON)
+    def _login(self, driver: webdriver.Edge) -> bool:
+        """Handle the authentication landing page.
 
-        # Input credentials and login
-        username_elem.clear()
-        username_elem.send_keys(INSTAGRAM_USERNAME)
-        password_elem.clear()
-        password_elem.send_keys(INSTAGRAM_PASSWORD)
-        login_button.click()
+        Returns:
+            bool: Whether the form was filled in, as opposed to the page
+            having gone straight to the edit page because a reused
+            browser is still logged in.
+        """
+        with step(driver, "instagram.login") as timeout:
+            with immediate(driver):
+                WebDriverWait(driver, timeout).until(_login_or_edit_page)
+                logged_in = not driver.find_elements(*USERNAME_INPUT)
+            if logged_in:
+                print("Already logged in to Instagram.")
+                return False
+
+            # Find elements
+            username_elem = driver.find_element(*USERNAME_INPUT)
+            password_elem = driver.find_element(*PASSWORD_INPUT)
+            login_button = driver.find_element(*LOGIN_BUTTON)
+
+            # Input credentials and login
+            username_elem.clear()
+            username_elem.send_keys(INSTAGRAM_USERNAME)
+            password_elem.clear()
+            password_elem.send_keys(INSTAGRAM_PASSWORD)
+            login_button.click()
+        return True
 
     def _navigate_to_profile(self, driver: webdriver.Edge) -> None:
         """
@@ -83,12 +179,14 @@ class InstagramUpdater(Updater[InstagramDetails]):
             (NOT_NOW_BUTTON.by, NOT_NOW_BUTTON.value)
         )
         try:
-            not_now_button: WebElement = \
-                WebDriverWait(driver, 5).until(condition)
-            not_now_button.click()
+            with step(driver, "instagram.dismiss_prompt",
+                      default=5.0) as timeout:
+                not_now_button: WebElement = \
+                    WebDriverWait(driver, timeout).until(condition)
+                not_now_button.click()
         except TimeoutException:
             # Just try to redirect again bro sigh
-            driver.get("https://www.instagram.com/accounts/edit")
+            driver.get(f"{INSTAGRAM_URL}/accounts/edit")
 
     def _update_profile(self, driver: webdriver.Edge, bio: str) -> None:
         """Handle updating the bio after reaching the edit profile page.
@@ -97,19 +195,21 @@ class InstagramUpdater(Updater[InstagramDetails]):
             bio (str): Bio to input as the new bio.
 
         Raises:
-            TimeoutException: Couldn't locate a certain element within
-            `WAIT_TIMEOUT` seconds.
+            NoSuchElementException: Couldn't locate a certain element
+            within the step's timeout.
         """
-        # Find elements
-        bio_box = driver.find_element(*BIO_BOX)
-
-        # Submit new bio string
-        bio_box.clear()
-        bio_box.send_keys(bio)
-
-        # NOTE: If you don't edit anything, the button will be disabled
-        submit_button = driver.find_element(*SUBMIT_BUTTON)
-        submit_button.click()
+        with step(driver, "instagram.edit_bio"):
+            # Find elements
+            bio_box = driver.find_element(*BIO_BOX)
+
+            # Submit new bio string
+            bio_box.clear()
+            bio_box.send_keys(bio)
+
+        with step(driver, "instagram.submit"):
+            # NOTE: If you don't edit anything, the button will be disabled
+            submit_button = driver.find_element(*SUBMIT_BUTTON)
+            submit_button.click()
 
         # Make sure the update registered
         # try:
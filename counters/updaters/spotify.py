@@ -4,6 +4,7 @@ Interface for updating Spotify playlist details.
 """
 
 from datetime import date
+from functools import cache
 from typing import TypedDict
 
 import tekore
@@ -11,18 +12,63 @@ from rich.panel import Panel
 from rich.table import Table
 from rich.text import Text
 
-from ..config import (PLATFORM_SPOTIFY, SPOTIFY_CLIENT_ID,
-                      SPOTIFY_CLIENT_SECRET, SPOTIFY_USER_REFRESH)
+from ..config import (PLATFORM_SPOTIFY, RATE_LIMIT_MAX_RETRIES,
+                      SPOTIFY_API_URL, SPOTIFY_CLIENT_ID,
+                      SPOTIFY_CLIENT_SECRET, SPOTIFY_TOKEN_URL,
+                      SPOTIFY_USER_REFRESH)
+from ..logger import log
+from ..rate_limit import limiter
 from ..utils import UNCHANGED_TEXT, format_generic_task_preview
 from .base import Updater
 
-# Refresh token and instantiate client once to minimize API calls.
-_token = tekore.refresh_user_token(
-    client_id=SPOTIFY_CLIENT_ID,
-    client_secret=SPOTIFY_CLIENT_SECRET,
-    refresh_token=SPOTIFY_USER_REFRESH,
-)
-_spotify = tekore.Spotify(_token.access_token)
+_DEFAULT_API_URL = "https://api.spotify.com/v1/"
+_DEFAULT_TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+
+class _SpotifySender(tekore.SyncSender):
+    """
+    Sender shaping tekore's requests with the shared rate limiter, and
+    redirecting its hard-coded Spotify URLs to the ones configured, e.g.
+    to point it at a local stub server.
+    """
+
+    def send(self, request: tekore.Request) -> tekore.Response:
+        if request.url == _DEFAULT_TOKEN_URL:
+            request.url = SPOTIFY_TOKEN_URL
+        elif request.url.startswith(_DEFAULT_API_URL):
+            request.url = SPOTIFY_API_URL + \
+                request.url.removeprefix(_DEFAULT_API_URL)
+
+        # The access token for API calls, the client's for token refreshes.
+        credential = (request.headers or {}).get("Authorization")
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            limiter.acquire(request.url, credential)
+            response = super().send(request)
+            limiter.observe(request.url, credential,
+                            response.status_code, response.headers)
+            if response.status_code != 429 or \
+                    attempt == RATE_LIMIT_MAX_RETRIES:
+                break
+            log.warning("Spotify throttled %s %s, retrying.",
+                        request.method, request.url)
+        return response
+
+
+@cache
+def _get_spotify() -> tekore.Spotify:
+    """Refresh the token and instantiate the client, once per process.
+
+    Deferred to first use so that importing the package (e.g. for a dry
+    run, or a run without Spotify) doesn't make any API calls.
+    """
+    sender = _SpotifySender()
+    credentials = tekore.Credentials(
+        client_id=SPOTIFY_CLIENT_ID,
+        client_secret=SPOTIFY_CLIENT_SECRET,
+        sender=sender,
+    )
+    token = credentials.refresh_user_token(SPOTIFY_USER_REFRESH)
+    return tekore.Spotify(token, sender=sender)
 
 
 class SpotifyPlaylistDetails(TypedDict):
@@ -37,6 +83,11 @@ class SpotifyPlaylistUpdater(Updater[SpotifyPlaylistDetails]):
     def platform_name(self) -> str:
         return f"{PLATFORM_SPOTIFY} Playlist (ID={self.data['playlist_id']})"
 
+    @property
+    def account(self) -> str:
+        # All playlists are edited with the same user token.
+        return PLATFORM_SPOTIFY
+
     def prepare_details(self, today: date) -> SpotifyPlaylistDetails:
         # Fill day number placeholders if included
         name: str | None = self.data["name"]
@@ -63,7 +114,7 @@ class SpotifyPlaylistUpdater(Updater[SpotifyPlaylistDetails]):
         playlist_id = details["id"]
         name = details["name"]
         description = details["description"]
-        _spotify.playlist_change_details(
+        _get_spotify().playlist_change_details(
             playlist_id=playlist_id,
             name=name,  # type: ignore
             description=description,  # type: ignore
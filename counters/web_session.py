@@ -0,0 +1,149 @@
+"""web_session.py
+
+Replay an authenticated browser session over plain HTTP.
+
+After a successful Selenium run, the cookies (and any auth headers) of
+the logged-in page are exported to a small JSON file per platform. Later
+runs can then make the same change the web app would have made with a
+single HTTP request, without a browser. If the saved session is missing,
+expired or rejected by the server, `SessionRejectedError` is raised so
+the caller can fall back to the Selenium flow, which exports a fresh
+session.
+"""
+
+import json
+import os
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+from selenium import webdriver
+
+from .config import RATE_LIMIT_MAX_RETRIES, SESSIONS_DIR
+from .rate_limit import limiter
+
+REQUEST_TIMEOUT = 10.0
+"""Time in seconds to wait for a response before giving up."""
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36 Edg/120.0.0.0"
+)
+"""User-Agent to send, matching the browser the session came from."""
+
+
+class SessionRejectedError(Exception):
+    """The saved session is missing, expired or was rejected."""
+
+
+class WebSession:
+    """Cookies and headers of a logged-in browser session."""
+
+    def __init__(self, platform_name: str) -> None:
+        self.platform_name = platform_name
+        self.path = SESSIONS_DIR / f"{platform_name.lower()}.json"
+        self.cookies = dict[str, str]()
+        self.headers = dict[str, str]()
+
+    def load(self) -> None:
+        """Load the session saved for this platform.
+
+        Raises:
+            SessionRejectedError: No usable session was saved.
+        """
+        try:
+            with self.path.open("rt", encoding="utf-8") as fp:
+                data = json.load(fp)
+        except (OSError, ValueError):
+            raise SessionRejectedError(
+                f"No saved session at {self.path}") from None
+
+        now = time.time()
+        self.cookies = {
+            cookie["name"]: cookie["value"] for cookie in data["cookies"]
+            if cookie.get("expiry") is None or cookie["expiry"] > now
+        }
+        self.headers = data["headers"]
+        if not self.cookies and not self.headers:
+            raise SessionRejectedError(f"Session at {self.path} expired")
+
+    def save_from_driver(
+        self,
+        driver: webdriver.Edge,
+        headers: dict[str, str] | None = None,
+    ) -> None:
+        """Export the cookies of the driver's current page to disk."""
+        data = {
+            "cookies": driver.get_cookies(),
+            "headers": headers or {},
+            "saved": time.time(),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # The cookies and tokens are credentials, so only the owner may
+        # read them. The mode only applies to new files, hence the chmod
+        # for ones saved before.
+        descriptor = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC,
+                             0o600)
+        os.chmod(self.path, 0o600)
+        with os.fdopen(descriptor, "wt", encoding="utf-8") as fp:
+            json.dump(data, fp)
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        json_body: dict | None = None,
+        form_body: dict[str, str] | None = None,
+        headers: dict[str, str] | None = None,
+    ) -> dict:
+        """Make a request with the session's credentials attached.
+
+        Returns:
+            dict: The decoded JSON response body ({} if empty).
+
+        Raises:
+            SessionRejectedError: The server answered 401 or 403.
+            urllib.error.HTTPError: Any other error status (429 only
+            once retrying as the server asked didn't help).
+        """
+        all_headers = {"User-Agent": USER_AGENT, **self.headers}
+        if self.cookies:
+            all_headers["Cookie"] = "; ".join(
+                f"{name}={value}" for name, value in self.cookies.items()
+            )
+        all_headers.update(headers or {})
+
+        data = None
+        if json_body is not None:
+            data = json.dumps(json_body).encode("utf-8")
+            all_headers["Content-Type"] = "application/json"
+        elif form_body is not None:
+            data = urllib.parse.urlencode(form_body).encode("utf-8")
+            all_headers["Content-Type"] = \
+                "application/x-www-form-urlencoded"
+
+        request = urllib.request.Request(url, data=data, method=method,
+                                         headers=all_headers)
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            limiter.acquire(url, self.platform_name)
+            try:
+                with urllib.request.urlopen(
+                        request, timeout=REQUEST_TIMEOUT) as response:
+                    body = response.read()
+            except urllib.error.HTTPError as exc:
+                limiter.observe(url, self.platform_name, exc.code,
+                                exc.headers)
+                if exc.code in (401, 403):
+                    raise SessionRejectedError(
+                        f"{method} {url} was rejected with {exc.code}"
+                    ) from exc
+                if exc.code == 429 and attempt < RATE_LIMIT_MAX_RETRIES:
+                    continue
+                raise
+            limiter.observe(url, self.platform_name, response.status,
+                            response.headers)
+            break
+
+        return json.loads(body) if body else {}
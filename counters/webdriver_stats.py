@@ -0,0 +1,186 @@
+"""webdriver_stats.py
+
+Command-level instrumentation of the web driver.
+
+Every WebDriver RPC goes through the driver's command executor, so
+wrapping that one object gives visibility into every command issued by
+the updaters and the status logger: its name, the selector it used (for
+element lookups), its latency and its outcome. Lookups that failed only
+after waiting out (roughly) the whole implicit wait are flagged as
+stalls, since they are pure wasted time.
+"""
+
+import json
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from selenium import webdriver
+
+from .config import TRACES_DIR, WAIT_TIMEOUT
+from .tracing import get_run_id, span
+
+HISTOGRAM_BOUNDS_MS = [1, 5, 10, 50, 100, 500, 1000, 5000, 10000]
+"""Upper bounds of the latency histogram buckets (plus one overflow)."""
+
+STALL_FRACTION = 0.9
+"""Fraction of the implicit wait a failed lookup must take to count."""
+
+_FIND_COMMANDS = {"findElement", "findElements", "findChildElement",
+                  "findChildElements"}
+
+
+@dataclass
+class CommandRecord:
+    """A single WebDriver command and how it went."""
+    command: str
+    selector: str | None
+    latency_ms: float
+    outcome: str
+    stall: bool
+
+
+class WebDriverStats:
+    """Collector of command records across all instrumented drivers."""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.records = list[CommandRecord]()
+        self._lock = threading.Lock()
+
+    def add(self, record: CommandRecord) -> None:
+        with self._lock:
+            self.records.append(record)
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        """Return per-command counts, errors and latency histograms."""
+        summary = dict[str, dict[str, Any]]()
+        for record in self.records:
+            entry = summary.setdefault(record.command, {
+                "count": 0,
+                "errors": 0,
+                "stalls": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "histogram": [0] * (len(HISTOGRAM_BOUNDS_MS) + 1),
+            })
+            entry["count"] += 1
+            entry["errors"] += record.outcome != "ok"
+            entry["stalls"] += record.stall
+            entry["total_ms"] += record.latency_ms
+            entry["max_ms"] = max(entry["max_ms"], record.latency_ms)
+            entry["histogram"][_bucket(record.latency_ms)] += 1
+        return summary
+
+    def report(self) -> str:
+        """Format the summary and any stalls for the console."""
+        lines = ["WebDriver commands (count, errors, total, max):"]
+        summary = self.summary()
+        ordered = sorted(summary.items(), key=lambda kv: -kv[1]["total_ms"])
+        for command, entry in ordered:
+            lines.append(
+                f"  {command:<24} {entry['count']:>4} {entry['errors']:>4} "
+                f"{entry['total_ms'] / 1000:>8.2f}s "
+                f"{entry['max_ms'] / 1000:>7.2f}s"
+            )
+        stalls = [record for record in self.records if record.stall]
+        if stalls:
+            lines.append("Implicit-wait stalls:")
+            for record in stalls:
+                lines.append(f"  {record.latency_ms / 1000:.2f}s "
+                             f"{record.command} {_shorten(record.selector)}")
+        return "\n".join(lines)
+
+    def export(self) -> None:
+        """Append this run's records and summary to the stats log."""
+        TRACES_DIR.mkdir(parents=True, exist_ok=True)
+        entry = {
+            "run_id": get_run_id(),
+            "histogram_bounds_ms": HISTOGRAM_BOUNDS_MS,
+            "summary": self.summary(),
+            "commands": [asdict(record) for record in self.records],
+        }
+        path = TRACES_DIR / "webdriver.jsonl"
+        with path.open("at", encoding="utf-8") as fp:
+            fp.write(json.dumps(entry) + "\n")
+
+
+stats = WebDriverStats()
+"""The collector shared by the whole process."""
+
+
+class InstrumentedExecutor:
+    """
+    Wrapper around a driver's command executor that times every command
+    before handing back the response untouched.
+    """
+
+    def __init__(self, inner: Any, collector: WebDriverStats) -> None:
+        self._inner = inner
+        self._collector = collector
+        self._implicit_wait = WAIT_TIMEOUT
+
+    def execute(self, command: str, params: dict) -> dict:
+        selector = None
+        if command in _FIND_COMMANDS:
+            selector = f"{params.get('using')}={params.get('value')}"
+        elif command == "setTimeouts" and "implicit" in params:
+            self._implicit_wait = params["implicit"] / 1000
+
+        start = time.perf_counter()
+        outcome = "ok"
+        try:
+            with span(f"webdriver.{command}", selector=selector):
+                response = self._inner.execute(command, params)
+            value = response.get("value") if response else None
+            if isinstance(value, dict) and "error" in value:
+                outcome = value["error"]
+            return response
+        except Exception as exc:
+            outcome = type(exc).__name__
+            raise
+        finally:
+            latency = time.perf_counter() - start
+            stall = (command in _FIND_COMMANDS
+                     and outcome == "no such element"
+                     and self._implicit_wait >= 1.0
+                     and latency >= STALL_FRACTION * self._implicit_wait)
+            self._collector.add(CommandRecord(
+                command=command,
+                selector=selector,
+                latency_ms=round(latency * 1000, 3),
+                outcome=outcome,
+                stall=stall,
+            ))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._inner, name)
+
+
+def enable() -> None:
+    """Instrument every driver created from now on."""
+    stats.enabled = True
+
+
+def instrument(driver: webdriver.Edge) -> None:
+    """Route the driver's commands through the shared collector."""
+    if stats.enabled:
+        driver.command_executor = InstrumentedExecutor(
+            driver.command_executor, stats)
+
+
+def _bucket(latency_ms: float) -> int:
+    for index, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+        if latency_ms <= bound:
+            return index
+    return len(HISTOGRAM_BOUNDS_MS)
+
+
+def _shorten(selector: str | None, width: int = 80) -> str:
+    if selector is None:
+        return ""
+    if len(selector) <= width:
+        return selector
+    # The distinguishing part of these long selectors is at the end.
+    return "..." + selector[-(width - 3):]
@@ -0,0 +1,314 @@
+"""work_queue.py
+
+Durable local queue of target updates, backed by SQLite in WAL mode.
+
+Each job is the update of one target (updater platform name) to one
+date. `counters queue enqueue` adds the jobs, and any number of
+`counters queue work` processes consume them:
+
+* A worker leases a batch of ready jobs of one account at a time. A
+  lease hides the jobs from other workers until its visibility timeout,
+  which the worker keeps extending while it's alive.
+* If a worker crashes, its leases expire and the jobs become ready again
+  for another worker. Updates that completed before the crash are found
+  in the journal and acknowledged without being redone.
+* A failed job is retried with exponential backoff, and moved to the
+  dead letters once it has used up its attempts.
+
+Only the holder of a lease can acknowledge or fail the job, so a worker
+that lost its lease (e.g. it was suspended) can't clobber the outcome of
+the worker that took over.
+"""
+
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+
+from .config import (QUEUE_DB_PATH, QUEUE_MAX_ATTEMPTS, QUEUE_RETRY_BACKOFF,
+                     QUEUE_VISIBILITY_TIMEOUT)
+
+STATE_READY = "ready"
+STATE_LEASED = "leased"
+STATE_DONE = "done"
+STATE_DEAD = "dead"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    day TEXT NOT NULL,
+    target TEXT NOT NULL,
+    account TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    enqueued_at REAL NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    finished_at REAL,
+    last_error TEXT
+);
+-- At most one pending job per target and date.
+CREATE UNIQUE INDEX IF NOT EXISTS jobs_pending
+    ON jobs (day, target) WHERE state IN ('ready', 'leased');
+CREATE INDEX IF NOT EXISTS jobs_by_state
+    ON jobs (state, available_at);
+"""
+
+
+@dataclass
+class Job:
+    """A leased job, as handed to a worker."""
+
+    id: int
+    day: date
+    target: str
+    """Platform name of the updater to run."""
+    account: str
+    attempts: int
+    """Number of times the job was leased, including this one."""
+    max_attempts: int
+
+
+class WorkQueue:
+    """Connection to the queue database. Not shared between threads."""
+
+    def __init__(self, path: Path = QUEUE_DB_PATH) -> None:
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path, timeout=30.0,
+                                          isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        """Close the connection to the database."""
+        self.connection.close()
+
+    def enqueue(
+        self,
+        day: date,
+        targets: list[tuple[str, str]],
+        max_attempts: int = QUEUE_MAX_ATTEMPTS,
+    ) -> int:
+        """Add jobs for the (target, account) pairs.
+
+        Targets that already have a pending job for the date are skipped.
+
+        Returns:
+            int: The number of jobs added.
+        """
+        now = time.time()
+        with self._transaction():
+            before = self.connection.total_changes
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO jobs (day, target, account, state, "
+                "max_attempts, enqueued_at, available_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(day.isoformat(), target, account, STATE_READY,
+                  max_attempts, now, now) for target, account in targets],
+            )
+            return self.connection.total_changes - before
+
+    def lease(
+        self,
+        owner: str,
+        limit: int,
+        visibility: float = QUEUE_VISIBILITY_TIMEOUT,
+    ) -> list[Job]:
+        """Lease up to `limit` available jobs of the same account.
+
+        Jobs whose lease expired count as available, so the work of a
+        crashed worker is picked up again.
+        """
+        now = time.time()
+        available = ("(state = 'ready' AND available_at <= :now) OR "
+                     "(state = 'leased' AND lease_expires <= :now)")
+        with self._transaction():
+            # A job that took its worker down on every attempt is poison.
+            self.connection.execute(
+                "UPDATE jobs SET state = 'dead', finished_at = :now, "
+                "last_error = 'Lease expired on the last attempt', "
+                "lease_owner = NULL, lease_expires = NULL "
+                "WHERE state = 'leased' AND lease_expires <= :now "
+                "AND attempts >= max_attempts", {"now": now},
+            )
+            row = self.connection.execute(
+                f"SELECT account FROM jobs WHERE {available} "
+                "ORDER BY available_at LIMIT 1", {"now": now},
+            ).fetchone()
+            if row is None:
+                return []
+            rows = self.connection.execute(
+                f"SELECT id FROM jobs WHERE ({available}) "
+                "AND account = :account ORDER BY available_at LIMIT :limit",
+                {"now": now, "account": row[0], "limit": limit},
+            ).fetchall()
+            ids = [job_id for job_id, in rows]
+            self.connection.executemany(
+                "UPDATE jobs SET state = 'leased', attempts = attempts + 1, "
+                "lease_owner = ?, lease_expires = ? WHERE id = ?",
+                [(owner, now + visibility, job_id) for job_id in ids],
+            )
+            return [self._job(job_id) for job_id in ids]
+
+    def extend(
+        self,
+        owner: str,
+        jobs: list[Job],
+        visibility: float = QUEUE_VISIBILITY_TIMEOUT,
+    ) -> None:
+        """Push back the visibility timeout of jobs still held."""
+        expires = time.time() + visibility
+        with self._transaction():
+            self.connection.executemany(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? "
+                "AND state = 'leased' AND lease_owner = ?",
+                [(expires, job.id, owner) for job in jobs],
+            )
+
+    def complete(self, owner: str, job: Job) -> bool:
+        """Acknowledge a job. Return False if its lease was lost."""
+        with self._transaction():
+            cursor = self.connection.execute(
+                "UPDATE jobs SET state = 'done', finished_at = ?, "
+                "lease_owner = NULL, lease_expires = NULL "
+                "WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                (time.time(), job.id, owner),
+            )
+            return cursor.rowcount == 1
+
+    def fail(
+        self,
+        owner: str,
+        job: Job,
+        error: str,
+        retry: bool = True,
+    ) -> bool:
+        """Release a failed job for a retry, or dead-letter it if it used
+        up its attempts (or `retry` is False). Return False if its lease
+        was lost."""
+        now = time.time()
+        if retry and job.attempts < job.max_attempts:
+            state = STATE_READY
+            available_at = now + QUEUE_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+        else:
+            state = STATE_DEAD
+            available_at = now
+        with self._transaction():
+            cursor = self.connection.execute(
+                "UPDATE jobs SET state = ?, available_at = ?, "
+                "finished_at = ?, last_error = ?, lease_owner = NULL, "
+                "lease_expires = NULL "
+                "WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                (state, available_at, now if state == STATE_DEAD else None,
+                 error, job.id, owner),
+            )
+            return cursor.rowcount == 1
+
+    def requeue_dead(self) -> int:
+        """Give the dead letters a fresh set of attempts.
+
+        Returns:
+            int: The number of jobs requeued.
+        """
+        now = time.time()
+        with self._transaction():
+            cursor = self.connection.execute(
+                "UPDATE OR IGNORE jobs SET state = 'ready', attempts = 0, "
+                "available_at = ?, finished_at = NULL "
+                "WHERE state = 'dead'", (now,),
+            )
+            return cursor.rowcount
+
+    def stats(self) -> dict:
+        """Return the depth per state and how far behind the queue is."""
+        now = time.time()
+        counts = dict(self.connection.execute(
+            "SELECT state, COUNT(*) FROM jobs GROUP BY state"))
+        oldest_ready, = self.connection.execute(
+            "SELECT MIN(enqueued_at) FROM jobs WHERE state = 'ready'",
+        ).fetchone()
+        expired, = self.connection.execute(
+            "SELECT COUNT(*) FROM jobs WHERE state = 'leased' "
+            "AND lease_expires <= ?", (now,),
+        ).fetchone()
+        done_last_hour, = self.connection.execute(
+            "SELECT COUNT(*) FROM jobs WHERE state = 'done' "
+            "AND finished_at > ?", (now - 3600,),
+        ).fetchone()
+        by_account = dict(self.connection.execute(
+            "SELECT account, COUNT(*) FROM jobs "
+            "WHERE state IN ('ready', 'leased') GROUP BY account"))
+        dead = [
+            {"day": day, "target": target, "attempts": attempts,
+             "error": (error or "").strip().splitlines()[-1:]}
+            for day, target, attempts, error in self.connection.execute(
+                "SELECT day, target, attempts, last_error FROM jobs "
+                "WHERE state = 'dead' ORDER BY finished_at DESC LIMIT 10")
+        ]
+        return {
+            "depth": {state: counts.get(state, 0) for state in
+                      (STATE_READY, STATE_LEASED, STATE_DONE, STATE_DEAD)},
+            "pending_by_account": by_account,
+            "lag_s": (None if oldest_ready is None
+                      else round(now - oldest_ready, 1)),
+            "expired_leases": expired,
+            "done_last_hour": done_last_hour,
+            "recent_dead": dead,
+        }
+
+    def _job(self, job_id: int) -> Job:
+        row = self.connection.execute(
+            "SELECT id, day, target, account, attempts, max_attempts "
+            "FROM jobs WHERE id = ?", (job_id,),
+        ).fetchone()
+        return Job(row[0], date.fromisoformat(row[1]), *row[2:])
+
+    def _transaction(self) -> "_Transaction":
+        return _Transaction(self.connection)
+
+
+class _Transaction:
+    """`BEGIN IMMEDIATE` ... `COMMIT`, so that concurrent workers
+    serialize on the write lock instead of failing to upgrade to it."""
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self.connection = connection
+
+    def __enter__(self) -> None:
+        self.connection.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.connection.execute("COMMIT")
+        else:
+            self.connection.execute("ROLLBACK")
+
+
+def format_stats(stats: dict) -> str:
+    """Format the output of `WorkQueue.stats` for the console."""
+    depth = stats["depth"]
+    lag = stats["lag_s"]
+    lines = [
+        "Depth: " + ", ".join(f"{count} {state}"
+                              for state, count in depth.items()),
+        f"Lag: {'none' if lag is None else f'{lag:.1f}s'} "
+        "(age of the oldest ready job)",
+        f"Expired leases: {stats['expired_leases']}",
+        f"Done in the last hour: {stats['done_last_hour']}",
+    ]
+    if stats["pending_by_account"]:
+        lines.append("Pending by account: " + ", ".join(
+            f"{account} {count}"
+            for account, count in stats["pending_by_account"].items()))
+    if stats["recent_dead"]:
+        lines.append("Recent dead letters:")
+        for entry in stats["recent_dead"]:
+            error = entry["error"][0] if entry["error"] else "?"
+            lines.append(f"  {entry['day']} {entry['target']} after "
+                         f"{entry['attempts']} attempts: {error}")
+    return "\n".join(lines)
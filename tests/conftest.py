@@ -0,0 +1,35 @@
+"""conftest.py
+
+Point the program at the local stand-ins before it is imported.
+
+`counters.config` reads its URLs, credentials and configuration
+directory from the environment once, on import, so the stand-in web
+apps are started and the environment set up here, ahead of any test
+module importing the package.
+"""
+
+import os
+import shutil
+import tempfile
+from collections.abc import Generator
+
+import pytest
+
+from benchmarks.run import DUMMY_CREDENTIALS
+from benchmarks.stub_web_apps import StubWebApps, WebAppConfig
+
+_WEB_APPS = StubWebApps(WebAppConfig(response_delay=0.0, render_delay=0.0,
+                                     popup_delay=0.0, seed=0)).start()
+_CONFIG_DIR = tempfile.mkdtemp(prefix="counters-tests-")
+
+os.environ.update(DUMMY_CREDENTIALS)
+os.environ.update(_WEB_APPS.environment)
+os.environ["COUNTERS_CONFIG_DIR"] = _CONFIG_DIR
+
+
+@pytest.fixture(scope="session")
+def web_apps() -> Generator[StubWebApps, None, None]:
+    """The stand-in web apps the program is pointed at."""
+    yield _WEB_APPS
+    _WEB_APPS.stop()
+    shutil.rmtree(_CONFIG_DIR, ignore_errors=True)
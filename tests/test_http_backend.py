@@ -0,0 +1,94 @@
+"""test_http_backend.py
+
+The `http` backend against the stand-in web apps: updates made with a
+saved session the stand-ins accept, and the fallback to the browser when
+they reject it.
+"""
+
+from datetime import date
+
+import pytest
+
+from benchmarks.fake_driver import FakeDriverConfig
+from benchmarks.run import Scenario, write_config, write_sessions
+from benchmarks.scenario import BenchmarkProgram
+from benchmarks.stub_web_apps import StubWebApps
+from counters.config import (BACKEND_HTTP, EXIT_SUCCESS, JSON_FILE_PATH,
+                             SESSIONS_DIR, ProgramOptions)
+from counters.updaters.discord import DiscordUpdater
+from counters.updaters.instagram import InstagramUpdater
+from counters.web_session import SessionRejectedError
+
+TODAY = date(2024, 1, 10)
+START = date(2024, 1, 1)
+
+
+def test_discord_accepted_session(web_apps: StubWebApps) -> None:
+    """The status is replaced through the settings API."""
+    write_sessions(SESSIONS_DIR, web_apps, stale=False)
+    updater = DiscordUpdater({"status": "Day {} of testing",
+                              "start": START})
+    details = updater.prepare_details(TODAY)
+
+    updater.update_bio_http(details)
+
+    assert web_apps.discord.status_text == "Day 10 of testing"
+
+
+def test_instagram_accepted_session(web_apps: StubWebApps) -> None:
+    """The bio is replaced through the edit profile API."""
+    write_sessions(SESSIONS_DIR, web_apps, stale=False)
+    updater = InstagramUpdater({"bio": "Day {} of testing", "start": START})
+    details = updater.prepare_details(TODAY)
+
+    updater.update_bio_http(details)
+
+    assert web_apps.instagram.bio == "Day 10 of testing"
+
+
+@pytest.mark.parametrize("updater", [
+    DiscordUpdater({"status": "Day {} of rejection", "start": START}),
+    InstagramUpdater({"bio": "Day {} of rejection", "start": START}),
+], ids=["discord", "instagram"])
+def test_rejected_session(
+    web_apps: StubWebApps,
+    updater: DiscordUpdater | InstagramUpdater,
+) -> None:
+    """A session the app logged out is reported as rejected."""
+    write_sessions(SESSIONS_DIR, web_apps, stale=True)
+    details = updater.prepare_details(TODAY)
+
+    with pytest.raises(SessionRejectedError):
+        updater.update_bio_http(details)
+
+
+def test_rejected_session_falls_back_to_browser(
+    web_apps: StubWebApps,
+) -> None:
+    """A run with rejected sessions still succeeds, in the browser."""
+    write_sessions(SESSIONS_DIR, web_apps, stale=True)
+    write_config(JSON_FILE_PATH, Scenario("fallback", 0, browser=True))
+    options = ProgramOptions.defaults(
+        date_to_update_to=TODAY,
+        console_only=True,
+        run_spotify=False,
+        run_github=False,
+        backend=BACKEND_HTTP,
+        grid_urls=[],
+    )
+    driver_config = FakeDriverConfig(default_latency=0.0,
+                                     startup_latency=0.0)
+    before = web_apps.snapshot()
+
+    exit_code = BenchmarkProgram(options, driver_config).run()
+
+    requests = web_apps.snapshot() - before
+    assert exit_code == EXIT_SUCCESS
+    # Both sessions were tried and rejected...
+    assert requests["discord GET /api/v9/users/@me/settings"] == 1
+    assert requests["instagram GET /api/v1/accounts/edit/web_form_data/"] \
+        == 1
+    assert not requests["discord PATCH /api/v9/users/@me/settings"]
+    assert not requests["instagram POST /api/v1/web/accounts/edit/"]
+    # ...so the updates went through the browser instead.
+    assert driver_config.counts["get"] >= 2